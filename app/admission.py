@@ -0,0 +1,203 @@
+"""
+Control de admisión de peticiones por clase de endpoint.
+
+Cada clase (lane) tiene un número máximo de peticiones en curso y una cola
+acotada de espera:
+
+- analysis: /analyze-conversation y su variante en streaming (descarga y
+  análisis del audio en el pool de procesos y llamadas a OpenAI).
+- ingest: /record-conversation (decodificación, subida a S3 y transcripción).
+- llm: el matchmaking que llama a OpenAI (/matchmaking, /matchmaking/batch y
+  /matchmaking/profiles/{profile_id}/matches), con hasta
+  MATCHMAKING_MAX_TOP_K llamadas por petición.
+- light: el resto (altas, consultas, perfiles...).
+
+Las clases no comparten huecos, así que una ráfaga de análisis no retrasa un
+/create-conversation: las peticiones ligeras van por su propio carril. Si la
+cola de una clase está llena se responde 429 al momento; si una petición
+espera en cola más de ADMISSION_QUEUE_TIMEOUT_SECONDS, 503. Las dos
+respuestas llevan Retry-After, estimado con el tiempo medio de servicio de
+la clase y la longitud de su cola. /ready y /metrics no pasan por aquí.
+"""
+import asyncio
+import json
+import math
+import re
+import time
+from collections import deque
+
+from app.config import (
+    ADMISSION_ANALYSIS_CONCURRENCY,
+    ADMISSION_ANALYSIS_QUEUE,
+    ADMISSION_INGEST_CONCURRENCY,
+    ADMISSION_INGEST_QUEUE,
+    ADMISSION_LLM_CONCURRENCY,
+    ADMISSION_LLM_QUEUE,
+    ADMISSION_LIGHT_CONCURRENCY,
+    ADMISSION_LIGHT_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT_SECONDS,
+)
+from app.metrics import ADMISSION_ACTIVE, ADMISSION_QUEUED, ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+
+ROUTE_LANES = {
+    "/analyze-conversation": "analysis",
+    "/analyze-conversation/stream": "analysis",
+    "/record-conversation": "ingest",
+    "/matchmaking": "llm",
+    "/matchmaking/batch": "llm",
+}
+# Rutas con parámetros en el path
+ROUTE_PATTERN_LANES = [
+    (re.compile(r"/matchmaking/profiles/[^/]+/matches"), "llm"),
+]
+DEFAULT_LANE = "light"
+EXEMPT_PATHS = {"/ready", "/metrics"}
+# Peso de cada petición en la media móvil del tiempo de servicio
+SERVICE_TIME_ALPHA = 0.2
+
+
+def lane_for(path):
+    """Clase de la petición según su ruta."""
+    path = path.rstrip("/") or "/"
+    lane = ROUTE_LANES.get(path)
+    if lane is not None:
+        return lane
+    for pattern, lane in ROUTE_PATTERN_LANES:
+        if pattern.fullmatch(path):
+            return lane
+    return DEFAULT_LANE
+
+
+class Rejected(Exception):
+    def __init__(self, status_code, detail, retry_after):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Lane:
+    """
+    Semáforo con cola FIFO acotada. Al liberar un hueco se pasa directamente
+    al primero de la cola, de modo que una petición nueva no se cuela.
+    """
+
+    def __init__(self, name, concurrency, queue_depth, queue_timeout=ADMISSION_QUEUE_TIMEOUT_SECONDS):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+        self._service_time = 1.0
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def retry_after(self):
+        """Segundos estimados hasta que se libere un hueco para una petición nueva."""
+        rounds = (self.queued + 1) / max(self.concurrency, 1)
+        return max(1, math.ceil(self._service_time * rounds))
+
+    def _update_gauges(self):
+        ADMISSION_ACTIVE.labels(self.name).set(self.active)
+        ADMISSION_QUEUED.labels(self.name).set(self.queued)
+
+    def _reject(self, status_code, detail):
+        ADMISSION_REJECTED.labels(self.name, str(status_code)).inc()
+        return Rejected(status_code, detail, self.retry_after())
+
+    async def acquire(self):
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self._update_gauges()
+            return
+        if self.queued >= self.queue_depth:
+            raise self._reject(429, "Demasiadas peticiones en cola; inténtalo más tarde.")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._update_gauges()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # El hueco llegó a la vez que el timeout o la cancelación: se devuelve
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+                self._update_gauges()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject(503, "El servidor está saturado; inténtalo más tarde.") from None
+        finally:
+            ADMISSION_WAIT_SECONDS.labels(self.name).observe(time.perf_counter() - start)
+
+    def release(self, service_time=None):
+        if service_time is not None:
+            self._service_time += SERVICE_TIME_ALPHA * (service_time - self._service_time)
+        # El hueco pasa al primero de la cola que siga esperando; si no hay, se libera
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._update_gauges()
+                return
+        self.active -= 1
+        self._update_gauges()
+
+
+def default_lanes():
+    return {
+        "analysis": Lane("analysis", ADMISSION_ANALYSIS_CONCURRENCY, ADMISSION_ANALYSIS_QUEUE),
+        "ingest": Lane("ingest", ADMISSION_INGEST_CONCURRENCY, ADMISSION_INGEST_QUEUE),
+        "llm": Lane("llm", ADMISSION_LLM_CONCURRENCY, ADMISSION_LLM_QUEUE),
+        "light": Lane("light", ADMISSION_LIGHT_CONCURRENCY, ADMISSION_LIGHT_QUEUE),
+    }
+
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI que asigna cada petición a su clase y la admite, la deja
+    en cola o la rechaza. El hueco se ocupa hasta que se envía el último byte
+    de la respuesta, también en las respuestas en streaming.
+    """
+
+    def __init__(self, app, lanes=None):
+        self.app = app
+        self.lanes = lanes if lanes is not None else default_lanes()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        lane = self.lanes[lane_for(scope["path"])]
+        try:
+            await lane.acquire()
+        except Rejected as e:
+            await _send_rejection(send, e)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release(time.perf_counter() - start)
+
+
+async def _send_rejection(send, rejected):
+    body = json.dumps({"detail": rejected.detail}, ensure_ascii=False).encode()
+    await send({
+        "type": "http.response.start",
+        "status": rejected.status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(rejected.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,62 @@
+"""
+Perfiles del análisis de audio.
+
+Antes la señal se analizaba a su frecuencia de muestreo original y entera de
+una vez, así que la memoria y el tiempo crecían sin límite con la duración de
+la conversación. Cada perfil fija ahora cómo se prepara la señal:
+
+- sample_rate: frecuencia a la que se remuestrea (ffmpeg al decodificar).
+- silence_db y max_pause_seconds: los frames de 20 ms por debajo de
+  silence_db dBFS se consideran silencio. Se quita el silencio inicial de
+  cada fragmento y de cada pausa solo se conservan max_pause_seconds, con lo
+  que el silencio final y el que hay entre fragmentos queda acotado.
+- window_seconds: la señal se analiza por ventanas de esta duración y los
+  resúmenes de cada una (conteos, sumas y sumas de cuadrados) se combinan
+  sobre la marcha, así que en memoria solo hay una ventana decodificada.
+- pitch_fmax y pitch_frame_length: rango y tamaño de frame de librosa.yin,
+  la etapa más cara.
+
+"fast" apunta a la voz: 16 kHz, tono hasta C6 (la voz hablada no pasa de
+unos 500 Hz) y frames de yin más cortos. Objetivo: una conversación de una
+hora en menos de 30 s en un núcleo con el worker ya caliente (22 s medidos
+con habla sintética a 44,1 kHz de benchmarks.audio). "full" conserva la
+resolución del análisis original: 22050 Hz (la frecuencia por defecto de
+librosa), tono entre C2 y C7 y solo recorta silencios largos; tarda algo más
+del doble. En ambos la memoria no crece con la duración.
+
+ANALYSIS_PROFILE elige el perfil por defecto, con el que también se
+resumen los fragmentos al recibirlos; /analyze-conversation admite otro por
+petición.
+"""
+from app.config import ANALYSIS_PROFILE
+
+ANALYSIS_PROFILES = {
+    "fast": {
+        "sample_rate": 16000,
+        "silence_db": -45.0,
+        "max_pause_seconds": 0.3,
+        "window_seconds": 30.0,
+        # librosa.note_to_hz('C6')
+        "pitch_fmax": 1046.5022612023945,
+        "pitch_frame_length": 1024,
+    },
+    "full": {
+        "sample_rate": 22050,
+        "silence_db": -60.0,
+        "max_pause_seconds": 1.0,
+        "window_seconds": 60.0,
+        # librosa.note_to_hz('C7'), el PITCH_FMAX de app.spectral_features (sin
+        # importarlo, para no cargar librosa al validar peticiones)
+        "pitch_fmax": 2093.004522404789,
+        "pitch_frame_length": 2048,
+    },
+}
+
+
+def get_analysis_profile(name=None):
+    """Parámetros del perfil name (o del perfil por defecto). Lanza ValueError si no existe."""
+    name = name or ANALYSIS_PROFILE
+    if name not in ANALYSIS_PROFILES:
+        raise ValueError(f"Perfil de análisis desconocido: {name}. "
+                         f"Disponibles: {', '.join(ANALYSIS_PROFILES)}")
+    return ANALYSIS_PROFILES[name]
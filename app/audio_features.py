@@ -0,0 +1,176 @@
+import numpy as np
+from app.analysis_profiles import get_analysis_profile
+from app.config import ANALYSIS_PROFILE
+from app.spectral_features import extract_features, PITCH_FMIN, PITCH_FMAX
+
+# Versión del formato de los resúmenes guardados con cada fragmento. Si cambia
+# la forma de calcularlos, los fragmentos antiguos se vuelven a analizar.
+FEATURES_VERSION = 4
+
+# Un bin por semitono entre C2 y C7
+PITCH_HISTOGRAM_EDGES = np.geomspace(PITCH_FMIN, PITCH_FMAX, 61)
+
+SCALAR_FEATURES = (
+    "pitch",
+    "rms",
+    "zero_crossing_rate",
+    "spectral_centroid",
+    "spectral_bandwidth",
+    "spectral_contrast",
+    "spectral_flatness",
+)
+
+
+def audio_segment_to_array(segment):
+    """
+    Convierte un AudioSegment de pydub en un arreglo float32 mono en [-1, 1],
+    igual que lo haría librosa.load(sr=None).
+    """
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    if segment.channels > 1:
+        samples = samples.reshape((-1, segment.channels)).mean(axis=1)
+    samples /= float(1 << (8 * segment.sample_width - 1))
+    return samples, segment.frame_rate
+
+
+def _accumulator(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        "count": int(values.size),
+        "sum": float(np.sum(values)),
+        "sum_sq": float(np.sum(values ** 2)),
+    }
+
+
+def summarize_audio(y, sr, profile=None):
+    """
+    Calcula un resumen combinable de las características de un fragmento (o
+    de una ventana): conteos de frames, sumas y sumas de cuadrados de cada
+    métrica, acumuladores de MFCC e histograma de tono. Varios resúmenes se
+    combinan con merge_summaries sin volver a descargar ni decodificar el audio.
+    """
+    profile = profile or ANALYSIS_PROFILE
+    params = get_analysis_profile(profile)
+    extracted = extract_features(
+        y, sr, pitch_fmax=params["pitch_fmax"], pitch_frame_length=params["pitch_frame_length"])
+    frames = extracted["frames"]
+    mfccs = extracted["mfccs"]
+
+    pitch_counts, _ = np.histogram(frames["pitch"], bins=PITCH_HISTOGRAM_EDGES)
+
+    return {
+        "version": FEATURES_VERSION,
+        "profile": profile,
+        "sample_rate": int(sr),
+        "duration": float(len(y) / sr),
+        "tempo": extracted["tempo"],
+        "features": {name: _accumulator(values) for name, values in frames.items()},
+        "mfcc": {
+            "count": int(mfccs.shape[1]),
+            "sum": [float(x) for x in np.sum(mfccs, axis=1, dtype=np.float64)],
+            "sum_sq": [float(x) for x in np.sum(mfccs.astype(np.float64) ** 2, axis=1)],
+        },
+        "pitch_histogram": [int(x) for x in pitch_counts],
+    }
+
+
+def merge_summaries(summaries):
+    """
+    Combina los resúmenes de varios fragmentos en uno solo, en O(fragmentos).
+    summaries puede ser un generador: se recorre una sola vez y cada resumen
+    se suma en cuanto llega.
+    """
+    merged = {
+        "version": FEATURES_VERSION,
+        "duration": 0.0,
+        "tempo_weighted": 0.0,
+        "features": {name: {"count": 0, "sum": 0.0, "sum_sq": 0.0} for name in SCALAR_FEATURES},
+        "mfcc": None,
+        "pitch_histogram": np.zeros(len(PITCH_HISTOGRAM_EDGES) - 1, dtype=np.int64),
+    }
+
+    for summary in summaries:
+        merged["duration"] += summary["duration"]
+        merged["tempo_weighted"] += summary["tempo"] * summary["duration"]
+        for name in SCALAR_FEATURES:
+            for field in ("count", "sum", "sum_sq"):
+                merged["features"][name][field] += summary["features"][name][field]
+
+        mfcc = summary["mfcc"]
+        if merged["mfcc"] is None:
+            merged["mfcc"] = {
+                "count": 0,
+                "sum": np.zeros(len(mfcc["sum"])),
+                "sum_sq": np.zeros(len(mfcc["sum_sq"])),
+            }
+        merged["mfcc"]["count"] += mfcc["count"]
+        merged["mfcc"]["sum"] += np.asarray(mfcc["sum"])
+        merged["mfcc"]["sum_sq"] += np.asarray(mfcc["sum_sq"])
+
+        merged["pitch_histogram"] += np.asarray(summary["pitch_histogram"], dtype=np.int64)
+
+    if merged["mfcc"] is None:
+        raise ValueError("No hay resúmenes de audio para combinar.")
+    return merged
+
+
+def merged_to_summary(merged, sample_rate, profile):
+    """
+    Vuelve a expresar un resumen combinado (por ejemplo, de las ventanas de un
+    fragmento largo) como el resumen de un solo fragmento.
+    """
+    duration = merged["duration"]
+    return {
+        "version": FEATURES_VERSION,
+        "profile": profile,
+        "sample_rate": int(sample_rate),
+        "duration": float(duration),
+        "tempo": float(merged["tempo_weighted"] / duration) if duration else 0.0,
+        "features": {name: dict(accumulator) for name, accumulator in merged["features"].items()},
+        "mfcc": {
+            "count": int(merged["mfcc"]["count"]),
+            "sum": [float(x) for x in merged["mfcc"]["sum"]],
+            "sum_sq": [float(x) for x in merged["mfcc"]["sum_sq"]],
+        },
+        "pitch_histogram": [int(x) for x in merged["pitch_histogram"]],
+    }
+
+
+def _mean(accumulator):
+    if not accumulator["count"]:
+        return 0.0
+    return accumulator["sum"] / accumulator["count"]
+
+
+def summary_to_results(merged):
+    """
+    Convierte un resumen combinado en el diccionario de métricas que devuelve
+    el análisis de audio. El tempo es la media de los tempos de cada fragmento
+    ponderada por su duración; el resto de métricas son medias exactas sobre
+    todos los frames.
+    """
+    features = merged["features"]
+    mfcc = merged["mfcc"]
+    duration = merged["duration"]
+    mfcc_count = max(mfcc["count"], 1)
+
+    return {
+        "tempo": float(merged["tempo_weighted"] / duration) if duration else 0.0,
+        "average_pitch": float(_mean(features["pitch"])),
+        "rms": float(_mean(features["rms"])),
+        "zero_crossing_rate": float(_mean(features["zero_crossing_rate"])),
+        "spectral_centroid": float(_mean(features["spectral_centroid"])),
+        "spectral_bandwidth": float(_mean(features["spectral_bandwidth"])),
+        "spectral_contrast": float(_mean(features["spectral_contrast"])),
+        "spectral_flatness": float(_mean(features["spectral_flatness"])),
+        "mfccs": [float(x) for x in mfcc["sum"] / mfcc_count],
+    }
+
+
+def has_current_features(fragment, profile=None):
+    features = fragment.get("features")
+    return (
+        isinstance(features, dict)
+        and features.get("version") == FEATURES_VERSION
+        and features.get("profile") == (profile or ANALYSIS_PROFILE)
+    )
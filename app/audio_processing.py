@@ -0,0 +1,233 @@
+"""
+Trabajo CPU intensivo sobre audio. Las funciones de este módulo se ejecutan en
+el pool de procesos (app.executor), por lo que deben ser de nivel de módulo y
+no depender de los clientes de S3, MongoDB u OpenAI.
+
+Los fragmentos se analizan según un perfil (app.analysis_profiles): se
+remuestrean a su frecuencia, se les quita el silencio y la señal resultante se
+resume por ventanas de tamaño fijo que se combinan sobre la marcha. Para el
+análisis completo de una conversación, ffmpeg decodifica cada fragmento por
+bloques, de modo que en memoria solo hay una ventana de PCM además del audio
+comprimido descargado.
+"""
+import io
+import logging
+import json
+import subprocess
+import threading
+import numpy as np
+from pydub import AudioSegment
+from app.analysis_profiles import get_analysis_profile
+from app.audio_features import (
+    audio_segment_to_array,
+    summarize_audio,
+    merge_summaries,
+    merged_to_summary,
+    summary_to_results,
+)
+from app.config import ANALYSIS_PROFILE
+from app.ingest import FFMPEG_STDIN
+
+logger = logging.getLogger(__name__)
+
+# Resolución del recorte de silencios
+SILENCE_FRAME_SECONDS = 0.02
+# Bloques que se leen de ffmpeg al decodificar
+DECODE_BLOCK_SECONDS = 5
+# Una última ventana más corta que esto se descarta (si no es la única)
+MIN_WINDOW_SECONDS = 0.5
+
+
+def decode_pcm_blocks(audio_blob, sample_rate, block_seconds=DECODE_BLOCK_SECONDS):
+    """
+    Decodifica audio_blob con ffmpeg a PCM mono remuestreado a sample_rate y
+    lo genera en bloques float32 de block_seconds. Lanza ValueError si ffmpeg
+    falla o no produce ninguna muestra.
+    """
+    process = subprocess.Popen(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", FFMPEG_STDIN,
+         "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+
+    def feed():
+        try:
+            process.stdin.write(audio_blob)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            process.stdin.close()
+
+    # stdin se escribe en otro hilo para que ffmpeg no se bloquee con stdout lleno
+    writer = threading.Thread(target=feed, daemon=True)
+    writer.start()
+    block_bytes = 2 * int(block_seconds * sample_rate)
+    finished = False
+    decoded = 0
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            decoded += len(data)
+            yield np.frombuffer(data[:len(data) - len(data) % 2], dtype=np.int16).astype(np.float32) / 32768.0
+        finished = True
+    finally:
+        process.stdout.close()
+        if not finished:
+            # El consumidor dejó de leer (error o cancelación)
+            process.kill()
+        writer.join()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        returncode = process.wait()
+    if returncode != 0:
+        raise ValueError(f"ffmpeg no pudo decodificar el audio: {stderr.decode(errors='replace')}")
+    if decoded < 2:
+        # ffmpeg puede terminar bien sin producir audio (archivo truncado o vacío)
+        raise ValueError(f"ffmpeg no produjo audio: {stderr.decode(errors='replace')}")
+
+
+class SilenceTrimmer:
+    """
+    Recorte de silencios por bloques, con estado entre bloques. Se quitan los
+    frames de silencio del inicio de cada fragmento y los que exceden
+    max_pause_seconds dentro de una pausa.
+    """
+
+    def __init__(self, sample_rate, silence_db, max_pause_seconds):
+        self.frame = max(1, int(sample_rate * SILENCE_FRAME_SECONDS))
+        self.max_pause_frames = int(round(max_pause_seconds / SILENCE_FRAME_SECONDS))
+        self.threshold = 10 ** (silence_db / 20)
+        self.kept_frames = 0
+        self.dropped_frames = 0
+        self.start_fragment()
+
+    def start_fragment(self):
+        # Al empezar cada fragmento se está "en silencio": el inicial se descarta
+        self._pending = np.empty(0, dtype=np.float32)
+        self._silent_run = self.max_pause_frames
+
+    def process(self, block):
+        samples = np.concatenate((self._pending, block)) if self._pending.size else block
+        n_frames = len(samples) // self.frame
+        self._pending = samples[n_frames * self.frame:]
+        if n_frames == 0:
+            return samples[:0]
+
+        frames = samples[:n_frames * self.frame].reshape(n_frames, self.frame)
+        silent = np.sqrt(np.mean(np.square(frames), axis=1)) < self.threshold
+        # Longitud de la racha de silencio que termina en cada frame, continuando
+        # la del bloque anterior
+        index = np.arange(n_frames)
+        last_voiced = np.maximum.accumulate(np.where(silent, -1, index))
+        run = np.where(last_voiced < 0, index + 1 + self._silent_run, index - last_voiced)
+        run[~silent] = 0
+        self._silent_run = int(run[-1])
+
+        keep = run <= self.max_pause_frames
+        kept = int(np.count_nonzero(keep))
+        self.kept_frames += kept
+        self.dropped_frames += n_frames - kept
+        return frames[keep].ravel()
+
+
+def profile_windows(fragments, profile):
+    """
+    Genera la señal recortada de todos los fragmentos en ventanas de
+    window_seconds. fragments es un iterable (uno por fragmento) de iterables
+    de bloques float32 a la frecuencia del perfil. La ventana se reutiliza: hay
+    que terminar con cada una antes de pedir la siguiente.
+    """
+    params = get_analysis_profile(profile)
+    sample_rate = params["sample_rate"]
+    trimmer = SilenceTrimmer(sample_rate, params["silence_db"], params["max_pause_seconds"])
+    window = np.empty(int(params["window_seconds"] * sample_rate), dtype=np.float32)
+    fill = 0
+    yielded = False
+
+    for blocks in fragments:
+        trimmer.start_fragment()
+        for block in blocks:
+            kept = trimmer.process(block)
+            while kept.size:
+                take = min(len(window) - fill, kept.size)
+                window[fill:fill + take] = kept[:take]
+                fill += take
+                kept = kept[take:]
+                if fill == len(window):
+                    yield window
+                    yielded = True
+                    fill = 0
+
+    if fill and (not yielded or fill >= MIN_WINDOW_SECONDS * sample_rate):
+        yield window[:fill]
+    elif not yielded:
+        # Audio totalmente en silencio: se analiza una ventana de silencio
+        # para devolver métricas (nulas) en vez de fallar
+        yield np.zeros(int(MIN_WINDOW_SECONDS * sample_rate), dtype=np.float32)
+
+    total = trimmer.kept_frames + trimmer.dropped_frames
+    if total:
+        logger.debug(f"Silencio recortado: {trimmer.dropped_frames / total:.0%} de los frames.")
+
+
+def summarize_windows(fragments, profile):
+    """Resumen combinado de las ventanas de la señal recortada."""
+    sample_rate = get_analysis_profile(profile)["sample_rate"]
+    return merge_summaries(
+        summarize_audio(window, sample_rate, profile) for window in profile_windows(fragments, profile))
+
+
+def summarize_array(y, sr, profile=None):
+    """
+    Resumen de un fragmento ya decodificado (float32 mono): se remuestrea a la
+    frecuencia del perfil, se recorta y se resume por ventanas.
+    """
+    profile = profile or ANALYSIS_PROFILE
+    sample_rate = get_analysis_profile(profile)["sample_rate"]
+    if sr != sample_rate:
+        import librosa
+        y = librosa.resample(y, orig_sr=sr, target_sr=sample_rate)
+    return merged_to_summary(summarize_windows([[y]], profile), sample_rate, profile)
+
+
+def decode_fragment(file_content, type_file, profile=None):
+    """
+    Decodifica un fragmento recibido, lo exporta a WAV para la transcripción y
+    calcula su resumen de características.
+    """
+    audio = AudioSegment.from_file(io.BytesIO(file_content), format=type_file)
+    wav_io = io.BytesIO()
+    audio.export(wav_io, format="wav")
+
+    # Calcular duración
+    duration_seconds = len(audio) / 1000
+
+    # Resumen combinable de características para /analyze-conversation
+    features = summarize_array(*audio_segment_to_array(audio), profile)
+    return wav_io.getvalue(), duration_seconds, features
+
+
+def summarize_pcm(pcm, sample_rate, profile=None):
+    """
+    Resumen de características a partir del PCM s16le mono de la ingesta.
+    """
+    y = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+    y /= 32768.0
+    return summarize_array(y, sample_rate, profile)
+
+
+def extract_audio_features(audio_blobs, profile=None):
+    """
+    Analiza los fragmentos de audio descargados según el perfil: cada uno se
+    decodifica por bloques, ya remuestreado, y la señal recortada se resume
+    por ventanas.
+    """
+    profile = profile or ANALYSIS_PROFILE
+    sample_rate = get_analysis_profile(profile)["sample_rate"]
+    fragments = (decode_pcm_blocks(audio_blob, sample_rate) for audio_blob in audio_blobs)
+    results = summary_to_results(summarize_windows(fragments, profile))
+
+    logger.info("Análisis de audio completado con éxito.")
+    return json.dumps(results)
@@ -0,0 +1,116 @@
+"""
+Caché en proceso del catálogo de cursos usado por generate_report.
+
+El catálogo se lee de MongoDB como mucho una vez por COURSE_CATALOG_TTL_SECONDS
+y se guarda ya mapeado. version solo cambia cuando cambia el contenido (se
+compara un hash), así que el índice de cursos que depende de ella no se
+reconstruye en cada recarga por TTL. Se puede
+invalidar explícitamente y, con COURSE_CATALOG_CHANGE_STREAM, un change stream
+de MongoDB lo invalida en cuanto cambia la colección de cursos.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+from app.config import COURSE_CATALOG_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+COURSE_PROJECTION = {
+    "name": 1,
+    "url": 1,
+    "level": 1,
+    "summary": 1,
+    "classes.url": 1,
+    "classes.name": 1,
+    "classes.summary": 1,
+}
+
+
+def map_course(class_entry):
+    """Mapea un documento de la colección courses al formato del prompt."""
+    mapped_entry = {
+        "_id": str(class_entry["_id"]),
+        "name": class_entry.get("name", ""),
+        "url": class_entry.get("url", ""),
+        "level": class_entry.get("level", ""),
+        "summary": class_entry.get("summary", ""),
+        "classes": [],
+        "video_titles": []
+    }
+
+    # Mapea las clases individuales
+    for video in class_entry.get("classes", []):
+        mapped_entry["classes"].append({
+            "url": video.get("url", ""),
+            "name": video.get("name", ""),
+            "summary": video.get("summary", "")
+        })
+        mapped_entry["video_titles"].append(video.get("name", ""))
+
+    return mapped_entry
+
+
+class CourseCatalog:
+    def __init__(self, collection, ttl_seconds=COURSE_CATALOG_TTL_SECONDS):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.courses = []
+        self.digest = None
+        self.version = 0
+        self._loaded_at = None
+        self._lock = asyncio.Lock()
+
+    def is_fresh(self):
+        return (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.ttl_seconds
+        )
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    async def _load(self):
+        courses = [map_course(entry) async for entry in self.collection.find({}, COURSE_PROJECTION)]
+        digest = hashlib.sha256(json.dumps(
+            courses, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+        self._loaded_at = time.monotonic()
+        if digest == self.digest:
+            logger.debug("Catálogo de cursos recargado sin cambios.")
+            return
+        self.courses = courses
+        self.digest = digest
+        self.version += 1
+        logger.info(f"Catálogo de cursos cargado: {len(courses)} cursos.")
+
+    async def refresh(self):
+        """
+        Recarga el catálogo si ha caducado. Las peticiones concurrentes esperan
+        a una única recarga en lugar de consultar MongoDB cada una.
+        """
+        if self.is_fresh():
+            return
+        async with self._lock:
+            if not self.is_fresh():
+                await self._load()
+
+    async def get_courses(self):
+        await self.refresh()
+        return self.courses
+
+    async def watch(self):
+        """
+        Invalida la caché con cada cambio en la colección. Requiere un replica
+        set; si el servidor no admite change streams, se queda con el TTL.
+        """
+        try:
+            async with self.collection.watch() as stream:
+                async for _ in stream:
+                    logger.info("Cambio en la colección de cursos: se invalida el catálogo.")
+                    self.invalidate()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Change stream de cursos no disponible, se usa solo el TTL: {e}")
@@ -4,4 +4,93 @@ from dotenv import load_dotenv
 load_dotenv()
 
 BUCKET_NAME = os.getenv("BUCKET_NAME")
-MONGO_URI = os.getenv("MONGO_URI")
\ No newline at end of file
+MONGO_URI = os.getenv("MONGO_URI")
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60"))
+# Cliente compartido de OpenAI: URL base (se puede apuntar a un servidor falso
+# local), concurrencia, reintentos y límites de la cuenta por minuto
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+OPENAI_RETRY_BASE_SECONDS = float(os.getenv("OPENAI_RETRY_BASE_SECONDS", "0.5"))
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "200000"))
+
+# Pool de procesos para decodificación y análisis de audio
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(os.cpu_count() or 1)))
+ANALYSIS_MAX_TASKS_PER_CHILD = int(os.getenv("ANALYSIS_MAX_TASKS_PER_CHILD", "100"))
+# Control de admisión (app.admission): peticiones a la vez y en cola por clase
+# de endpoint, y espera máxima en cola antes de responder 503
+ADMISSION_ANALYSIS_CONCURRENCY = int(os.getenv("ADMISSION_ANALYSIS_CONCURRENCY", str(max(2, 2 * ANALYSIS_WORKERS))))
+ADMISSION_ANALYSIS_QUEUE = int(os.getenv("ADMISSION_ANALYSIS_QUEUE", "16"))
+ADMISSION_INGEST_CONCURRENCY = int(os.getenv("ADMISSION_INGEST_CONCURRENCY", "16"))
+ADMISSION_INGEST_QUEUE = int(os.getenv("ADMISSION_INGEST_QUEUE", "64"))
+# Matchmaking: cada petición puede hacer hasta MATCHMAKING_MAX_TOP_K llamadas a OpenAI
+ADMISSION_LLM_CONCURRENCY = int(os.getenv("ADMISSION_LLM_CONCURRENCY", "4"))
+ADMISSION_LLM_QUEUE = int(os.getenv("ADMISSION_LLM_QUEUE", "32"))
+ADMISSION_LIGHT_CONCURRENCY = int(os.getenv("ADMISSION_LIGHT_CONCURRENCY", "256"))
+ADMISSION_LIGHT_QUEUE = int(os.getenv("ADMISSION_LIGHT_QUEUE", "1024"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "30"))
+# Perfil de análisis de audio por defecto ("fast" o "full", ver app.analysis_profiles)
+ANALYSIS_PROFILE = os.getenv("ANALYSIS_PROFILE", "full")
+
+# Descargas de S3: concurrencia máxima y tamaño de la caché local de fragmentos
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "8"))
+S3_CACHE_MAX_BYTES = int(os.getenv("S3_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Subida en streaming de /record-conversation: el archivo se lee por bloques,
+# se sube a S3 por partes y se decodifica a PCM mono con ffmpeg a la vez
+STREAMING_INGEST = os.getenv("STREAMING_INGEST", "true").lower() in ("1", "true", "yes")
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", str(256 * 1024)))
+INGEST_SAMPLE_RATE = int(os.getenv("INGEST_SAMPLE_RATE", "22050"))
+# S3 exige partes de al menos 5 MB (salvo la última)
+S3_PART_SIZE = max(int(os.getenv("S3_PART_SIZE", str(8 * 1024 * 1024))), 5 * 1024 * 1024)
+
+# Transcripción: tiempo máximo por llamada al reconocedor y cola de trabajos
+# para el modo asíncrono de /record-conversation
+TRANSCRIPTION_TIMEOUT_SECONDS = float(os.getenv("TRANSCRIPTION_TIMEOUT_SECONDS", "30"))
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "4"))
+TRANSCRIPTION_MAX_ATTEMPTS = int(os.getenv("TRANSCRIPTION_MAX_ATTEMPTS", "4"))
+TRANSCRIPTION_RETRY_BASE_SECONDS = float(os.getenv("TRANSCRIPTION_RETRY_BASE_SECONDS", "1"))
+# Trabajos en espera como máximo; con la cola llena /record-conversation
+# responde 503 en modo asíncrono
+TRANSCRIPTION_QUEUE_SIZE = int(os.getenv("TRANSCRIPTION_QUEUE_SIZE", "256"))
+
+# Motor de transcripción ("google" o "sphinx") y división en silencios de los
+# fragmentos largos para transcribirlos por trozos en paralelo
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "google")
+TRANSCRIPTION_LANGUAGE = os.getenv("TRANSCRIPTION_LANGUAGE", "es-ES")
+TRANSCRIPTION_MAX_CHUNK_SECONDS = float(os.getenv("TRANSCRIPTION_MAX_CHUNK_SECONDS", "30"))
+TRANSCRIPTION_MIN_SILENCE_MS = int(os.getenv("TRANSCRIPTION_MIN_SILENCE_MS", "300"))
+TRANSCRIPTION_SILENCE_OFFSET_DB = float(os.getenv("TRANSCRIPTION_SILENCE_OFFSET_DB", "16"))
+TRANSCRIPTION_CHUNK_CONCURRENCY = int(os.getenv("TRANSCRIPTION_CHUNK_CONCURRENCY", "8"))
+
+# Caché del catálogo de cursos para generate_report
+COURSE_CATALOG_TTL_SECONDS = float(os.getenv("COURSE_CATALOG_TTL_SECONDS", "300"))
+COURSE_CATALOG_CHANGE_STREAM = os.getenv("COURSE_CATALOG_CHANGE_STREAM", "false").lower() in ("1", "true", "yes")
+COURSE_RECOMMENDATION_TOP_K = int(os.getenv("COURSE_RECOMMENDATION_TOP_K", "5"))
+
+# Caché de respuestas de OpenAI: LRU en memoria y, si LLM_CACHE_PATH está
+# definido, un nivel persistente en SQLite
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+LLM_CACHE_MAX_DISK_BYTES = int(os.getenv("LLM_CACHE_MAX_DISK_BYTES", str(256 * 1024 * 1024)))
+
+# /matchmaking/batch: candidatos admitidos por petición, cuántos pasan de la
+# preselección local a OpenAI (por defecto y como máximo, porque cada uno es
+# una llamada a OpenAI) y diferencia de edad máxima penalizada
+MATCHMAKING_MAX_CANDIDATES = int(os.getenv("MATCHMAKING_MAX_CANDIDATES", "10000"))
+MATCHMAKING_TOP_K = int(os.getenv("MATCHMAKING_TOP_K", "10"))
+MATCHMAKING_MAX_TOP_K = int(os.getenv("MATCHMAKING_MAX_TOP_K", "50"))
+MATCHMAKING_MAX_AGE_GAP = int(os.getenv("MATCHMAKING_MAX_AGE_GAP", "20"))
+# Snapshot del índice de perfiles de matchmaking (vacío: solo en memoria)
+MATCHMAKING_INDEX_PATH = os.getenv("MATCHMAKING_INDEX_PATH", "")
+
+# Perfilado bajo demanda: con PROFILING_ENABLED, las peticiones con la
+# cabecera PROFILING_HEADER se perfilan con pyinstrument y el informe se
+# guarda en PROFILING_OUTPUT_DIR
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILING_HEADER = os.getenv("PROFILING_HEADER", "X-Profile")
+PROFILING_OUTPUT_DIR = os.getenv("PROFILING_OUTPUT_DIR", "profiles")
+PROFILING_INTERVAL_SECONDS = float(os.getenv("PROFILING_INTERVAL_SECONDS", "0.001"))
@@ -0,0 +1,136 @@
+"""
+Preselección local de cursos para el prompt de generate_report.
+
+En lugar de enviar todo el catálogo al modelo, se construye (una vez por
+versión del catálogo) un índice TF-IDF sobre el nombre, nivel y resumen de
+cada curso y de sus clases. La consulta se arma con las áreas en las que el
+estudiante sacó peor puntuación y el feedback del análisis textual, y solo los
+COURSE_RECOMMENDATION_TOP_K cursos más relevantes entran en el prompt, junto
+con un resumen compacto de las métricas.
+
+Las métricas de audio no pesan en la consulta. Son descriptores acústicos sin
+calibrar (tono medio, energía, centroide y planitud espectral, MFCC y un tempo
+de seguimiento de pulsos pensado para música) que dependen de la voz de cada
+hablante, del micrófono y del ruido de fondo, y no hay una referencia con la
+que compararlos. Convertirlos en una nota de pronunciación o fluidez sería
+inventar umbrales, y una nota inventada desplazaría los cursos preseleccionados
+más que el peso intermedio fijo. Esas métricas llegan al modelo en el resumen
+compacto del prompt, que es quien puntúa la pronunciación.
+"""
+import asyncio
+import json
+import logging
+
+from app.config import COURSE_RECOMMENDATION_TOP_K
+
+logger = logging.getLogger(__name__)
+
+# Palabras clave de cada métrica para la consulta, en inglés y español
+AREA_KEYWORDS = {
+    "grammar": "grammar gramática tenses tiempos verbales verbs verbos structure estructura",
+    "vocabulary": "vocabulary vocabulario words palabras expressions expresiones phrasal",
+    "fluency": "fluency fluidez speaking hablar conversation conversación",
+    "coherence": "coherence coherencia connectors conectores organization organización",
+    "style": "style estilo formal informal register registro",
+    "pronunciation": "pronunciation pronunciación sounds sonidos listening accent acento",
+}
+MAX_SCORE = 10
+
+
+def course_document(course):
+    """Texto indexado de un curso mapeado por el catálogo."""
+    parts = [course.get("name", ""), course.get("level", ""), course.get("summary", "")]
+    for video in course.get("classes", []):
+        parts.append(video.get("name", ""))
+        parts.append(video.get("summary", ""))
+    return " ".join(part for part in parts if part)
+
+
+def build_query(conversation_data):
+    """
+    Consulta de texto a partir del análisis textual: las palabras clave de
+    cada área se repiten más cuanto peor es su puntuación, y se añade el
+    feedback crítico. El análisis de audio no interviene (ver el docstring del
+    módulo).
+    """
+    textual = conversation_data.get("textual_analysis") or {}
+    # Las áreas sin nota del análisis textual (la pronunciación) tienen un peso intermedio
+    scores = textual.get("analysis") or {}
+
+    terms = []
+    for area, keywords in AREA_KEYWORDS.items():
+        try:
+            score = float(scores.get(area, MAX_SCORE / 2))
+        except (TypeError, ValueError):
+            score = MAX_SCORE / 2
+        weight = max(1, round(MAX_SCORE - score))
+        terms.extend([keywords] * weight)
+
+    terms.append(str(textual.get("critical_feedback", "")))
+    return " ".join(terms)
+
+
+def compact_conversation_data(conversation_data):
+    """
+    Resumen de las métricas para el prompt: sin enlaces de audio ni MFCC, y
+    con los valores numéricos redondeados.
+    """
+    audio = {
+        name: round(value, 2)
+        for name, value in (conversation_data.get("audio_analysis") or {}).items()
+        if isinstance(value, (int, float))
+    }
+    summary = {
+        "textual_analysis": conversation_data.get("textual_analysis"),
+        "audio_analysis": audio,
+    }
+    return json.dumps(summary, ensure_ascii=False, separators=(",", ":"))
+
+
+class CourseIndex:
+    """
+    Índice TF-IDF del catálogo. Se reconstruye solo cuando cambia la versión
+    del CourseCatalog.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.version = None
+        self.courses = []
+        self._vectorizer = None
+        self._matrix = None
+        self._lock = asyncio.Lock()
+
+    def _build(self, courses):
+        # scikit-learn tarda en importarse: solo se carga al construir el índice
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        vectorizer = TfidfVectorizer(strip_accents="unicode", sublinear_tf=True)
+        matrix = vectorizer.fit_transform([course_document(course) for course in courses])
+        return vectorizer, matrix
+
+    async def ensure(self):
+        await self.catalog.refresh()
+        if self.version == self.catalog.version:
+            return
+        async with self._lock:
+            if self.version == self.catalog.version:
+                return
+            version, courses = self.catalog.version, self.catalog.courses
+            if courses:
+                self._vectorizer, self._matrix = await asyncio.to_thread(self._build, courses)
+            else:
+                self._vectorizer, self._matrix = None, None
+            self.courses = courses
+            self.version = version
+            logger.info(f"Índice de cursos construido: {len(courses)} cursos.")
+
+    async def top_k(self, query, k=COURSE_RECOMMENDATION_TOP_K):
+        """Los k cursos más similares a la consulta, del más al menos relevante."""
+        await self.ensure()
+        if self._matrix is None:
+            return []
+
+        scores = (self._matrix @ self._vectorizer.transform([query]).T).toarray().ravel()
+        order = scores.argsort()[::-1][:k]
+        return [self.courses[i] for i in order]
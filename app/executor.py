@@ -0,0 +1,77 @@
+"""
+Pool de procesos para el trabajo CPU intensivo (decodificación con pydub,
+exportación WAV y extracción de características con librosa).
+
+Ese trabajo retiene el GIL durante segundos, así que ejecutarlo en el hilo de
+la petición (o en el threadpool) serializa los análisis. El pool se crea y se
+calienta al arrancar la aplicación: cada worker importa librosa y ejecuta un
+análisis corto para pagar una sola vez el coste del JIT de numba.
+"""
+import asyncio
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import ANALYSIS_WORKERS, ANALYSIS_MAX_TASKS_PER_CHILD
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+
+
+def _warm_up_worker():
+    """
+    Inicializador de cada worker: importa las dependencias pesadas y compila
+    las funciones JIT de librosa con una señal corta.
+    """
+    import numpy as np
+    from app.audio_processing import summarize_array
+
+    sr = 22050
+    t = np.arange(sr, dtype=np.float32) / sr
+    summarize_array(0.1 * np.sin(2 * np.pi * 220 * t).astype(np.float32), sr)
+
+
+def _ping():
+    return True
+
+
+async def start_process_pool():
+    """
+    Crea el pool y fuerza el arranque (y calentamiento) de todos sus workers.
+    Con ANALYSIS_WORKERS=0 el trabajo CPU se ejecuta en el threadpool.
+    """
+    global _pool
+    if ANALYSIS_WORKERS <= 0 or _pool is not None:
+        return
+
+    _pool = ProcessPoolExecutor(
+        max_workers=ANALYSIS_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_warm_up_worker,
+        max_tasks_per_child=ANALYSIS_MAX_TASKS_PER_CHILD or None,
+    )
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(
+        loop.run_in_executor(_pool, _ping) for _ in range(ANALYSIS_WORKERS)
+    ))
+    logger.info(f"Pool de análisis iniciado con {ANALYSIS_WORKERS} procesos.")
+
+
+def shutdown_process_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+async def run_cpu_bound(func, *args, **kwargs):
+    """
+    Ejecuta func en el pool de procesos sin bloquear el event loop. func y sus
+    argumentos deben ser serializables con pickle (funciones de nivel de módulo).
+    """
+    call = functools.partial(func, *args, **kwargs)
+    if _pool is None:
+        return await asyncio.to_thread(call)
+    return await asyncio.get_running_loop().run_in_executor(_pool, call)
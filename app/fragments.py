@@ -0,0 +1,234 @@
+"""
+Almacenamiento de los fragmentos de conversación en su propia colección.
+
+Antes los fragmentos se guardaban en un array embebido en el documento de la
+conversación, que había que leer entero para añadir o consultar un fragmento
+y que crecía hacia el límite de 16 MB por documento. Ahora cada fragmento es
+un documento de la colección fragments, con un índice único sobre
+(conversation_id, speaker, start_time):
+
+- add hace un único upsert por esa clave, así que reintentar la subida de un
+  fragmento no lo duplica. La existencia de la conversación se comprueba solo
+  la primera vez que se ve cada conversación.
+- list filtra por hablante en el servidor y devuelve solo los campos pedidos,
+  en el orden en que se recibieron los fragmentos, como el array embebido.
+  start_time es un texto libre del formulario y no sirve para ordenar ("16.00"
+  va antes que "8.00"), así que cada fragmento guarda al crearse un número de
+  secuencia creciente.
+- migrate_embedded_fragments copia los fragmentos embebidos existentes a la
+  colección y los quita del array. Es idempotente y se ejecuta al arrancar, o a
+  mano con python -m app.fragments. Los embebidos que chocan en la clave con
+  otro distinto no se migran ni se borran.
+- fail_pending_transcriptions marca al arrancar como fallidas las
+  transcripciones asíncronas que quedaron pendientes en el proceso anterior.
+
+Las colecciones se reciben en el constructor para poder usar mongomock en
+pruebas.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException
+
+from app.jobs import PENDING, FAILED, INTERRUPTED_TRANSCRIPTION
+
+logger = logging.getLogger(__name__)
+
+# pymongo.ASCENDING, sin importar pymongo hasta que se crea el cliente
+ASCENDING = 1
+FRAGMENT_KEY = ("conversation_id", "speaker", "start_time")
+# Orden de llegada: se fija al insertar el fragmento y no cambia al resubirlo
+SEQUENCE_FIELD = "sequence"
+# Campos que necesita /analyze-conversation
+ANALYSIS_PROJECTION = {
+    "_id": 0,
+    "speaker": 1,
+    "start_time": 1,
+    "end_time": 1,
+    "audio_url": 1,
+    "audio_key": 1,
+    "transcription": 1,
+    "transcription_status": 1,
+    "features": 1,
+}
+JOB_PROJECTION = {
+    "_id": 0,
+    "conversation_id": 1,
+    "transcription": 1,
+    "transcription_status": 1,
+}
+MAX_KNOWN_CONVERSATIONS = 10000
+MIGRATION_BATCH_SIZE = 100
+
+
+class FragmentRepository:
+    def __init__(self, conversations, fragments):
+        self.conversations = conversations
+        self.fragments = fragments
+        # Conversaciones cuya existencia ya se ha comprobado (LRU acotado)
+        self._known_conversations = OrderedDict()
+
+    async def ensure_indexes(self):
+        await self.fragments.create_index(
+            [(field, ASCENDING) for field in FRAGMENT_KEY], unique=True, name="fragment_key")
+        await self.fragments.create_index(
+            [("conversation_id", ASCENDING), ("speaker", ASCENDING), (SEQUENCE_FIELD, ASCENDING)],
+            name="fragment_order")
+        await self.fragments.create_index(
+            "transcription_job_id", sparse=True, name="transcription_job_id")
+
+    async def _ensure_conversation(self, conversation_id):
+        if conversation_id in self._known_conversations:
+            self._known_conversations.move_to_end(conversation_id)
+            return
+        conversation = await self.conversations.find_one(
+            {"conversation_id": conversation_id}, {"_id": 1})
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversación no encontrada.")
+        self._known_conversations[conversation_id] = True
+        if len(self._known_conversations) > MAX_KNOWN_CONVERSATIONS:
+            self._known_conversations.popitem(last=False)
+
+    async def add(self, conversation_id, fragment):
+        await self._ensure_conversation(conversation_id)
+        document = {**fragment, "conversation_id": conversation_id}
+        document.pop(SEQUENCE_FIELD, None)
+        await self.fragments.update_one(
+            {field: document[field] for field in FRAGMENT_KEY},
+            {"$set": document, "$setOnInsert": {SEQUENCE_FIELD: time.time_ns()}},
+            upsert=True,
+        )
+
+    async def list(self, conversation_id, speaker=None, projection=ANALYSIS_PROJECTION):
+        """Fragmentos de la conversación (de un hablante, si se indica) por orden de llegada."""
+        query = {"conversation_id": conversation_id}
+        if speaker is not None:
+            query["speaker"] = speaker
+        cursor = self.fragments.find(query, projection).sort(SEQUENCE_FIELD, ASCENDING)
+        return await cursor.to_list(length=None)
+
+    async def has_fragments(self, conversation_id):
+        return await self.fragments.find_one({"conversation_id": conversation_id}, {"_id": 1}) is not None
+
+    async def update_transcription(self, job_id, result, status):
+        await self.fragments.update_one(
+            {"transcription_job_id": job_id},
+            {"$set": {
+                "transcription": result["text"],
+                "transcription_segments": result["segments"],
+                "transcription_status": status,
+            }}
+        )
+
+    async def fail_pending_transcriptions(self):
+        """
+        Marca como fallidas las transcripciones que siguen pendientes. La cola
+        vive en memoria, así que al arrancar ningún trabajo pendiente va a
+        terminar. Devuelve cuántos fragmentos se han marcado.
+        """
+        result = await self.fragments.update_many(
+            {"transcription_status": PENDING},
+            {"$set": {
+                "transcription": INTERRUPTED_TRANSCRIPTION,
+                "transcription_segments": [],
+                "transcription_status": FAILED,
+            }}
+        )
+        return result.modified_count
+
+    async def find_by_job(self, job_id):
+        return await self.fragments.find_one({"transcription_job_id": job_id}, JOB_PROJECTION)
+
+
+def _same_fragment(stored, document):
+    """Indica si el documento guardado tiene los mismos datos que el fragmento embebido."""
+    return all(stored.get(field) == value
+               for field, value in document.items() if field != SEQUENCE_FIELD)
+
+
+async def migrate_embedded_fragments(conversations, fragments):
+    """
+    Mueve los fragmentos embebidos en los documentos de conversación a la
+    colección de fragmentos. Devuelve el número de fragmentos migrados.
+
+    Dos fragmentos embebidos con la misma clave (hablante y start_time) no
+    caben en la colección. Se migra el primero y los demás solo se quitan del
+    array si tienen los mismos datos que el guardado; si no, se dejan
+    embebidos y se avisa, para no perderlos.
+    """
+    migrated = 0
+    collisions = 0
+    cursor = conversations.find(
+        {"fragments.0": {"$exists": True}}, {"conversation_id": 1, "fragments": 1})
+    async for conversation in cursor:
+        conversation_id = conversation["conversation_id"]
+        embedded = conversation.get("fragments") or []
+        documents = []
+        first_by_key = {}
+        for position, fragment in enumerate(embedded):
+            # La posición en el array conserva el orden y queda antes que los
+            # fragmentos nuevos, cuya secuencia es una marca de tiempo
+            document = {**fragment, "conversation_id": conversation_id, SEQUENCE_FIELD: position}
+            document.setdefault("speaker", None)
+            document.setdefault("start_time", None)
+            key = tuple(document[field] for field in FRAGMENT_KEY)
+            documents.append((key, document))
+            first_by_key.setdefault(key, document)
+
+        # Un upsert por clave: $setOnInsert conserva el fragmento si ya se migró
+        # (o se volvió a subir)
+        keys = list(first_by_key)
+        inserted = set()
+        for start in range(0, len(keys), MIGRATION_BATCH_SIZE):
+            batch = keys[start:start + MIGRATION_BATCH_SIZE]
+            results = await asyncio.gather(*[
+                fragments.update_one(dict(zip(FRAGMENT_KEY, key)), {"$setOnInsert": first_by_key[key]}, upsert=True)
+                for key in batch
+            ])
+            inserted.update(key for key, result in zip(batch, results) if result.upserted_id is not None)
+
+        stored = {}
+        for key in first_by_key:
+            if key in inserted:
+                stored[key] = first_by_key[key]
+            else:
+                stored[key] = await fragments.find_one(dict(zip(FRAGMENT_KEY, key))) or {}
+
+        # Solo se quitan los fragmentos que están en la colección, por si llegó
+        # alguno nuevo mientras tanto o hay choques de clave
+        copied = []
+        for fragment, (key, document) in zip(embedded, documents):
+            if _same_fragment(stored[key], document):
+                copied.append(fragment)
+            else:
+                collisions += 1
+                logger.warning(
+                    f"Fragmento embebido de la conversación {conversation_id} con la misma clave "
+                    f"(speaker={key[1]}, start_time={key[2]}) que otro con datos distintos; se deja sin migrar.")
+        if copied:
+            await conversations.update_one(
+                {"_id": conversation["_id"]}, {"$pullAll": {"fragments": copied}})
+        migrated += len(inserted)
+        logger.info(f"Migrados {len(inserted)} fragmentos de la conversación {conversation_id}.")
+    if collisions:
+        logger.warning(f"{collisions} fragmentos embebidos no se migraron por choques de clave.")
+    return migrated
+
+
+if __name__ == "__main__":
+    from app.services.clients import (
+        get_conversations_collection,
+        get_fragments_collection,
+        get_fragment_repository,
+    )
+
+    async def main():
+        await get_fragment_repository().ensure_indexes()
+        migrated = await migrate_embedded_fragments(
+            get_conversations_collection(), get_fragments_collection())
+        print(f"Fragmentos migrados: {migrated}")
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+"""
+Ingesta en streaming de los fragmentos de /record-conversation.
+
+El archivo subido se lee por bloques de INGEST_CHUNK_SIZE. Cada bloque se
+envía a la vez a la subida por partes de S3 y a un único proceso ffmpeg que lo
+decodifica a PCM mono de 16 bits. La transcripción, la duración y el resumen
+de características comparten ese mismo buffer PCM, así que el archivo
+comprimido nunca está entero en memoria ni se decodifica dos veces.
+"""
+import asyncio
+import logging
+import time
+
+from fastapi import HTTPException
+
+from app.config import INGEST_CHUNK_SIZE, INGEST_SAMPLE_RATE
+from app.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+PCM_SAMPLE_WIDTH = 2
+# Entrada de ffmpeg: stdin a través del protocolo cache, que guarda lo leído
+# en un temporal para poder volver atrás. Con pipe:0 a secas, los MP4/M4A con
+# el átomo moov al final (como graban los móviles) no se pueden demultiplexar:
+# ffmpeg no produce audio y aun así termina con código 0.
+FFMPEG_STDIN = "cache:pipe:0"
+
+
+class PCMDecoder:
+    """
+    Decodificador incremental basado en ffmpeg: recibe bloques del archivo
+    original por stdin y acumula el PCM (s16le, mono) que produce por stdout.
+    """
+
+    def __init__(self, sample_rate=INGEST_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self._process = None
+        self._reader = None
+        self._stderr = None
+        self._pcm = bytearray()
+        self._closed = False
+
+    async def start(self):
+        self._process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-i", FFMPEG_STDIN,
+            "-f", "s16le", "-acodec", "pcm_s16le",
+            "-ac", "1", "-ar", str(self.sample_rate),
+            "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        # stdout y stderr se leen mientras se escribe stdin para que ffmpeg no
+        # se bloquee con las tuberías llenas
+        self._reader = asyncio.create_task(self._read_stdout())
+        self._stderr = asyncio.create_task(self._process.stderr.read())
+
+    async def _read_stdout(self):
+        while True:
+            data = await self._process.stdout.read(INGEST_CHUNK_SIZE)
+            if not data:
+                break
+            self._pcm.extend(data)
+
+    async def feed(self, chunk):
+        if self._closed:
+            return
+        try:
+            self._process.stdin.write(chunk)
+            await self._process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg terminó antes de tiempo; finish() informa del error
+            self._closed = True
+
+    async def finish(self):
+        """Cierra la entrada y devuelve el PCM decodificado."""
+        if not self._closed:
+            self._process.stdin.close()
+            self._closed = True
+        await self._reader
+        stderr = await self._stderr
+        if await self._process.wait() != 0:
+            logger.error(f"ffmpeg no pudo decodificar el audio: {stderr.decode(errors='replace')}")
+            raise HTTPException(status_code=400, detail="No se pudo decodificar el audio.")
+        if len(self._pcm) < PCM_SAMPLE_WIDTH:
+            logger.error(f"ffmpeg no devolvió audio: {stderr.decode(errors='replace')}")
+            raise HTTPException(status_code=400, detail="El archivo no contiene audio decodificable.")
+        pcm, self._pcm = self._pcm, bytearray()
+        return pcm
+
+    def kill(self):
+        if self._process is not None and self._process.returncode is None:
+            self._process.kill()
+
+
+async def stream_upload(file, upload):
+    """
+    Lee el UploadFile por bloques y los reparte entre la subida por partes a
+    S3 y el decodificador. Devuelve la URL pública y el PCM decodificado.
+
+    La subida solo se completa cuando el audio se ha decodificado bien; si algo
+    falla, se aborta y se borra el objeto, así que en el bucket no quedan
+    archivos que no se pueden analizar.
+    """
+    decoder = PCMDecoder()
+    # decode: desde que arranca ffmpeg hasta que entrega todo el PCM
+    decode_start = time.perf_counter()
+    await decoder.start()
+    try:
+        while True:
+            chunk = await file.read(INGEST_CHUNK_SIZE)
+            if not chunk:
+                break
+            await asyncio.gather(upload.write(chunk), decoder.feed(chunk))
+
+        pcm = await decoder.finish()
+        observe_stage("decode", time.perf_counter() - decode_start)
+        audio_url = await upload.complete()
+    except BaseException:
+        decoder.kill()
+        await upload.abort()
+        raise
+
+    return audio_url, pcm, decoder.sample_rate
@@ -0,0 +1,137 @@
+"""
+Cola de trabajos de transcripción para el modo asíncrono de /record-conversation.
+
+El fragmento se guarda de inmediato con la transcripción "pending" y la
+petición responde con un job_id. Un grupo de workers del propio proceso
+consume la cola, transcribe en un hilo y actualiza el fragmento en MongoDB.
+Los fallos del reconocedor (errores de servicio o timeouts) se reintentan con
+backoff exponencial y jitter; tras TRANSCRIPTION_MAX_ATTEMPTS el fragmento
+queda con estado "failed".
+
+La cola está acotada a TRANSCRIPTION_QUEUE_SIZE trabajos en espera: con la cola
+llena submit lanza asyncio.QueueFull. Vive en memoria, así que los trabajos
+pendientes se pierden si el proceso se reinicia; al arrancar, los fragmentos
+que siguen en "pending" se marcan como "failed" (ver
+FragmentRepository.fail_pending_transcriptions).
+"""
+import asyncio
+import logging
+import random
+import uuid
+from collections import OrderedDict
+
+from app.config import (
+    TRANSCRIPTION_WORKERS,
+    TRANSCRIPTION_MAX_ATTEMPTS,
+    TRANSCRIPTION_RETRY_BASE_SECONDS,
+    TRANSCRIPTION_QUEUE_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+# Número máximo de trabajos terminados que se recuerdan en memoria
+MAX_TRACKED_JOBS = 10000
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Transcripciones guardadas para los trabajos que no llegan a ejecutarse
+QUEUE_FULL_TRANSCRIPTION = "Error de servicio; cola de transcripción llena."
+INTERRUPTED_TRANSCRIPTION = "Error de servicio; transcripción interrumpida por un reinicio."
+
+
+class TranscriptionQueue:
+    def __init__(self, on_result, workers=TRANSCRIPTION_WORKERS,
+                 max_attempts=TRANSCRIPTION_MAX_ATTEMPTS,
+                 retry_base_seconds=TRANSCRIPTION_RETRY_BASE_SECONDS,
+                 max_queued=TRANSCRIPTION_QUEUE_SIZE):
+        """
+        on_result(job, result, status) es una corrutina que persiste el
+        resultado ({"text", "segments"}) de cada trabajo terminado.
+        """
+        self.on_result = on_result
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.max_queued = max_queued
+        self.jobs = OrderedDict()
+        self._queue = None
+        self._tasks = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def full(self):
+        return self._queue is not None and self._queue.full()
+
+    def submit(self, transcribe, job_id=None, **metadata):
+        """
+        Encola transcribe (una función síncrona sin argumentos que devuelve
+        {"text", "segments"}) y devuelve el job_id. Lanza asyncio.QueueFull si
+        ya hay max_queued trabajos en espera.
+        """
+        if not self._tasks:
+            self.start()
+
+        job_id = job_id or str(uuid.uuid4())
+        job = {
+            "job_id": job_id, "status": PENDING, "attempts": 0,
+            "error": None, "transcription": None, **metadata
+        }
+        self._queue.put_nowait((job, transcribe))
+
+        self.jobs[job_id] = job
+        while len(self.jobs) > MAX_TRACKED_JOBS:
+            self.jobs.popitem(last=False)
+        return job_id
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job, transcribe = await self._queue.get()
+            try:
+                await self._run(job, transcribe)
+            except Exception:
+                logger.exception(f"Error inesperado en el trabajo de transcripción {job['job_id']}.")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job, transcribe):
+        job["status"] = RUNNING
+        while True:
+            job["attempts"] += 1
+            try:
+                result = await asyncio.to_thread(transcribe)
+            except Exception as e:
+                job["error"] = str(e)
+                if job["attempts"] >= self.max_attempts:
+                    logger.error(f"Transcripción {job['job_id']} fallida tras {job['attempts']} intentos: {e}")
+                    job["status"] = FAILED
+                    job["transcription"] = f"Error de servicio; {e}"
+                    await self.on_result(job, {"text": job["transcription"], "segments": []}, FAILED)
+                    return
+
+                delay = self.retry_base_seconds * 2 ** (job["attempts"] - 1)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+                continue
+
+            job["status"] = DONE
+            job["error"] = None
+            job["transcription"] = result["text"]
+            await self.on_result(job, result, DONE)
+            return
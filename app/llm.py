@@ -0,0 +1,531 @@
+"""
+Capa común de llamadas a la API de chat de OpenAI.
+
+Todas las llamadas comparten un único OpenAIClient (pool de conexiones
+keep-alive, límite de concurrencia, límite de ritmo y reintentos).
+
+analyze_text, generate_report y call_openai_api pasan por chat_completion, que
+guarda las respuestas en una caché direccionada por contenido: la clave es el
+hash de (modelo, mensajes, parámetros), así que un prompt idéntico (un
+reintento del cliente, la misma pareja en /matchmaking) se responde sin ir a
+la red. La caché tiene un nivel LRU en memoria y, si se configura
+LLM_CACHE_PATH, un nivel persistente en SQLite con TTL y desalojo por tamaño.
+
+Solo se guardan respuestas completas (finish_reason "stop") que el llamador
+ha dado por buenas con validate; una respuesta mal formada no se cachea, así
+que el reintento del cliente vuelve a preguntar a OpenAI.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+import httpx
+
+from app.config import (
+    OPENAI_BASE_URL,
+    OPENAI_TIMEOUT_SECONDS,
+    OPENAI_MAX_CONCURRENCY,
+    OPENAI_MAX_RETRIES,
+    OPENAI_RETRY_BASE_SECONDS,
+    OPENAI_REQUESTS_PER_MINUTE,
+    OPENAI_TOKENS_PER_MINUTE,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_PATH,
+    LLM_CACHE_MAX_DISK_BYTES,
+)
+from app.metrics import LLM_REQUESTS, record_llm_usage, track
+
+logger = logging.getLogger(__name__)
+# httpx registra cada petición a OpenAI en INFO; ya se cuentan en patricia_llm_requests_total
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+DEFAULT_MODEL = "gpt-4o-mini"
+_DURATION_RE = re.compile(r"(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m(?!s))?(?:(\d+(?:\.\d+)?)s)?(?:(\d+(?:\.\d+)?)ms)?")
+
+
+class LLMError(Exception):
+    def __init__(self, status_code, text):
+        super().__init__(f"Error in request: {status_code}, {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+def cache_key(model, messages, params):
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Nivel persistente de la caché en SQLite. Las entradas caducan tras
+    ttl_seconds y, si el total supera max_bytes, se borran las usadas hace
+    más tiempo.
+    """
+
+    def __init__(self, path, ttl_seconds, max_bytes):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return value
+
+    def put(self, key, value):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)", (key, value, size, now, now))
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            if total > self.max_bytes:
+                # Desaloja las entradas menos usadas hasta volver al límite
+                excess = total - self.max_bytes
+                freed = 0
+                stale = []
+                for old_key, old_size in self._conn.execute(
+                        "SELECT key, size FROM llm_cache ORDER BY accessed_at"):
+                    if freed >= excess:
+                        break
+                    stale.append((old_key,))
+                    freed += old_size
+                self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", stale)
+            self._conn.commit()
+
+
+class LLMCache:
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES, ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                 path=LLM_CACHE_PATH, max_disk_bytes=LLM_CACHE_MAX_DISK_BYTES):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._disk = DiskCache(path, ttl_seconds, max_disk_bytes) if path else None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _get_memory(self, key):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() > expires_at:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _put_memory(self, key, value):
+        self._memory[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key):
+        value = self._get_memory(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            return value
+
+        if self._disk is not None:
+            value = await asyncio.to_thread(self._disk.get, key)
+            if value is not None:
+                self.stats["disk_hits"] += 1
+                self._put_memory(key, value)
+                return value
+
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, key, value):
+        self._put_memory(key, value)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.put, key, value)
+
+    def snapshot(self):
+        return {**self.stats, "memory_entries": len(self._memory)}
+
+
+def parse_reset(value):
+    """
+    Convierte las duraciones de las cabeceras x-ratelimit-reset-* de OpenAI
+    ("20ms", "1s", "6m0s", "1h2m3.5s") a segundos.
+    """
+    if not value:
+        return None
+    match = _DURATION_RE.fullmatch(value.strip())
+    if not match or not any(match.groups()):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    hours, minutes, seconds, millis = (float(group or 0) for group in match.groups())
+    return hours * 3600 + minutes * 60 + seconds + millis / 1000
+
+
+class TokenBucket:
+    """
+    Cubo de tokens que se rellena a capacity por minuto, como los límites
+    RPM/TPM de OpenAI. Las cabeceras de cada respuesta lo resincronizan con
+    los valores reales del servidor.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def wait_time(self, amount):
+        self._refill()
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60 / self.capacity
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def sync(self, limit, remaining, reset_seconds):
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.tokens = float(remaining)
+            self._updated = time.monotonic()
+            if remaining <= 0 and reset_seconds:
+                self._blocked_until = time.monotonic() + reset_seconds
+
+
+class RateLimiter:
+    """Límites de peticiones y de tokens por minuto de la cuenta de OpenAI."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, estimated_tokens):
+        async with self._lock:
+            while True:
+                delay = max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            self.requests.take(1)
+            self.tokens.take(estimated_tokens)
+
+    def update(self, headers):
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            limit = _int_header(headers, f"x-ratelimit-limit-{kind}")
+            remaining = _int_header(headers, f"x-ratelimit-remaining-{kind}")
+            reset = parse_reset(headers.get(f"x-ratelimit-reset-{kind}"))
+            bucket.sync(limit, remaining, reset)
+
+
+def _int_header(headers, name):
+    try:
+        return int(headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+class OpenAIClient:
+    """
+    Cliente HTTP compartido para la API de OpenAI: conexiones keep-alive
+    reutilizadas, como mucho max_concurrency peticiones en vuelo, límite de
+    ritmo según las cabeceras x-ratelimit-* y reintentos con backoff
+    exponencial y jitter ante 429, 5xx y timeouts.
+    """
+
+    RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+    def __init__(self, base_url=OPENAI_BASE_URL, max_concurrency=OPENAI_MAX_CONCURRENCY,
+                 max_retries=OPENAI_MAX_RETRIES, retry_base_seconds=OPENAI_RETRY_BASE_SECONDS,
+                 requests_per_minute=OPENAI_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=OPENAI_TOKENS_PER_MINUTE, transport=None):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http = httpx.AsyncClient(
+            timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+            transport=transport,
+        )
+
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}",
+            "Content-Type": "application/json"
+        }
+
+    def _retry_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = parse_reset(response.headers.get("retry-after")) or max(
+                parse_reset(response.headers.get("x-ratelimit-reset-requests")) or 0,
+                parse_reset(response.headers.get("x-ratelimit-reset-tokens")) or 0,
+            )
+            if retry_after:
+                return retry_after + random.uniform(0, self.retry_base_seconds)
+        # Backoff exponencial con jitter completo
+        return random.uniform(0, self.retry_base_seconds * 2 ** attempt)
+
+    async def post(self, path, payload):
+        estimated_tokens = len(json.dumps(payload, ensure_ascii=False)) // 4
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(estimated_tokens)
+            response = None
+            try:
+                async with self._semaphore:
+                    response = await self._http.post(
+                        f"{self.base_url}{path}", headers=self._headers(), json=payload)
+                self.rate_limiter.update(response.headers)
+                if response.status_code not in self.RETRY_STATUS:
+                    return response
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if attempt >= self.max_retries:
+                    raise LLMError(504, f"OpenAI no respondió: {e}")
+
+            if attempt >= self.max_retries:
+                return response
+            delay = self._retry_delay(attempt, response)
+            status = response.status_code if response is not None else "timeout"
+            LLM_REQUESTS.labels("retry").inc()
+            logger.warning(f"OpenAI respondió {status}; reintento {attempt + 1} en {delay:.2f}s.")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @asynccontextmanager
+    async def stream(self, path, payload):
+        """
+        Como post, pero devuelve la respuesta sin leer el cuerpo. Los
+        reintentos solo se hacen antes de empezar a leerla, y el hueco de
+        concurrencia se mantiene mientras dura la lectura.
+        """
+        estimated_tokens = len(json.dumps(payload, ensure_ascii=False)) // 4
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(estimated_tokens)
+            async with self._semaphore:
+                response = None
+                try:
+                    request = self._http.build_request(
+                        "POST", f"{self.base_url}{path}", headers=self._headers(), json=payload)
+                    response = await self._http.send(request, stream=True)
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    if attempt >= self.max_retries:
+                        raise LLMError(504, f"OpenAI no respondió: {e}")
+
+                if response is not None:
+                    self.rate_limiter.update(response.headers)
+                    if response.status_code not in self.RETRY_STATUS or attempt >= self.max_retries:
+                        try:
+                            yield response
+                        finally:
+                            await response.aclose()
+                        return
+                    await response.aclose()
+
+            delay = self._retry_delay(attempt, response)
+            status = response.status_code if response is not None else "timeout"
+            LLM_REQUESTS.labels("retry").inc()
+            logger.warning(f"OpenAI respondió {status}; reintento {attempt + 1} en {delay:.2f}s.")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+_openai_client = None
+_llm_cache = None
+
+
+def get_openai_client():
+    """Cliente compartido, creado en la primera llamada a OpenAI."""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = OpenAIClient()
+    return _openai_client
+
+
+def get_llm_cache():
+    """Caché de respuestas (None si LLM_CACHE_ENABLED está desactivado)."""
+    global _llm_cache
+    if _llm_cache is None and LLM_CACHE_ENABLED:
+        _llm_cache = LLMCache()
+    return _llm_cache
+
+
+async def close_openai_client():
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.aclose()
+        _openai_client = None
+
+
+def _check_response(content, finish_reason, validate):
+    """
+    Valida el texto de una respuesta con validate (si lanza una excepción, se
+    propaga al llamador) e indica si se puede guardar en la caché: solo si
+    está completa.
+    """
+    if validate is not None:
+        validate(content)
+    if finish_reason != "stop":
+        logger.warning(f"Respuesta de OpenAI incompleta (finish_reason={finish_reason}); no se guarda en caché.")
+        return False
+    return True
+
+
+async def chat_completion(prompt, model=DEFAULT_MODEL, use_cache=True, validate=None, **params):
+    """
+    Envía prompt como único mensaje de usuario y devuelve la respuesta JSON
+    completa de la API. Lanza LLMError si la API responde con error.
+
+    validate recibe el texto de la respuesta y debe lanzar una excepción si no
+    es válido: en ese caso la excepción se propaga y la respuesta no se guarda
+    en la caché.
+    """
+    messages = [{"role": "user", "content": prompt}]
+    key = cache_key(model, messages, params)
+    llm_cache = get_llm_cache()
+    caching = use_cache and llm_cache is not None
+
+    if caching:
+        cached = await llm_cache.get(key)
+        if cached is not None:
+            LLM_REQUESTS.labels("cache_hit").inc()
+            return json.loads(cached)
+
+    with track("llm"):
+        response = await get_openai_client().post(
+            "/chat/completions", {"model": model, "messages": messages, **params})
+    if response.status_code != 200:
+        LLM_REQUESTS.labels("error").inc()
+        raise LLMError(response.status_code, response.text)
+
+    LLM_REQUESTS.labels("ok").inc()
+    response_json = response.json()
+    record_llm_usage(model, response_json.get("usage"))
+    choice = response_json["choices"][0]
+    if _check_response(choice["message"]["content"], choice.get("finish_reason"), validate) and caching:
+        await llm_cache.put(key, response.text)
+    return response_json
+
+
+async def stream_chat_completion(prompt, model=DEFAULT_MODEL, use_cache=True, validate=None, **params):
+    """
+    Como chat_completion, pero genera el texto de la respuesta por trozos a
+    medida que llega (stream de la API). La respuesta completa se guarda en la
+    misma caché que chat_completion; si ya estaba, se genera de una vez.
+    validate se aplica al texto completo al terminar el stream.
+    """
+    messages = [{"role": "user", "content": prompt}]
+    key = cache_key(model, messages, params)
+    llm_cache = get_llm_cache()
+    caching = use_cache and llm_cache is not None
+
+    if caching:
+        cached = await llm_cache.get(key)
+        if cached is not None:
+            LLM_REQUESTS.labels("cache_hit").inc()
+            yield completion_content(json.loads(cached))
+            return
+
+    parts = []
+    finish_reason = None
+    # include_usage: el último evento trae el uso de tokens (sin choices)
+    payload = {"model": model, "messages": messages, "stream": True,
+               "stream_options": {"include_usage": True}, **params}
+    with track("llm"):
+        async with get_openai_client().stream("/chat/completions", payload) as response:
+            if response.status_code != 200:
+                LLM_REQUESTS.labels("error").inc()
+                body = await response.aread()
+                raise LLMError(response.status_code, body.decode(errors="replace"))
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                record_llm_usage(model, event.get("usage"))
+                choices = event.get("choices") or []
+                if choices and choices[0].get("finish_reason"):
+                    finish_reason = choices[0]["finish_reason"]
+                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+    LLM_REQUESTS.labels("ok").inc()
+
+    content = "".join(parts)
+    if _check_response(content, finish_reason, validate) and caching:
+        # Mismo formato que la respuesta sin stream para compartir la entrada
+        await llm_cache.put(key, json.dumps(
+            {"choices": [{"finish_reason": finish_reason,
+                          "message": {"role": "assistant", "content": content}}]},
+            ensure_ascii=False))
+
+
+def completion_content(response_json):
+    return response_json["choices"][0]["message"]["content"]
+
+
+def cache_stats():
+    llm_cache = get_llm_cache()
+    if llm_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **llm_cache.snapshot()}
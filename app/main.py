@@ -1,11 +1,56 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from app.routes.conversation import router as conversation_router
 from app.routes.audio import router as audio_router
 from app.routes.analysis import router as analysis_router
 from app.routes.matchmaking import router as matchmaking_router
+from app.executor import start_process_pool, shutdown_process_pool
+from app.services.clients import get_transcription_queue, get_course_catalog, close_clients
+from app.services.conversations import prepare_fragment_storage
+from app.services.matchmaking import load_matchmaking_index, save_matchmaking_index
+from app.config import COURSE_CATALOG_CHANGE_STREAM, ANALYSIS_WORKERS
+from app.llm import cache_stats, close_openai_client
+from app.metrics import MetricsMiddleware, render_metrics
+from app.admission import AdmissionMiddleware
+from app.readiness import readiness, READY
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Los subsistemas pesados se preparan en segundo plano; /ready indica
+    # cuándo están listos. El pool de procesos se calienta con librosa, así que
+    # con ANALYSIS_WORKERS=0 este proceso no llega a cargarlo.
+    if ANALYSIS_WORKERS > 0:
+        readiness.warm("audio_analysis", start_process_pool)
+    else:
+        readiness.disable("audio_analysis")
+    readiness.warm("fragment_storage", prepare_fragment_storage)
+    readiness.warm("matchmaking_index", load_matchmaking_index)
+    get_transcription_queue().start()
+    catalog_watcher = None
+    if COURSE_CATALOG_CHANGE_STREAM:
+        catalog_watcher = asyncio.create_task(get_course_catalog().watch())
+    yield
+    if catalog_watcher is not None:
+        catalog_watcher.cancel()
+    await readiness.stop()
+    await get_transcription_queue().stop()
+    # Si el snapshot no llegó a cargarse, guardar el índice lo sobrescribiría
+    if readiness.subsystems.get("matchmaking_index") == READY:
+        await save_matchmaking_index()
+    shutdown_process_pool()
+    await close_openai_client()
+    close_clients()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Control de admisión por clase de endpoint; por dentro de CORS para que los
+# 429/503 lleven sus cabeceras. Ver app.admission
+app.add_middleware(AdmissionMiddleware)
 
 # Habilita CORS para permitir solicitudes de cualquier origen
 app.add_middleware(
@@ -15,6 +60,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Métricas de cada petición (y perfilado opcional); ver app.metrics
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(conversation_router)
 app.include_router(audio_router)
@@ -24,3 +71,21 @@ app.include_router(matchmaking_router)
 @app.get("/")
 async def read_root():
     return {"message": "Welcome to the Patricia Agent API!"}
+
+
+@app.get("/ready")
+async def ready():
+    # 200 cuando todos los subsistemas están listos; 503 mientras se calientan
+    status = readiness.snapshot()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+
+@app.get("/llm-cache/stats")
+async def llm_cache_stats():
+    return cache_stats()
@@ -0,0 +1,118 @@
+"""
+Preselección local de parejas para /matchmaking/batch.
+
+Las mismas características que analyze_data calcula para una pareja se
+calculan aquí para una persona frente a todos los candidatos a la vez, como
+arrays de NumPy: diferencia de edad, número de intereses, hobbies y temas en
+común y coincidencia de preferencias, valores y comportamiento digital. Con
+ellas se calcula una puntuación local determinista y solo los mejores
+candidatos pasan a la evaluación con OpenAI.
+"""
+from itertools import chain
+
+import numpy as np
+
+from app.config import MATCHMAKING_MAX_AGE_GAP
+
+SET_FEATURES = {
+    "interest_common": "interests",
+    "hobbies_common": "hobbies",
+    "conversation_topics_common": "conversation_topics",
+}
+MATCH_FEATURES = {
+    "learning_preferences_match": "learning_preferences",
+    "user_values_match": "user_values",
+    "digital_behavior_match": "digital_behavior",
+}
+
+# Pesos de la puntuación local. Los elementos en común se normalizan por los
+# de la persona buscada y la diferencia de edad penaliza hasta
+# MATCHMAKING_MAX_AGE_GAP años.
+LOCAL_SCORE_WEIGHTS = {
+    "interest_common": 0.25,
+    "hobbies_common": 0.2,
+    "conversation_topics_common": 0.2,
+    "learning_preferences_match": 0.1,
+    "user_values_match": 0.15,
+    "digital_behavior_match": 0.1,
+    "age_difference": -0.1,
+}
+
+
+def _common_counts(values, candidate_values):
+    """
+    Número de elementos distintos de cada candidato que también están en
+    values. Los elementos se codifican como enteros en una sola pasada y el
+    conteo se hace con bincount.
+    """
+    vocabulary = {value: code for code, value in enumerate(set(values))}
+    candidate_sets = [set(items) for items in candidate_values]
+    lengths = np.fromiter((len(items) for items in candidate_sets), dtype=np.int64,
+                          count=len(candidate_sets))
+    codes = np.fromiter((vocabulary.get(item, -1) for item in chain.from_iterable(candidate_sets)),
+                        dtype=np.int64, count=int(lengths.sum()))
+    owners = np.repeat(np.arange(len(candidate_sets)), lengths)
+    return np.bincount(owners[codes >= 0], minlength=len(candidate_sets))
+
+
+def _matches(value, candidate_values):
+    # Las listas (user_values) se comparan enteras, como en analyze_data
+    key = tuple(value) if isinstance(value, list) else value
+    return np.fromiter(
+        ((tuple(other) if isinstance(other, list) else other) == key for other in candidate_values),
+        dtype=bool, count=len(candidate_values))
+
+
+def pair_features(person, candidates):
+    """
+    Características de analyze_data de person frente a cada candidato, como
+    un dict de arrays con un elemento por candidato.
+    """
+    dob = np.datetime64(person.user.date_of_birth, "D")
+    candidate_dobs = np.array([c.user.date_of_birth for c in candidates], dtype="datetime64[D]")
+    days = (dob - candidate_dobs).astype(np.int64)
+
+    features = {"age_difference": np.abs(days // 365)}
+    for name, attribute in SET_FEATURES.items():
+        features[name] = _common_counts(
+            getattr(person, attribute), [getattr(c, attribute) for c in candidates])
+    for name, attribute in MATCH_FEATURES.items():
+        features[name] = _matches(
+            getattr(person, attribute), [getattr(c, attribute) for c in candidates])
+    return features
+
+
+def local_scores(person, features):
+    scores = np.zeros(len(features["age_difference"]))
+    for name, attribute in SET_FEATURES.items():
+        scores += LOCAL_SCORE_WEIGHTS[name] * features[name] / max(1, len(set(getattr(person, attribute))))
+    for name in MATCH_FEATURES:
+        scores += LOCAL_SCORE_WEIGHTS[name] * features[name]
+    age_gap = np.minimum(features["age_difference"], MATCHMAKING_MAX_AGE_GAP) / MATCHMAKING_MAX_AGE_GAP
+    scores += LOCAL_SCORE_WEIGHTS["age_difference"] * age_gap
+    return scores
+
+
+def top_candidates(scores, k):
+    """
+    Índices de las k mejores puntuaciones, de mayor a menor. Los empates se
+    resuelven por el orden de los candidatos para que el resultado sea estable.
+    """
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    # argpartition preselecciona sin ordenar todo el array; se recogen todos los
+    # empatados con el umbral para desempatar por índice
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    threshold = scores[candidates].min()
+    candidates = np.flatnonzero(scores >= threshold)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:k]
+
+
+def feature_row(features, index):
+    """Características de un candidato con los mismos tipos que analyze_data."""
+    return {
+        name: (bool(values[index]) if values.dtype == bool else int(values[index]))
+        for name, values in features.items()
+    }
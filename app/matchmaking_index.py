@@ -0,0 +1,276 @@
+"""
+Índice persistente de perfiles para el matchmaking.
+
+Los perfiles se registran una vez. Sus intereses, hobbies y temas de
+conversación se convierten en ids enteros (uno por término distinto) y se
+guardan en listas invertidas: para cada término, los huecos (slots) de los
+perfiles que lo tienen. Las preferencias de aprendizaje, los valores y el
+comportamiento digital se indexan igual, con un id por valor completo. Una
+consulta solo recorre las listas de los términos de la persona buscada.
+
+Un perfil sin nada en común con la persona buscada puntúa solo por la
+diferencia de edad, entre -0.1 y 0, así que puede superar a uno con poco en
+común y mucha diferencia de edad. Si los k mejores perfiles con algo en común
+no puntúan todos por encima de 0 (o no llegan a k), la consulta puntúa todos
+los perfiles, con arrays de NumPy como /matchmaking/batch.
+
+Las características calculadas para cada candidato son las mismas que
+devuelve analyze_data y la ordenación (incluidos los empates, por orden de
+slot) es la misma que la de /matchmaking/batch con los perfiles en ese orden. El índice admite altas, actualizaciones y bajas y se
+guarda en disco (JSON con los ids ya asignados) para arrancar sin volver a
+validar ni a internar cada perfil.
+"""
+import json
+import logging
+import os
+from collections import defaultdict
+
+import numpy as np
+
+from app.matchmaking import SET_FEATURES, MATCH_FEATURES, local_scores, top_candidates, feature_row
+from app.models import PersonModel
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+SET_ATTRIBUTES = tuple(SET_FEATURES.values())
+MATCH_ATTRIBUTES = tuple(MATCH_FEATURES.values())
+INITIAL_CAPACITY = 1024
+
+
+def _match_key(value):
+    # user_values es una lista y se compara entera, como en analyze_data
+    return tuple(value) if isinstance(value, list) else value
+
+
+class Vocabulary:
+    """Asigna un id entero estable a cada término distinto."""
+
+    def __init__(self, terms=()):
+        self.terms = list(terms)
+        self.ids = {term: term_id for term_id, term in enumerate(self.terms)}
+
+    def intern(self, term):
+        term_id = self.ids.get(term)
+        if term_id is None:
+            term_id = len(self.terms)
+            self.ids[term] = term_id
+            self.terms.append(term)
+        return term_id
+
+    def lookup(self, term):
+        return self.ids.get(term, -1)
+
+
+class MatchmakingIndex:
+    def __init__(self):
+        self.vocabularies = {attribute: Vocabulary() for attribute in SET_ATTRIBUTES + MATCH_ATTRIBUTES}
+        self._postings = {attribute: defaultdict(set) for attribute in SET_ATTRIBUTES + MATCH_ATTRIBUTES}
+        self._slots = {}
+        self._slot_ids = []
+        self._free_slots = []
+        self._terms = {attribute: [] for attribute in SET_ATTRIBUTES}
+        self._values = {attribute: np.full(INITIAL_CAPACITY, -1, dtype=np.int64)
+                        for attribute in MATCH_ATTRIBUTES}
+        self._dob_days = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, profile_id):
+        return profile_id in self._slots
+
+    def _allocate_slot(self, profile_id):
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._slot_ids[slot] = profile_id
+        else:
+            slot = len(self._slot_ids)
+            self._slot_ids.append(profile_id)
+            for terms in self._terms.values():
+                terms.append(())
+            if slot >= len(self._dob_days):
+                capacity = 2 * len(self._dob_days)
+                self._dob_days = np.resize(self._dob_days, capacity)
+                for attribute, values in self._values.items():
+                    grown = np.full(capacity, -1, dtype=np.int64)
+                    grown[:len(values)] = values
+                    self._values[attribute] = grown
+        self._slots[profile_id] = slot
+        return slot
+
+    def _store(self, slot, dob_days, set_ids, match_ids):
+        self._dob_days[slot] = dob_days
+        for attribute, term_ids in set_ids.items():
+            self._terms[attribute][slot] = term_ids
+            for term_id in term_ids:
+                self._postings[attribute][term_id].add(slot)
+        for attribute, value_id in match_ids.items():
+            self._values[attribute][slot] = value_id
+            self._postings[attribute][value_id].add(slot)
+
+    def _unlink(self, slot):
+        for attribute in SET_ATTRIBUTES:
+            for term_id in self._terms[attribute][slot]:
+                self._postings[attribute][term_id].discard(slot)
+            self._terms[attribute][slot] = ()
+        for attribute in MATCH_ATTRIBUTES:
+            self._postings[attribute][int(self._values[attribute][slot])].discard(slot)
+            self._values[attribute][slot] = -1
+
+    def upsert(self, profile_id, person: PersonModel):
+        """
+        Da de alta el perfil o reemplaza el existente. Lanza ValueError si la
+        fecha de nacimiento no es válida.
+        """
+        dob_days = int(np.datetime64(person.user.date_of_birth, "D").astype(np.int64))
+        set_ids = {
+            attribute: tuple(sorted(self.vocabularies[attribute].intern(term)
+                                    for term in set(getattr(person, attribute))))
+            for attribute in SET_ATTRIBUTES
+        }
+        match_ids = {
+            attribute: self.vocabularies[attribute].intern(_match_key(getattr(person, attribute)))
+            for attribute in MATCH_ATTRIBUTES
+        }
+
+        slot = self._slots.get(profile_id)
+        if slot is None:
+            slot = self._allocate_slot(profile_id)
+        else:
+            self._unlink(slot)
+        self._store(slot, dob_days, set_ids, match_ids)
+
+    def delete(self, profile_id):
+        slot = self._slots.pop(profile_id, None)
+        if slot is None:
+            return False
+        self._unlink(slot)
+        self._slot_ids[slot] = None
+        self._free_slots.append(slot)
+        return True
+
+    def get(self, profile_id):
+        """Reconstruye el perfil a partir del índice (sin elementos repetidos)."""
+        slot = self._slots.get(profile_id)
+        if slot is None:
+            return None
+        profile = {
+            "user": {"date_of_birth": str(np.datetime64(int(self._dob_days[slot]), "D"))},
+        }
+        for attribute in SET_ATTRIBUTES:
+            terms = self.vocabularies[attribute].terms
+            profile[attribute] = [terms[term_id] for term_id in self._terms[attribute][slot]]
+        for attribute in MATCH_ATTRIBUTES:
+            value = self.vocabularies[attribute].terms[int(self._values[attribute][slot])]
+            profile[attribute] = list(value) if isinstance(value, tuple) else value
+        return PersonModel(**profile)
+
+    def _posting_array(self, attribute, term_id):
+        slots = self._postings[attribute].get(term_id, ())
+        return np.fromiter(slots, dtype=np.int64, count=len(slots))
+
+    def query(self, person: PersonModel, k, exclude=None):
+        """
+        Los k perfiles con mejor puntuación local frente a person, de mayor a
+        menor, como (profile_id, puntuación, características de analyze_data).
+        """
+        query_terms = {
+            attribute: {self.vocabularies[attribute].lookup(term) for term in set(getattr(person, attribute))} - {-1}
+            for attribute in SET_ATTRIBUTES
+        }
+        match_ids = {
+            attribute: self.vocabularies[attribute].lookup(_match_key(getattr(person, attribute)))
+            for attribute in MATCH_ATTRIBUTES
+        }
+
+        set_hits = {
+            attribute: [self._posting_array(attribute, term_id) for term_id in term_ids]
+            for attribute, term_ids in query_terms.items()
+        }
+        touched = [array for arrays in set_hits.values() for array in arrays]
+        touched += [self._posting_array(attribute, value_id)
+                    for attribute, value_id in match_ids.items() if value_id >= 0]
+        excluded = self._slots.get(exclude) if exclude is not None else None
+        dob_days = int(np.datetime64(person.user.date_of_birth, "D").astype(np.int64))
+
+        slots = np.unique(np.concatenate(touched)) if touched else np.empty(0, dtype=np.int64)
+        slots = slots[slots != excluded]
+        features, scores = self._score(person, slots, set_hits, match_ids, dob_days)
+        best = top_candidates(scores, k)
+        available = len(self._slots) - (excluded is not None)
+        if slots.size < available and (len(best) < k or scores[best[-1]] <= 0):
+            # Algún perfil sin nada en común puede estar entre los mejores
+            slots = np.array(sorted(self._slots.values()), dtype=np.int64)
+            slots = slots[slots != excluded]
+            features, scores = self._score(person, slots, set_hits, match_ids, dob_days)
+            best = top_candidates(scores, k)
+
+        return [
+            (self._slot_ids[slots[i]], float(scores[i]), feature_row(features, i))
+            for i in best
+        ]
+
+    def _score(self, person, slots, set_hits, match_ids, dob_days):
+        """Características de analyze_data y puntuación local de los perfiles de slots (ordenados)."""
+        features = {"age_difference": np.abs((dob_days - self._dob_days[slots]) // 365)}
+        for name, attribute in SET_FEATURES.items():
+            arrays = set_hits[attribute]
+            hits = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+            positions = np.searchsorted(slots, hits)
+            # Los hits del perfil excluido no están en slots
+            valid = (positions < len(slots)) & (slots[np.minimum(positions, len(slots) - 1)] == hits)
+            features[name] = np.bincount(positions[valid], minlength=len(slots))
+        for name, attribute in MATCH_FEATURES.items():
+            features[name] = self._values[attribute][slots] == match_ids[attribute]
+        return features, local_scores(person, features)
+
+    def snapshot_state(self):
+        def encode(term):
+            return list(term) if isinstance(term, tuple) else term
+
+        return {
+            "version": SNAPSHOT_VERSION,
+            "vocabularies": {
+                attribute: [encode(term) for term in vocabulary.terms]
+                for attribute, vocabulary in self.vocabularies.items()
+            },
+            "profiles": [
+                [
+                    profile_id,
+                    int(self._dob_days[slot]),
+                    {attribute: list(self._terms[attribute][slot]) for attribute in SET_ATTRIBUTES},
+                    {attribute: int(self._values[attribute][slot]) for attribute in MATCH_ATTRIBUTES},
+                ]
+                for profile_id, slot in self._slots.items()
+            ],
+        }
+
+    def save(self, path, state=None):
+        """Escribe el índice en path de forma atómica."""
+        state = state if state is not None else self.snapshot_state()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        logger.info(f"Índice de matchmaking guardado: {len(state['profiles'])} perfiles.")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Versión de snapshot no soportada: {state.get('version')}")
+
+        index = cls()
+        for attribute, terms in state["vocabularies"].items():
+            if attribute in MATCH_ATTRIBUTES:
+                terms = [tuple(term) if isinstance(term, list) else term for term in terms]
+            index.vocabularies[attribute] = Vocabulary(terms)
+        for profile_id, dob_days, set_ids, match_ids in state["profiles"]:
+            slot = index._allocate_slot(profile_id)
+            index._store(slot, dob_days,
+                         {attribute: tuple(ids) for attribute, ids in set_ids.items()},
+                         match_ids)
+        logger.info(f"Índice de matchmaking cargado: {len(index)} perfiles.")
+        return index
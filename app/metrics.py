@@ -0,0 +1,226 @@
+"""
+Métricas de Prometheus de la API, expuestas en GET /metrics.
+
+- patricia_stage_seconds{stage}: duración de cada etapa de trabajo (s3_get,
+  s3_put, decode, feature_extraction, transcription, llm y las etapas del
+  pipeline de /analyze-conversation). patricia_stage_in_flight{stage} cuenta
+  las que están en curso y patricia_stage_errors_total{stage} las que fallan.
+- patricia_mongo_command_seconds{command}: cada comando enviado a MongoDB,
+  medido por pymongo con un CommandListener.
+- patricia_http_request_seconds{method, route, status} y
+  patricia_http_requests_in_flight{method}: MetricsMiddleware. La ruta es la
+  plantilla (/matchmaking/profiles/{profile_id}), no la URL, para acotar la
+  cardinalidad.
+- patricia_llm_requests_total{outcome} y patricia_llm_tokens_total{model, kind}.
+- Contadores agregados que sustituyen a los logs por elemento de los bucles
+  calientes: fragmentos descargados, trozos transcritos y candidatos de
+  matchmaking.
+- patricia_admission_*{lane}: peticiones en curso, en cola, rechazadas y
+  espera en cola del control de admisión (app.admission).
+
+El trabajo CPU (decode, feature_extraction) se ejecuta en el pool de
+procesos, así que se mide desde este proceso alrededor de run_cpu_bound e
+incluye la espera por un worker libre.
+
+Con PROFILING_ENABLED, una petición con la cabecera PROFILING_HEADER se
+perfila con pyinstrument (profiler de muestreo, dependencia opcional). El
+informe HTML se guarda en PROFILING_OUTPUT_DIR y su nombre se devuelve en la
+cabecera X-Profile-Id de la respuesta.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from app.config import (
+    PROFILING_ENABLED,
+    PROFILING_HEADER,
+    PROFILING_OUTPUT_DIR,
+    PROFILING_INTERVAL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# De 5 ms a 2 minutos: cubre desde una consulta a MongoDB hasta un análisis largo
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    "patricia_stage_seconds", "Duración de las etapas de trabajo.", ["stage"], buckets=LATENCY_BUCKETS)
+STAGE_IN_FLIGHT = Gauge(
+    "patricia_stage_in_flight", "Etapas de trabajo en curso.", ["stage"])
+STAGE_ERRORS = Counter(
+    "patricia_stage_errors_total", "Etapas de trabajo que terminaron con una excepción.", ["stage"])
+MONGO_COMMAND_SECONDS = Histogram(
+    "patricia_mongo_command_seconds", "Duración de los comandos de MongoDB.", ["command"],
+    buckets=LATENCY_BUCKETS)
+MONGO_COMMAND_ERRORS = Counter(
+    "patricia_mongo_command_errors_total", "Comandos de MongoDB fallidos.", ["command"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "patricia_http_request_seconds", "Duración de las peticiones HTTP, hasta el último byte.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+HTTP_IN_FLIGHT = Gauge(
+    "patricia_http_requests_in_flight", "Peticiones HTTP en curso.", ["method"])
+LLM_REQUESTS = Counter(
+    "patricia_llm_requests_total",
+    "Llamadas a OpenAI por resultado (ok, cache_hit, error, retry).", ["outcome"])
+LLM_TOKENS = Counter(
+    "patricia_llm_tokens_total", "Tokens consumidos en OpenAI.", ["model", "kind"])
+FRAGMENTS_DOWNLOADED = Counter(
+    "patricia_fragments_downloaded_total",
+    "Fragmentos de audio leídos de S3 o de la caché local.", ["source"])
+TRANSCRIPTION_CHUNKS = Counter(
+    "patricia_transcription_chunks_total",
+    "Trozos de audio transcritos, con o sin texto reconocido.", ["result"])
+MATCHMAKING_CANDIDATES = Counter(
+    "patricia_matchmaking_candidates_total",
+    "Candidatos de matchmaking preseleccionados en local y evaluados con OpenAI.", ["phase"])
+ADMISSION_ACTIVE = Gauge(
+    "patricia_admission_active", "Peticiones admitidas en curso por clase.", ["lane"])
+ADMISSION_QUEUED = Gauge(
+    "patricia_admission_queued", "Peticiones en cola de admisión por clase.", ["lane"])
+ADMISSION_REJECTED = Counter(
+    "patricia_admission_rejected_total",
+    "Peticiones rechazadas por el control de admisión (429 cola llena, 503 espera agotada).",
+    ["lane", "status"])
+ADMISSION_WAIT_SECONDS = Histogram(
+    "patricia_admission_wait_seconds", "Espera en cola de las peticiones que no se admitieron al momento.",
+    ["lane"], buckets=LATENCY_BUCKETS)
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+@contextmanager
+def track(stage):
+    """Mide el bloque como la etapa stage. Vale tanto en hilos como en corrutinas."""
+    in_flight = STAGE_IN_FLIGHT.labels(stage)
+    in_flight.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+        in_flight.dec()
+
+
+async def measure(stage, awaitable):
+    """Espera awaitable midiéndolo como la etapa stage."""
+    with track(stage):
+        return await awaitable
+
+
+def record_llm_usage(model, usage):
+    """Suma los tokens del campo usage de una respuesta de OpenAI."""
+    if not usage:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            LLM_TOKENS.labels(model, kind.removesuffix("_tokens")).inc(usage[kind])
+
+
+def mongo_command_listener():
+    """
+    CommandListener de pymongo que mide cada comando. Se crea al construir el
+    cliente de MongoDB para no importar pymongo antes.
+    """
+    from pymongo import monitoring
+
+    class MongoCommandMetrics(monitoring.CommandListener):
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            MONGO_COMMAND_SECONDS.labels(event.command_name).observe(event.duration_micros / 1e6)
+
+        def failed(self, event):
+            MONGO_COMMAND_SECONDS.labels(event.command_name).observe(event.duration_micros / 1e6)
+            MONGO_COMMAND_ERRORS.labels(event.command_name).inc()
+
+    return MongoCommandMetrics()
+
+
+def render_metrics():
+    """Cuerpo y tipo de contenido de la respuesta de /metrics."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def _new_profiler():
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        logger.warning("Perfilado pedido, pero pyinstrument no está instalado.")
+        return None
+    return Profiler(interval=PROFILING_INTERVAL_SECONDS, async_mode="enabled")
+
+
+def _write_profile(profiler, profile_id):
+    os.makedirs(PROFILING_OUTPUT_DIR, exist_ok=True)
+    with open(os.path.join(PROFILING_OUTPUT_DIR, profile_id), "w", encoding="utf-8") as f:
+        f.write(profiler.output_html())
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide cada petición HTTP hasta que se envía el último
+    byte (incluidas las respuestas en streaming) y, si se pide con la
+    cabecera de perfilado, la perfila.
+    """
+
+    def __init__(self, app, profiling=PROFILING_ENABLED, profiling_header=PROFILING_HEADER):
+        self.app = app
+        self.profiling = profiling
+        self.profiling_header = profiling_header.lower().encode()
+
+    def _wants_profile(self, scope):
+        return self.profiling and any(
+            name == self.profiling_header and value not in (b"", b"0", b"false")
+            for name, value in scope["headers"]
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        profiler = _new_profiler() if self._wants_profile(scope) else None
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.html" if profiler else None
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile_id:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-profile-id", profile_id.encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        if profiler:
+            profiler.start()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            # El router deja en el scope la ruta que atendió la petición
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(method, route, str(status)).observe(elapsed)
+            if profiler:
+                profiler.stop()
+                try:
+                    await asyncio.to_thread(_write_profile, profiler, profile_id)
+                except OSError as e:
+                    logger.warning(f"No se pudo guardar el perfil {profile_id}: {e}")
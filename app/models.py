@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict
+from typing import List, Dict, Literal, Optional
+from app.analysis_profiles import ANALYSIS_PROFILES
+from app.config import MATCHMAKING_MAX_CANDIDATES, MATCHMAKING_TOP_K, MATCHMAKING_MAX_TOP_K
 
 class ConversationCreateRequest(BaseModel):
     user_uuid_1: str
@@ -8,6 +10,8 @@ class ConversationCreateRequest(BaseModel):
 class ConversationAnalysisRequest(BaseModel):
     user_id: str
     conversation_id: str
+    # Perfil del análisis de audio; por defecto ANALYSIS_PROFILE
+    profile: Optional[Literal[tuple(ANALYSIS_PROFILES)]] = None
 
 class UserModel(BaseModel):
     date_of_birth: str
@@ -20,3 +24,8 @@ class PersonModel(BaseModel):
     learning_preferences: str
     digital_behavior: str
     conversation_topics: List[str]
+
+class MatchmakingBatchRequest(BaseModel):
+    person: PersonModel
+    candidates: List[PersonModel] = Field(..., min_length=1, max_length=MATCHMAKING_MAX_CANDIDATES)
+    top_k: int = Field(MATCHMAKING_TOP_K, ge=1, le=MATCHMAKING_MAX_TOP_K)
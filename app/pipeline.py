@@ -0,0 +1,70 @@
+"""
+Ejecución de etapas asíncronas como un pequeño grafo de dependencias.
+
+Cada etapa arranca en cuanto terminan las etapas de las que depende, así que
+las independientes (el análisis textual y el de audio de
+/analyze-conversation) se solapan. Se mide el tiempo de cada etapa desde que
+empieza a ejecutarse hasta que termina y, opcionalmente, se notifica el
+resultado de cada una en cuanto está listo (para emitirlo por streaming).
+"""
+import asyncio
+import time
+
+from app.metrics import observe_stage
+
+
+class Pipeline:
+    def __init__(self, on_stage_done=None):
+        self._stages = {}
+        self.timings = {}
+        self._on_stage_done = on_stage_done
+
+    def stage(self, name, func, after=()):
+        """
+        Registra la etapa name. func es una corrutina que recibe como
+        argumentos con nombre los resultados de las etapas de after, que deben
+        estar ya registradas.
+        """
+        missing = [dep for dep in after if dep not in self._stages]
+        if missing:
+            raise ValueError(f"La etapa {name} depende de etapas no registradas: {missing}")
+        self._stages[name] = (func, tuple(after))
+
+    async def _run_stage(self, name, func, after, tasks):
+        inputs = {dep: await tasks[dep] for dep in after}
+        start = time.perf_counter()
+        try:
+            result = await func(**inputs)
+        finally:
+            self.timings[name] = time.perf_counter() - start
+            observe_stage(name, self.timings[name])
+        if self._on_stage_done is not None:
+            self._on_stage_done(name, result)
+        return result
+
+    async def run(self):
+        """
+        Ejecuta todas las etapas y devuelve sus resultados por nombre. Si una
+        falla, se cancelan las demás y se relanza su excepción.
+        """
+        start = time.perf_counter()
+        tasks = {}
+        for name, (func, after) in self._stages.items():
+            tasks[name] = asyncio.create_task(self._run_stage(name, func, after, tasks))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            self.timings["total"] = time.perf_counter() - start
+
+        return {name: task.result() for name, task in tasks.items()}
+
+    def server_timing(self):
+        """Tiempos de las etapas en formato de cabecera Server-Timing."""
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.timings.items())
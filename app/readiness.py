@@ -0,0 +1,77 @@
+"""
+Estado de los subsistemas que se calientan al arrancar, para GET /ready.
+
+El lifespan no espera a que terminen: la API acepta peticiones en cuanto
+arranca y cada subsistema (pool de análisis de audio, colección de
+fragmentos, índice de matchmaking) se prepara en segundo plano. /ready
+responde 503 hasta que todos están listos o desactivados. Las rutas que no
+pueden atender peticiones hasta que un subsistema termine de prepararse lo
+esperan con wait.
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+DISABLED = "disabled"
+
+
+class Readiness:
+    def __init__(self):
+        self.subsystems = {}
+        self.errors = {}
+        self._tasks = {}
+
+    def disable(self, name):
+        self.subsystems[name] = DISABLED
+
+    def warm(self, name, warm_up):
+        """Ejecuta la corrutina warm_up() en segundo plano y anota su estado."""
+        self.subsystems[name] = WARMING
+        self._tasks[name] = asyncio.create_task(self._warm(name, warm_up))
+
+    async def _warm(self, name, warm_up):
+        try:
+            await warm_up()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"No se pudo preparar el subsistema {name}.")
+            self.subsystems[name] = FAILED
+            self.errors[name] = str(e)
+        else:
+            self.subsystems[name] = READY
+            self.errors.pop(name, None)
+            logger.info(f"Subsistema {name} listo.")
+
+    async def wait(self, name):
+        """
+        Espera a que termine de prepararse el subsistema name, si se está
+        preparando. Cancelar la espera no cancela la preparación.
+        """
+        task = self._tasks.get(name)
+        if task is not None and not task.done():
+            await asyncio.shield(task)
+
+    def is_ready(self):
+        return all(state in (READY, DISABLED) for state in self.subsystems.values())
+
+    def snapshot(self):
+        return {
+            "ready": self.is_ready(),
+            "subsystems": dict(self.subsystems),
+            "errors": dict(self.errors),
+        }
+
+    async def stop(self):
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks = {}
+
+
+readiness = Readiness()
@@ -1,9 +1,15 @@
+import asyncio
 import logging
-from fastapi import HTTPException, APIRouter
-import requests
+from fastapi import HTTPException, APIRouter, Response, Depends
+from fastapi.responses import StreamingResponse
 import os
 from app.models import ConversationAnalysisRequest
-from app.services import collect_conversation_fragments, analyze_text, analyze_audio, getClassesMongoDB, generate_report
+from app.services.clients import get_course_catalog
+from app.services.conversations import collect_conversation_fragments, conversation_has_fragments, wait_for_fragment_storage
+from app.services.analysis import analyze_text, analyze_audio, analyze_audio_summaries, generate_report, stream_report, parse_report
+from app.llm import LLMError
+from app.jobs import DONE
+from app.pipeline import Pipeline
 import json
 
 router = APIRouter()
@@ -13,52 +19,159 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-@router.post("/analyze-conversation")
-async def analyze_conversation(request: ConversationAnalysisRequest):
-    classes = getClassesMongoDB()
-    print(classes)
-    logger.info(f"Received request to analyze conversation with ID: {request.conversation_id} for user ID: {request.user_id}")
-
-    # Recuperar los fragmentos de la conversación
-    fragments = collect_conversation_fragments(request.conversation_id)
-    if not fragments:
-        logger.error(f"Conversation with ID: {request.conversation_id} not found.")
-        raise HTTPException(
-            status_code=404, detail="Conversación no encontrada.")
-
-    # Filtrar fragmentos por el ID del usuario
-    user_fragments = [fragment for fragment in fragments if fragment.get(
-        "speaker") == request.user_id]
+async def load_user_fragments(request):
+    await wait_for_fragment_storage()
+    # Recuperar los fragmentos del usuario (filtrados por hablante en MongoDB)
+    user_fragments = await collect_conversation_fragments(request.conversation_id, request.user_id)
     if not user_fragments:
+        if not await conversation_has_fragments(request.conversation_id):
+            logger.error(f"Conversation with ID: {request.conversation_id} not found.")
+            raise HTTPException(
+                status_code=404, detail="Conversación no encontrada.")
         logger.error(f"No fragments found for user ID: {request.user_id} in conversation ID: {request.conversation_id}.")
         raise HTTPException(
             status_code=404, detail="No se encontraron fragmentos para el usuario.")
 
     logger.info(f"Found {len(user_fragments)} fragments for user ID: {request.user_id}.")
+    return user_fragments
+
 
+def build_analysis_pipeline(request, user_fragments, report_stage, on_stage_done=None):
+    """
+    Grafo de etapas del análisis: el textual y el de audio son independientes y
+    se ejecutan a la vez; report_stage empieza en cuanto terminan los dos y
+    recibe el resultado combinado.
+    """
     # Unir los enlaces de audio y las transcripciones
     audio_links = [fragment["audio_url"] for fragment in user_fragments]
-    transcriptions = " ".join(fragment["transcription"]
-                              for fragment in user_fragments)
+    # Las transcripciones aún pendientes (o fallidas) de la cola asíncrona no se analizan
+    transcriptions = [fragment["transcription"]
+                      for fragment in user_fragments
+                      if fragment.get("transcription_status", DONE) == DONE]
 
     logger.info(f"Collected {len(audio_links)} audio links and transcriptions for analysis.")
 
-    # Realizar análisis textual utilizando OpenAI
-    analysis_result = analyze_text(transcriptions)
-    logger.info("Textual analysis completed.")
+    async def textual_stage():
+        # Realizar análisis textual utilizando OpenAI
+        analysis_result = await analyze_text(transcriptions)
+        logger.info("Textual analysis completed.")
+        return json.loads(analysis_result["choices"][0]["message"]["content"])
+
+    async def audio_stage():
+        # NumPy y librosa solo se cargan al analizar audio
+        from app.audio_features import has_current_features
 
-    # Realizar análisis de audio
-    audio_analysis = analyze_audio(audio_links, transcriptions)
-    logger.info("Audio analysis completed.")
+        # Realizar análisis de audio: si todos los fragmentos tienen su resumen
+        # calculado al recibirlos (con el mismo perfil), basta con combinarlos;
+        # si no, se descarga el audio
+        if all(has_current_features(fragment, request.profile) for fragment in user_fragments):
+            audio_analysis = analyze_audio_summaries(
+                [fragment["features"] for fragment in user_fragments])
+        else:
+            audio_keys = [fragment.get("audio_key") for fragment in user_fragments]
+            audio_analysis = await analyze_audio(audio_links, transcriptions, request.profile, audio_keys)
+        logger.info("Audio analysis completed.")
+        return json.loads(audio_analysis)
+
+    async def combined_report_stage(textual_analysis, audio_analysis):
+        result = {
+            "conversation_id": request.conversation_id,
+            "user_id": request.user_id,
+            "audio_links": audio_links,
+            "textual_analysis": textual_analysis,
+            "audio_analysis": audio_analysis
+        }
+        return await report_stage(result)
+
+    pipeline = Pipeline(on_stage_done=on_stage_done)
+    pipeline.stage("textual_analysis", textual_stage)
+    pipeline.stage("audio_analysis", audio_stage)
+    pipeline.stage("report", combined_report_stage, after=("textual_analysis", "audio_analysis"))
+    return pipeline
+
+
+@router.post("/analyze-conversation")
+async def analyze_conversation(request: ConversationAnalysisRequest, response: Response):
+    logger.info(f"Received request to analyze conversation with ID: {request.conversation_id} for user ID: {request.user_id}")
 
-    # Retornar resultados del análisis
-    result = {
-        "conversation_id": request.conversation_id,
-        "user_id": request.user_id,
-        "audio_links": audio_links,
-        "textual_analysis": json.loads(analysis_result["choices"][0]["message"]["content"]),
-        "audio_analysis": json.loads(audio_analysis)
-    }
+    user_fragments = await load_user_fragments(request)
+    pipeline = build_analysis_pipeline(request, user_fragments, generate_report)
+    results = await pipeline.run()
 
+    response.headers["Server-Timing"] = pipeline.server_timing()
+    logger.info(f"Analysis stage timings for conversation ID {request.conversation_id}: {pipeline.server_timing()}")
     logger.info(f"Analysis result for conversation ID: {request.conversation_id} and user ID: {request.user_id} returned successfully.")
-    return generate_report(result)
+    return results["report"]
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/analyze-conversation/stream")
+async def analyze_conversation_stream(request: ConversationAnalysisRequest):
+    """
+    Variante de /analyze-conversation con Server-Sent Events. Emite un evento
+    por etapa en cuanto termina (fragments, textual_analysis, audio_analysis),
+    los trozos del informe según los genera OpenAI (report_delta) y, al final,
+    el informe ya interpretado como JSON (report). Si algo falla se emite un
+    evento error y se cierra el stream.
+    """
+    logger.info(f"Received streaming request to analyze conversation with ID: {request.conversation_id} for user ID: {request.user_id}")
+
+    # Los 404 se devuelven como respuesta normal antes de abrir el stream
+    user_fragments = await load_user_fragments(request)
+    events = asyncio.Queue()
+
+    async def streamed_report_stage(result):
+        parts = []
+        async for delta in stream_report(result):
+            parts.append(delta)
+            events.put_nowait(("report_delta", {"content": delta}))
+        return parse_report("".join(parts))
+
+    pipeline = build_analysis_pipeline(
+        request, user_fragments, streamed_report_stage,
+        on_stage_done=lambda name, result: events.put_nowait((name, result)))
+
+    async def run_pipeline():
+        try:
+            await pipeline.run()
+            events.put_nowait(("timings", {
+                name: round(seconds * 1000, 1) for name, seconds in pipeline.timings.items()}))
+        except HTTPException as e:
+            events.put_nowait(("error", {"status_code": e.status_code, "detail": e.detail}))
+        except LLMError as e:
+            events.put_nowait(("error", {"status_code": e.status_code, "detail": "Error al generar el análisis."}))
+        except Exception:
+            logger.exception(f"Error analyzing conversation ID: {request.conversation_id}.")
+            events.put_nowait(("error", {"status_code": 500, "detail": "Error al analizar la conversación."}))
+        finally:
+            events.put_nowait(None)
+
+    async def event_stream():
+        runner = asyncio.create_task(run_pipeline())
+        try:
+            yield sse_event("fragments", {
+                "count": len(user_fragments),
+                "audio_links": [fragment["audio_url"] for fragment in user_fragments],
+            })
+            while (item := await events.get()) is not None:
+                yield sse_event(*item)
+        finally:
+            # El cliente puede cerrar la conexión antes de terminar
+            runner.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/course-catalog/refresh")
+async def refresh_course_catalog(course_catalog=Depends(get_course_catalog)):
+    # Invalida la caché del catálogo de cursos y lo recarga de MongoDB
+    course_catalog.invalidate()
+    courses = await course_catalog.get_courses()
+    return {"courses": len(courses), "version": course_catalog.version}
@@ -1,45 +1,87 @@
-from fastapi import APIRouter, File, Form, UploadFile, HTTPException
-from app.services import upload_to_s3, add_fragment_to_conversation
-from pydub import AudioSegment
-import io
+from fastapi import APIRouter, File, Form, UploadFile, HTTPException, Depends
+from app.config import STREAMING_INGEST, TRANSCRIPTION_TIMEOUT_SECONDS
+from app.services.clients import get_fragment_store, get_transcription_queue
+from app.services.conversations import (
+    upload_to_s3, add_fragment_to_conversation, get_transcription_job, wait_for_fragment_storage,
+    update_fragment_transcription,
+)
+from app.executor import run_cpu_bound
+from app.metrics import measure
+from app.ingest import stream_upload, PCM_SAMPLE_WIDTH
+from app.jobs import PENDING, DONE, FAILED, QUEUE_FULL_TRANSCRIPTION
+import asyncio
+import functools
+import math
 import uuid
-import speech_recognition as sr
 
 router = APIRouter()
+# Los fragmentos se guardan y consultan cuando ha terminado la migración al arrancar
+fragments_ready = [Depends(wait_for_fragment_storage)]
 
-@router.post("/record-conversation")
+
+def transcription_queue_full():
+    # Un hueco se libera como tarde cuando termina un intento de transcripción
+    return HTTPException(
+        status_code=503,
+        detail="La cola de transcripción está llena; inténtalo más tarde.",
+        headers={"Retry-After": str(math.ceil(TRANSCRIPTION_TIMEOUT_SECONDS))},
+    )
+
+
+@router.post("/record-conversation", dependencies=fragments_ready)
 async def get_audio_duration(
     conversation_id: str = Form(...),
     speaker_id: str = Form(...),
     start_time: str = Form(...),
     end_time: str = Form(...),
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    async_transcription: bool = Form(False),
+    fragment_store=Depends(get_fragment_store),
+    transcription_queue=Depends(get_transcription_queue)
 ):
+    # pydub, librosa y speech_recognition solo se cargan al recibir audio
+    from app.audio_processing import decode_fragment, summarize_pcm
+    from app.transcription import transcribe_pcm, transcribe_wav
+
+    # Con la cola llena se rechaza antes de subir ni decodificar nada
+    if async_transcription and transcription_queue.full():
+        raise transcription_queue_full()
+
     type_file = file.filename.split('.')[-1]
     unique_filename = f"{uuid.uuid4()}.{type_file}"
-    file_content = await file.read()
-
-    # Subir a S3
-    audio_url = upload_to_s3(file_content, unique_filename)
-
-    # Procesar audio
-    audio = AudioSegment.from_file(io.BytesIO(file_content), format=type_file)
-    wav_io = io.BytesIO()
-    audio.export(wav_io, format="wav")
-    wav_io.seek(0)
-
-    recognizer = sr.Recognizer()
-    try:
-        with sr.AudioFile(wav_io) as source:
-            audio_data = recognizer.record(source)
-            transcription = recognizer.recognize_google(audio_data, language="es-ES")
-    except sr.UnknownValueError:
-        transcription = "No se pudo transcribir el audio."
-    except sr.RequestError as e:
-        transcription = f"Error de servicio; {e}"
-    
-    # Calcular duración
-    duration_seconds = len(audio) / 1000
+    features_task = None
+
+    if STREAMING_INGEST:
+        # Subida por partes a S3 y decodificación a PCM a la vez
+        audio_url, pcm, sample_rate = await stream_upload(
+            file, fragment_store.open_upload(unique_filename))
+        duration_seconds = len(pcm) / (PCM_SAMPLE_WIDTH * sample_rate)
+        transcribe = functools.partial(
+            transcribe_pcm, pcm, sample_rate, raise_service_errors=async_transcription)
+        features_task = asyncio.create_task(
+            measure("feature_extraction", run_cpu_bound(summarize_pcm, pcm, sample_rate)))
+    else:
+        file_content = await file.read()
+
+        # Subir a S3 y decodificar el audio en paralelo
+        audio_url, (wav_bytes, duration_seconds, features) = await asyncio.gather(
+            upload_to_s3(file_content, unique_filename),
+            measure("decode", run_cpu_bound(decode_fragment, file_content, type_file)),
+        )
+        transcribe = functools.partial(
+            transcribe_wav, wav_bytes, raise_service_errors=async_transcription)
+
+    # En modo asíncrono la transcripción se hace en la cola de trabajos
+    job_id = None
+    if async_transcription:
+        job_id = str(uuid.uuid4())
+        transcription, segments = PENDING, []
+    else:
+        result = await asyncio.to_thread(transcribe)
+        transcription, segments = result["text"], result["segments"]
+
+    if features_task is not None:
+        features = await features_task
 
     # Crear el fragmento
     fragment = {
@@ -47,17 +89,41 @@ async def get_audio_duration(
         "start_time": start_time,
         "end_time": end_time,
         "transcription": transcription,
-        "audio_url": audio_url
+        "transcription_segments": segments,
+        "transcription_status": PENDING if async_transcription else DONE,
+        "audio_url": audio_url,
+        "audio_key": unique_filename,
+        "features": features
     }
+    if job_id:
+        fragment["transcription_job_id"] = job_id
 
-    add_fragment_to_conversation(conversation_id, fragment)
+    await add_fragment_to_conversation(conversation_id, fragment)
 
-    return {
+    if job_id:
+        try:
+            transcription_queue.submit(transcribe, job_id=job_id, conversation_id=conversation_id)
+        except asyncio.QueueFull:
+            # Se llenó mientras se procesaba el audio: el fragmento no se queda en "pending"
+            await update_fragment_transcription(
+                {"job_id": job_id}, {"text": QUEUE_FULL_TRANSCRIPTION, "segments": []}, FAILED)
+            raise transcription_queue_full()
+
+    response = {
         "conversation_id": conversation_id,
         "speaker": speaker_id,
         "start_time": start_time,
         "end_time": end_time,
         "duration_seconds": duration_seconds,
         "transcription": transcription,
+        "transcription_segments": segments,
         "audio_url": audio_url
     }
+    if job_id:
+        response["job_id"] = job_id
+    return response
+
+
+@router.get("/transcription-jobs/{job_id}", dependencies=fragments_ready)
+async def transcription_job_status(job_id: str):
+    return await get_transcription_job(job_id)
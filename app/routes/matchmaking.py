@@ -1,15 +1,67 @@
-from fastapi import APIRouter, File, Form, UploadFile, HTTPException
-from app.services import evaluate_compatibility
-from app.models import PersonModel
-from openai import OpenAI
+from fastapi import APIRouter, Depends, File, Form, UploadFile, HTTPException, Query
+from app.services.matchmaking import (
+    evaluate_compatibility,
+    evaluate_candidates,
+    register_profile,
+    get_profile,
+    delete_profile,
+    find_profile_matches,
+    save_matchmaking_index,
+    wait_for_matchmaking_index,
+)
+from app.config import MATCHMAKING_TOP_K, MATCHMAKING_MAX_TOP_K
+from app.models import PersonModel, MatchmakingBatchRequest
 import os
 import re
 from datetime import datetime
 from typing import Dict
 
 router = APIRouter()
+# Las rutas del índice de perfiles esperan a que se cargue el snapshot al arrancar
+index_loaded = [Depends(wait_for_matchmaking_index)]
 
 @router.post("/matchmaking") 
 async def matchmaking(person1: PersonModel, person2: PersonModel):
-    compatibility_result = evaluate_compatibility(person1, person2)
+    compatibility_result = await evaluate_compatibility(person1, person2)
     return {"compatibility_score": compatibility_result}
+
+
+@router.post("/matchmaking/batch")
+async def matchmaking_batch(request: MatchmakingBatchRequest):
+    # Preselección local de todos los candidatos y OpenAI solo para los top_k
+    try:
+        results = await evaluate_candidates(request.person, request.candidates, request.top_k)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Fecha de nacimiento no válida: {e}")
+    return {"candidates": len(request.candidates), "results": results}
+
+
+@router.put("/matchmaking/profiles/{profile_id}", dependencies=index_loaded)
+async def put_profile(profile_id: str, person: PersonModel):
+    # Alta o actualización del perfil en el índice de matchmaking
+    profiles = register_profile(profile_id, person)
+    return {"profile_id": profile_id, "profiles": profiles}
+
+
+@router.get("/matchmaking/profiles/{profile_id}", dependencies=index_loaded)
+async def read_profile(profile_id: str):
+    return get_profile(profile_id)
+
+
+@router.delete("/matchmaking/profiles/{profile_id}", dependencies=index_loaded)
+async def remove_profile(profile_id: str):
+    profiles = delete_profile(profile_id)
+    return {"profile_id": profile_id, "profiles": profiles}
+
+
+@router.post("/matchmaking/profiles/{profile_id}/matches", dependencies=index_loaded)
+async def profile_matches(profile_id: str, top_k: int = Query(MATCHMAKING_TOP_K, ge=1, le=MATCHMAKING_MAX_TOP_K)):
+    results = await find_profile_matches(profile_id, top_k)
+    return {"profile_id": profile_id, "results": results}
+
+
+@router.post("/matchmaking/index/snapshot", dependencies=index_loaded)
+async def snapshot_matchmaking_index():
+    if not await save_matchmaking_index():
+        raise HTTPException(status_code=409, detail="MATCHMAKING_INDEX_PATH no está configurado.")
+    return {"saved": True}
@@ -0,0 +1,212 @@
+"""
+Acceso a los fragmentos de audio en S3.
+
+Un único cliente boto3 (thread-safe) con un pool de conexiones compartido,
+descargas en paralelo con concurrencia acotada y una caché LRU local, limitada
+en bytes, de los fragmentos descargados. La caché se indexa por clave y ETag:
+ante un acierto se hace un GET condicional (If-None-Match) y S3 responde 304
+sin cuerpo, así que un fragmento que no ha cambiado no se vuelve a descargar.
+"""
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse, unquote
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from app.config import BUCKET_NAME, S3_MAX_CONCURRENCY, S3_CACHE_MAX_BYTES, S3_PART_SIZE
+from app.metrics import FRAGMENTS_DOWNLOADED, track
+
+logger = logging.getLogger(__name__)
+
+
+class FragmentCache:
+    """
+    Caché LRU de fragmentos descargados, limitada por el total de bytes.
+    Guarda a lo sumo una versión (ETag) por clave.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Devuelve (etag, body) de la clave o None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, etag, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous[1])
+            self._entries[key] = (etag, body)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        return self._size
+
+
+class MultipartUpload:
+    """
+    Subida por partes de un objeto cuyo tamaño no se conoce de antemano. Los
+    bloques escritos se acumulan hasta completar una parte, de modo que en
+    memoria nunca hay más de una parte. Si el objeto cabe en una sola parte se
+    sube con un put_object normal. abort deshace la subida aunque ya se haya
+    completado: aborta la subida por partes y borra el objeto.
+    """
+
+    def __init__(self, store, key, part_size=S3_PART_SIZE):
+        self.store = store
+        self.key = key
+        self.part_size = part_size
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+
+    async def write(self, chunk):
+        self._buffer.extend(chunk)
+        if len(self._buffer) >= self.part_size:
+            await self._flush_part()
+
+    async def _flush_part(self):
+        client, bucket = self.store.client, self.store.bucket
+        if self._upload_id is None:
+            with track("s3_put"):
+                response = await asyncio.to_thread(
+                    client.create_multipart_upload, Bucket=bucket, Key=self.key, ACL="public-read")
+            self._upload_id = response["UploadId"]
+
+        part_number = len(self._parts) + 1
+        body = bytes(self._buffer)
+        self._buffer.clear()
+        with track("s3_put"):
+            response = await asyncio.to_thread(
+                client.upload_part, Bucket=bucket, Key=self.key, UploadId=self._upload_id,
+                PartNumber=part_number, Body=body)
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    async def complete(self):
+        if self._upload_id is None:
+            body = bytes(self._buffer)
+            self._buffer.clear()
+            return await self.store.upload(body, self.key)
+
+        if self._buffer:
+            await self._flush_part()
+        with track("s3_put"):
+            await asyncio.to_thread(
+                self.store.client.complete_multipart_upload,
+                Bucket=self.store.bucket, Key=self.key, UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts})
+        return self.store.public_url(self.key)
+
+    async def abort(self):
+        self._buffer.clear()
+        client, bucket = self.store.client, self.store.bucket
+        if self._upload_id is not None:
+            try:
+                await asyncio.to_thread(
+                    client.abort_multipart_upload, Bucket=bucket, Key=self.key, UploadId=self._upload_id)
+            except ClientError as e:
+                # Si ya se había completado no hay nada que abortar; el objeto se borra abajo
+                logger.warning(f"No se pudo abortar la subida por partes de {self.key}: {e}")
+        # complete pudo llegar a crear el objeto (put_object o subida por partes
+        # completada); borrar una clave que no existe no es un error en S3
+        try:
+            await asyncio.to_thread(client.delete_object, Bucket=bucket, Key=self.key)
+        except ClientError as e:
+            logger.warning(f"No se pudo borrar el objeto {self.key} de la subida abortada: {e}")
+
+
+class FragmentStore:
+    """
+    Sube y descarga fragmentos de audio de un bucket de S3. El cliente se puede
+    inyectar (por ejemplo uno creado dentro de moto.mock_aws en pruebas).
+    """
+
+    def __init__(self, bucket=BUCKET_NAME, client=None,
+                 max_concurrency=S3_MAX_CONCURRENCY, cache_max_bytes=S3_CACHE_MAX_BYTES):
+        self.bucket = bucket
+        self.client = client or boto3.client(
+            's3', config=Config(max_pool_connections=max_concurrency))
+        self.cache = FragmentCache(cache_max_bytes)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def public_url(self, key):
+        return f"https://{self.bucket}.s3.amazonaws.com/{key}"
+
+    def key_from_url(self, url):
+        """
+        Obtiene la clave del objeto a partir de su URL pública (estilo
+        virtual-hosted o path-style).
+        """
+        parsed = urlparse(url)
+        path = unquote(parsed.path).lstrip("/")
+        if not parsed.netloc.startswith(f"{self.bucket}.") and path.startswith(f"{self.bucket}/"):
+            path = path[len(self.bucket) + 1:]
+        return path
+
+    async def upload(self, body, key):
+        with track("s3_put"):
+            await asyncio.to_thread(
+                self.client.put_object,
+                Bucket=self.bucket, Key=key, Body=body, ACL="public-read"
+            )
+        return self.public_url(key)
+
+    def open_upload(self, key):
+        return MultipartUpload(self, key)
+
+    def _fetch(self, key):
+        cached = self.cache.get(key)
+        request = {"Bucket": self.bucket, "Key": key}
+        if cached is not None:
+            request["IfNoneMatch"] = cached[0]
+
+        try:
+            with track("s3_get"):
+                response = self.client.get_object(**request)
+                body = response["Body"].read()
+        except ClientError as e:
+            status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            if cached is not None and (status == 304 or e.response.get("Error", {}).get("Code") == "304"):
+                self.cache.hits += 1
+                FRAGMENTS_DOWNLOADED.labels("cache").inc()
+                return cached[1]
+            raise
+
+        self.cache.misses += 1
+        FRAGMENTS_DOWNLOADED.labels("s3").inc()
+        self.cache.put(key, response.get("ETag"), body)
+        return body
+
+    async def download(self, key):
+        async with self._semaphore:
+            return await asyncio.to_thread(self._fetch, key)
+
+    async def download_many(self, keys):
+        """
+        Descarga varias claves en paralelo (como mucho max_concurrency a la vez)
+        y devuelve los cuerpos en el mismo orden.
+        """
+        return await asyncio.gather(*(self.download(key) for key in keys))
@@ -0,0 +1,62 @@
+"""
+Servicios de la aplicación, divididos por subsistema:
+
+- app.services.clients: clientes compartidos, creados bajo demanda.
+- app.services.conversations: conversaciones, fragmentos y transcripciones.
+- app.services.analysis: análisis textual, de audio e informe.
+- app.services.matchmaking: compatibilidad entre personas.
+
+Los nombres se pueden seguir importando desde app.services; cada submódulo se
+carga solo cuando se usa uno de sus nombres, así que importar el paquete no
+arrastra las dependencias de los demás subsistemas.
+"""
+import importlib
+
+_SUBMODULES = {
+    "app.services.conversations": (
+        "upload_to_s3",
+        "create_conversation",
+        "add_fragment_to_conversation",
+        "update_fragment_transcription",
+        "get_transcription_job",
+        "collect_conversation_fragments",
+        "conversation_has_fragments",
+        "prepare_fragment_storage",
+        "wait_for_fragment_storage",
+    ),
+    "app.services.analysis": (
+        "analyze_text",
+        "analyze_audio",
+        "analyze_audio_summaries",
+        "build_report_prompt",
+        "parse_report",
+        "generate_report",
+        "stream_report",
+    ),
+    "app.services.matchmaking": (
+        "call_openai_api",
+        "parse_score",
+        "analyze_data",
+        "evaluate_compatibility",
+        "rank_candidates",
+        "score_ranked_candidates",
+        "evaluate_candidates",
+        "register_profile",
+        "get_profile",
+        "delete_profile",
+        "find_profile_matches",
+        "load_matchmaking_index",
+        "wait_for_matchmaking_index",
+        "save_matchmaking_index",
+    ),
+}
+_LOCATIONS = {name: module for module, names in _SUBMODULES.items() for name in names}
+
+__all__ = sorted(_LOCATIONS)
+
+
+def __getattr__(name):
+    module = _LOCATIONS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module), name)
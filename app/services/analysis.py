@@ -0,0 +1,176 @@
+"""
+Análisis de conversaciones: análisis textual con OpenAI, métricas de audio e
+informe final con los cursos recomendados.
+"""
+import json
+import logging
+
+from fastapi import HTTPException
+
+from app.course_ranking import build_query, compact_conversation_data
+from app.executor import run_cpu_bound
+from app.llm import chat_completion, stream_chat_completion, completion_content, LLMError
+from app.metrics import track
+from app.services.clients import get_course_index, get_fragment_store
+
+logger = logging.getLogger(__name__)
+
+
+async def analyze_text(transcriptions):
+    """
+    Realiza un análisis textual de las transcripciones (una por fragmento)
+    usando la API de OpenAI.
+    """
+    
+    transcription = "#".join(transcriptions)
+
+    logger.info("Iniciando análisis textual de la transcripción.")
+    prompt = f"""
+    You are an English language evaluator. Analyze the following English sentences separated by the '#' character:
+
+    {transcription}
+
+    Please provide your analysis in a valid JSON format without any extra characters or quotes. The JSON should include:
+    1. An "analysis" object with numerical scores from 1 to 10 for each of the following factors:
+    - "grammar": Assessment of grammatical structure.
+    - "vocabulary": Richness and accuracy of the vocabulary used.
+    - "fluency": Level of fluency in speaking or writing.
+    - "coherence": Logic and coherence in the construction of the sentences.
+    - "style": Appropriateness of style based on context (if relevant).
+
+    2. A "critical_feedback" string providing constructive feedback on each factor.
+
+    Your response should be structured like this:
+
+    {{
+        "analysis": {{
+            "grammar": <score>,
+            "vocabulary": <score>,
+            "fluency": <score>,
+            "coherence": <score>,
+            "style": <score>
+        }},
+        "critical_feedback": "<feedback>"
+    }}
+    Make sure to return only the JSON object, without additional formatting or text.
+    """
+
+    try:
+        # Solo se cachea si el texto es JSON válido, que es lo que espera el llamador
+        response_json = await chat_completion(prompt, validate=json.loads)
+    except LLMError as e:
+        logger.error(f"Error al analizar la conversación. Código de estado: {e.status_code}")
+        raise HTTPException(status_code=e.status_code, detail="Error al analizar la conversación.")
+    except json.JSONDecodeError:
+        logger.error("Error al decodificar el JSON de la respuesta.")
+        raise HTTPException(status_code=500, detail="Error al procesar el análisis textual.")
+
+    logger.info("Análisis textual completado con éxito.")
+    return response_json
+
+
+async def analyze_audio(audio_links, transcriptions, profile=None, audio_keys=None):
+    """
+    Realiza un análisis de los archivos de audio descargándolos de S3 y
+    usando librosa para obtener métricas avanzadas, con el perfil de análisis
+    indicado (por defecto ANALYSIS_PROFILE). audio_keys son las claves de S3
+    guardadas con cada fragmento; para los fragmentos antiguos, sin clave
+    (None), se obtiene de la URL.
+    """
+    logger.info("Iniciando análisis de audio.")
+    # pydub y librosa solo se cargan al analizar audio (en este proceso, para
+    # poder enviar la función al pool)
+    from app.audio_processing import extract_audio_features
+
+    # Descargar audios en paralelo (con caché local) sin bloquear el event loop
+    fragment_store = get_fragment_store()
+    audio_keys = [
+        key or fragment_store.key_from_url(link)
+        for link, key in zip(audio_links, audio_keys or [None] * len(audio_links))
+    ]
+    audio_blobs = await fragment_store.download_many(audio_keys)
+
+    # El procesamiento con pydub/librosa es CPU intensivo: se ejecuta en el pool de procesos
+    with track("feature_extraction"):
+        try:
+            return await run_cpu_bound(extract_audio_features, audio_blobs, profile)
+        except ValueError as e:
+            # Sin audio decodificable no se devuelven métricas a cero
+            logger.error(f"No se pudo decodificar el audio de la conversación: {e}")
+            raise HTTPException(status_code=422, detail="No se pudo decodificar el audio de la conversación.")
+
+
+def analyze_audio_summaries(summaries):
+    """
+    Combina los resúmenes de características calculados al recibir cada
+    fragmento, sin descargar ni decodificar audio.
+    """
+    from app.audio_features import merge_summaries, summary_to_results
+
+    logger.info(f"Combinando {len(summaries)} resúmenes de audio precalculados.")
+    return json.dumps(summary_to_results(merge_summaries(summaries)))
+
+
+async def build_report_prompt(conversation_data):
+    # Solo los cursos más relevantes y un resumen compacto de las métricas
+    courses = await get_course_index().top_k(build_query(conversation_data))
+    classesMap = json.dumps(courses, ensure_ascii=False, separators=(",", ":"))
+
+    prompt = f"""
+    Based on the following conversation data:
+    {compact_conversation_data(conversation_data)}
+
+    COURSES: 
+    {classesMap}
+
+    Please generate a detailed feedback report in JSON format that includes the following sections, ALL THE FEEDBACK HAS TO BE IN SPANISH:
+
+    {{
+        "feedback": "Provide a comprehensive evaluation of the conversational performance. Highlight strengths, such as effective use of vocabulary or clarity in pronunciation, as well as weaknesses, such as areas needing improvement. Use specific examples from the conversation data to support your points and offer constructive suggestions for enhancement.",
+        
+        "metrics": {{
+            "grammar_score": "Rate from 1 to 5 based on grammatical accuracy, with specific examples to justify the rating.",
+            "vocabulary": "Rate from 1 to 5 based on the range and appropriateness of vocabulary used in the conversation. Provide suggestions for improvement where applicable.",
+            "pronunciation": "Rate from 1 to 5 based on the clarity and accuracy of pronunciation. Include tips for practice if needed.",
+            "fluency": "Rate from 1 to 5 based on the flow and pace of speech, noting any hesitations or disruptions.",
+            "coherence": "Rate from 1 to 5 based on the logical flow and organization of ideas presented in the conversation. Suggest ways to enhance coherence.",
+            "style": "Rate from 1 to 5 based on the appropriateness of the style for the context. Discuss any adjustments that could improve effectiveness.",
+        }},
+        
+        "recommended_courses": [
+            {{
+                "link": "URL to recommended course",
+                "justification": "Explain why this course is recommended based on the student's performance and identified areas for improvement."
+            }}
+        ]
+    }}
+
+    Ensure that the output is structured, clear, and actionable, adhering strictly to the specified JSON format.
+    """
+    return prompt
+
+
+def parse_report(json_response_str):
+    cleaned_response_str = json_response_str.replace("```json\n", "").replace("```", "").strip()
+
+    try:
+        json_response = json.loads(cleaned_response_str)
+        return json_response
+    except json.JSONDecodeError as e:
+        raise Exception(f"Error decoding JSON: {e}")
+
+
+async def generate_report(conversation_data):
+    prompt = await build_report_prompt(conversation_data)
+    response_json = await chat_completion(prompt, validate=parse_report)
+    return parse_report(completion_content(response_json))
+
+
+async def stream_report(conversation_data):
+    """
+    Genera el texto del informe por trozos según lo devuelve OpenAI. El texto
+    completo se interpreta con parse_report igual que en generate_report.
+    """
+    prompt = await build_report_prompt(conversation_data)
+    async for delta in stream_chat_completion(prompt, validate=parse_report):
+        yield delta
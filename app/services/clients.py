@@ -0,0 +1,102 @@
+"""
+Clientes compartidos de la aplicación (MongoDB, S3, cola de transcripciones,
+catálogo e índices), creados la primera vez que se piden.
+
+Importar este módulo no abre conexiones ni carga motor, boto3 o scikit-learn:
+cada getter importa su dependencia y construye el cliente bajo demanda. Las
+rutas los reciben con Depends y el lifespan de FastAPI calienta en segundo
+plano los que conviene tener listos antes de la primera petición.
+"""
+from functools import lru_cache
+
+from app.config import MONGO_URI
+
+DATABASE_NAME = "patricia-database"
+
+_mongo_client = None
+_matchmaking_index = None
+
+
+def get_mongo_client():
+    global _mongo_client
+    if _mongo_client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from pymongo.server_api import ServerApi
+        from app.metrics import mongo_command_listener
+        _mongo_client = AsyncIOMotorClient(
+            MONGO_URI, server_api=ServerApi('1'), event_listeners=[mongo_command_listener()])
+    return _mongo_client
+
+
+def set_mongo_client(client):
+    """
+    Sustituye el cliente de MongoDB (por ejemplo por mongomock_motor en
+    pruebas). Debe llamarse antes de usar cualquier colección.
+    """
+    global _mongo_client
+    _mongo_client = client
+
+
+def get_database():
+    return get_mongo_client()[DATABASE_NAME]
+
+
+def get_conversations_collection():
+    return get_database()["conversation"]
+
+
+def get_fragments_collection():
+    return get_database()["fragments"]
+
+
+@lru_cache(maxsize=None)
+def get_fragment_repository():
+    from app.fragments import FragmentRepository
+    return FragmentRepository(get_conversations_collection(), get_fragments_collection())
+
+
+@lru_cache(maxsize=None)
+def get_fragment_store():
+    from app.s3_storage import FragmentStore
+    return FragmentStore()
+
+
+@lru_cache(maxsize=None)
+def get_course_catalog():
+    from app.catalog import CourseCatalog
+    return CourseCatalog(get_database()["courses"])
+
+
+@lru_cache(maxsize=None)
+def get_course_index():
+    from app.course_ranking import CourseIndex
+    return CourseIndex(get_course_catalog())
+
+
+@lru_cache(maxsize=None)
+def get_transcription_queue():
+    from app.jobs import TranscriptionQueue
+    from app.services.conversations import update_fragment_transcription
+    return TranscriptionQueue(on_result=update_fragment_transcription)
+
+
+def get_matchmaking_index():
+    global _matchmaking_index
+    if _matchmaking_index is None:
+        from app.matchmaking_index import MatchmakingIndex
+        _matchmaking_index = MatchmakingIndex()
+    return _matchmaking_index
+
+
+def set_matchmaking_index(index):
+    """Sustituye el índice de matchmaking (al cargar un snapshot o en pruebas)."""
+    global _matchmaking_index
+    _matchmaking_index = index
+
+
+def close_clients():
+    """Cierra los clientes que se hayan llegado a crear."""
+    global _mongo_client
+    if _mongo_client is not None:
+        _mongo_client.close()
+        _mongo_client = None
@@ -0,0 +1,106 @@
+"""
+Conversaciones y fragmentos: alta de conversaciones, guardado de fragmentos y
+estado de las transcripciones asíncronas.
+"""
+import logging
+import uuid
+
+from fastapi import HTTPException
+
+from app.fragments import migrate_embedded_fragments
+from app.readiness import readiness
+from app.services.clients import (
+    get_conversations_collection,
+    get_fragments_collection,
+    get_fragment_repository,
+    get_fragment_store,
+    get_transcription_queue,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def upload_to_s3(file, filename):
+    return await get_fragment_store().upload(file, filename)
+
+
+async def create_conversation(user_uuid_1, user_uuid_2):
+    conversation_id = str(uuid.uuid4())
+    conversation_data = {
+        "conversation_id": conversation_id,
+        "participants": [user_uuid_1, user_uuid_2]
+    }
+    result = await get_conversations_collection().insert_one(conversation_data)
+    return conversation_id, str(result.inserted_id)
+
+
+async def add_fragment_to_conversation(conversation_id, fragment):
+    await get_fragment_repository().add(conversation_id, fragment)
+
+
+async def update_fragment_transcription(job, result, status):
+    await get_fragment_repository().update_transcription(job["job_id"], result, status)
+
+
+async def get_transcription_job(job_id):
+    """
+    Estado de un trabajo de transcripción. Si este proceso no lo conoce (por
+    ejemplo tras un reinicio o si lo encoló otro worker), se consulta el
+    fragmento en MongoDB.
+    """
+    job = get_transcription_queue().get(job_id)
+    if job is not None:
+        return {
+            "job_id": job_id,
+            "conversation_id": job["conversation_id"],
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "error": job["error"],
+            "transcription": job["transcription"],
+        }
+
+    fragment = await get_fragment_repository().find_by_job(job_id)
+    if not fragment:
+        raise HTTPException(status_code=404, detail="Trabajo de transcripción no encontrado.")
+
+    return {
+        "job_id": job_id,
+        "conversation_id": fragment["conversation_id"],
+        "status": fragment.get("transcription_status"),
+        "transcription": fragment.get("transcription"),
+    }
+
+
+async def collect_conversation_fragments(conversation_id, speaker=None):
+    """
+    Fragmentos de la conversación, filtrados por hablante en MongoDB si se
+    indica speaker.
+    """
+    return await get_fragment_repository().list(conversation_id, speaker)
+
+
+async def conversation_has_fragments(conversation_id):
+    return await get_fragment_repository().has_fragments(conversation_id)
+
+
+async def wait_for_fragment_storage():
+    """
+    Espera a que terminen los índices y la migración de los fragmentos
+    embebidos. Hasta entonces, una conversación con fragmentos sin migrar
+    parecería no tenerlos.
+    """
+    await readiness.wait("fragment_storage")
+
+
+async def prepare_fragment_storage():
+    """
+    Crea los índices de fragments, migra los fragmentos embebidos que queden y
+    marca como fallidas las transcripciones que quedaron pendientes.
+    """
+    await get_fragment_repository().ensure_indexes()
+    migrated = await migrate_embedded_fragments(get_conversations_collection(), get_fragments_collection())
+    if migrated:
+        logger.info(f"Migrados {migrated} fragmentos embebidos a la colección fragments.")
+    interrupted = await get_fragment_repository().fail_pending_transcriptions()
+    if interrupted:
+        logger.warning(f"{interrupted} transcripciones pendientes de un arranque anterior marcadas como fallidas.")
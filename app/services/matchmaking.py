@@ -0,0 +1,205 @@
+"""
+Matchmaking: compatibilidad de una pareja, lotes de candidatos con
+preselección local e índice persistente de perfiles.
+"""
+import asyncio
+import logging
+import os
+import re
+from datetime import datetime
+from typing import List
+
+from fastapi import HTTPException
+
+from app.config import MATCHMAKING_INDEX_PATH
+from app.llm import chat_completion, completion_content
+from app.metrics import MATCHMAKING_CANDIDATES
+from app.models import PersonModel
+from app.readiness import readiness
+from app.services.clients import get_matchmaking_index, set_matchmaking_index
+
+logger = logging.getLogger(__name__)
+
+
+async def call_openai_api(person1, person2, data_analysis):
+    prompt = f"""
+      **Objective**: To connect individuals based on their interests and compatibility for the purpose of learning English and practicing together.
+
+      **Data Analysis**:
+      - **Age Difference**: {data_analysis['age_difference']} years
+      - **Common Interests Count**: {data_analysis['interest_common']}
+      - **Common Hobbies Count**: {data_analysis['hobbies_common']}
+      - **Learning Preferences Match**: {data_analysis['learning_preferences_match']}
+      - **User Values Match**: {data_analysis['user_values_match']}
+      - **Digital Behavior Match**: {data_analysis['digital_behavior_match']}
+      - **Common Conversation Topics Count**: {data_analysis['conversation_topics_common']}
+
+      **Detailed Criteria**:
+      - **Depth of Common Interests**: Assess the significance of common interests. Are they aligned with both individuals' goals?
+      - **Hobbies' Impact on Compatibility**: Evaluate how shared hobbies can facilitate bonding and conversation.
+      - **Learning Preferences**: Consider how closely the individuals' preferred learning styles complement each other.
+      - **Values in Relationships**: Analyze how aligned values may contribute to deeper understanding and conflict resolution.
+      - **Digital Behavior Compatibility**: Examine how similar digital behaviors can affect their interaction frequency and comfort.
+      - **Conversation Topics Alignment**: Explore how well the common conversation topics can foster engaging discussions.
+
+      **Compatibility Evaluation**:
+      - Evaluate the compatibility considering the above factors and their significance for effective communication without awkward silences.
+      **Expected Response**: Provide a compatibility score from 0 to 1, considering both positive and negative influences on the score. Return only the final score without explanations o textos adicionales.
+    """
+
+    try:
+        result = completion_content(await chat_completion(prompt, validate=parse_score))
+    except ValueError:
+        logger.warning("La respuesta de OpenAI no contiene una puntuación de compatibilidad.")
+        return None
+    return parse_score(result)
+
+
+def parse_score(result):
+    match = re.search(r"(\b0(?:\.\d+)?|1(?:\.0)?)", result)
+    if not match:
+        raise ValueError(f"Puntuación no encontrada en la respuesta: {result!r}")
+    return float(match.group(0))
+
+def analyze_data(person1: PersonModel, person2: PersonModel):
+    # Accede a los atributos del modelo
+    dob1 = datetime.strptime(person1.user.date_of_birth, '%Y-%m-%d')
+    dob2 = datetime.strptime(person2.user.date_of_birth, '%Y-%m-%d')
+
+    analysis = {
+        "age_difference": abs((dob1 - dob2).days // 365),
+        "interest_common": len(set(person1.interests).intersection(set(person2.interests))),
+        "hobbies_common": len(set(person1.hobbies).intersection(set(person2.hobbies))),
+        "learning_preferences_match": person1.learning_preferences == person2.learning_preferences,
+        "user_values_match": person1.user_values == person2.user_values,
+        "digital_behavior_match": person1.digital_behavior == person2.digital_behavior,
+        "conversation_topics_common": len(set(person1.conversation_topics).intersection(set(person2.conversation_topics)))
+    }
+    return analysis
+
+async def evaluate_compatibility(person1: PersonModel, person2: PersonModel):
+    data_analysis = analyze_data(person1, person2)
+    compatibility_score = await call_openai_api(person1, person2, data_analysis)
+    return compatibility_score
+
+
+def rank_candidates(person: PersonModel, candidates: List[PersonModel], top_k: int):
+    # NumPy solo se carga con la primera preselección
+    from app.matchmaking import pair_features, local_scores, top_candidates, feature_row
+
+    features = pair_features(person, candidates)
+    scores = local_scores(person, features)
+    return [
+        (int(index), float(scores[index]), feature_row(features, index))
+        for index in top_candidates(scores, top_k)
+    ]
+
+
+async def score_ranked_candidates(person, ranked, candidate_of, key):
+    """
+    Evalúa con OpenAI, todos a la vez, los candidatos ya preseleccionados
+    (identificador, puntuación local, características) y los ordena por la
+    puntuación de compatibilidad. Si falla la evaluación de un candidato, su
+    puntuación queda en None y el resto del lote sigue adelante.
+    """
+    scores = await asyncio.gather(*[
+        call_openai_api(person, candidate_of(candidate), data_analysis)
+        for candidate, _, data_analysis in ranked
+    ], return_exceptions=True)
+    failed = [score for score in scores if isinstance(score, Exception)]
+    if failed:
+        logger.warning(f"No se pudo evaluar {len(failed)} de {len(scores)} candidatos: {failed[0]}")
+    scores = [None if isinstance(score, Exception) else score for score in scores]
+    results = [
+        {
+            key: candidate,
+            "local_score": round(local_score, 4),
+            "compatibility_score": score,
+            "data_analysis": data_analysis,
+        }
+        for (candidate, local_score, data_analysis), score in zip(ranked, scores)
+    ]
+    # Los candidatos sin puntuación de OpenAI quedan al final, en orden local
+    results.sort(key=lambda result: (result["compatibility_score"] is None,
+                                     -(result["compatibility_score"] or 0)))
+    return results
+
+
+async def evaluate_candidates(person: PersonModel, candidates: List[PersonModel], top_k: int):
+    """
+    Ordena los candidatos con la puntuación local (en un hilo, para no
+    bloquear el event loop con lotes grandes) y evalúa con OpenAI solo los
+    top_k mejores, todos a la vez.
+    """
+    ranked = await asyncio.to_thread(rank_candidates, person, candidates, top_k)
+    MATCHMAKING_CANDIDATES.labels("ranked").inc(len(candidates))
+    MATCHMAKING_CANDIDATES.labels("scored").inc(len(ranked))
+    return await score_ranked_candidates(
+        person, ranked, lambda index: candidates[index], "candidate_index")
+
+
+def register_profile(profile_id, person: PersonModel):
+    matchmaking_index = get_matchmaking_index()
+    try:
+        matchmaking_index.upsert(profile_id, person)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Fecha de nacimiento no válida: {e}")
+    return len(matchmaking_index)
+
+
+def get_profile(profile_id):
+    person = get_matchmaking_index().get(profile_id)
+    if person is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado.")
+    return person
+
+
+def delete_profile(profile_id):
+    matchmaking_index = get_matchmaking_index()
+    if not matchmaking_index.delete(profile_id):
+        raise HTTPException(status_code=404, detail="Perfil no encontrado.")
+    return len(matchmaking_index)
+
+
+async def find_profile_matches(profile_id, top_k):
+    """
+    Mejores parejas de un perfil registrado en el índice de matchmaking: el
+    índice preselecciona los top_k y OpenAI los evalúa.
+    """
+    matchmaking_index = get_matchmaking_index()
+    person = get_profile(profile_id)
+    ranked = matchmaking_index.query(person, top_k, exclude=profile_id)
+    MATCHMAKING_CANDIDATES.labels("scored").inc(len(ranked))
+    return await score_ranked_candidates(
+        person, ranked, matchmaking_index.get, "profile_id")
+
+
+async def load_matchmaking_index():
+    """
+    Carga el snapshot de MATCHMAKING_INDEX_PATH, si existe, y sustituye el
+    índice. Se ejecuta en segundo plano al arrancar; las rutas de perfiles
+    esperan a que termine con wait_for_matchmaking_index.
+    """
+    if MATCHMAKING_INDEX_PATH and os.path.exists(MATCHMAKING_INDEX_PATH):
+        from app.matchmaking_index import MatchmakingIndex
+        set_matchmaking_index(await asyncio.to_thread(MatchmakingIndex.load, MATCHMAKING_INDEX_PATH))
+
+
+async def wait_for_matchmaking_index():
+    """
+    Espera a que termine la carga del snapshot del índice. Un alta o baja
+    recibida antes se perdería al sustituir el índice por el cargado, y un
+    snapshot guardado antes sobrescribiría el fichero con el índice vacío.
+    """
+    await readiness.wait("matchmaking_index")
+
+
+async def save_matchmaking_index():
+    """Guarda el índice en MATCHMAKING_INDEX_PATH, si está configurado."""
+    if not MATCHMAKING_INDEX_PATH:
+        return False
+    # El estado se copia en el event loop y se escribe en un hilo
+    matchmaking_index = get_matchmaking_index()
+    state = matchmaking_index.snapshot_state()
+    await asyncio.to_thread(matchmaking_index.save, MATCHMAKING_INDEX_PATH, state)
+    return True
@@ -0,0 +1,131 @@
+"""
+Motor de extracción de características basado en un único espectrograma.
+
+librosa.feature.* recalcula la STFT (o el espectrograma mel) de toda la señal
+en cada llamada. Aquí la magnitud de la STFT se calcula una sola vez y de ella
+se derivan, por bloques de frames y con NumPy vectorizado, el centroide, el
+ancho de banda, el contraste, la planitud, el espectrograma mel, los MFCC y la
+envolvente de onsets usada para el tempo. El pico de memoria queda acotado por
+un espectrograma de magnitud (float32) más un bloque de trabajo.
+
+Tolerancia respecto a las llamadas individuales de librosa con los mismos
+parámetros (n_fft=2048, hop_length=512, ventana hann, center=True):
+    - rms, zero_crossing_rate, pitch y tempo: idénticos (mismo algoritmo). El
+      pitch se calcula ahora con la frecuencia de muestreo real de la señal
+      (antes librosa.yin asumía 22050 Hz).
+    - contraste, mel, MFCC y onsets: idénticos salvo redondeo float32.
+    - centroide, ancho de banda y planitud: error relativo < 1e-4 en la media
+      (se acumulan en float64 con fórmulas de momentos).
+"""
+import numpy as np
+import librosa
+
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+N_MFCC = 20
+# librosa.note_to_hz('C2') y librosa.note_to_hz('C7'). Se escriben como
+# constantes para que importar el módulo no cargue el núcleo de librosa.
+PITCH_FMIN = 65.40639132514966
+PITCH_FMAX = 2093.004522404789
+# Número de frames procesados a la vez al recorrer el espectrograma
+FRAME_BLOCK = 2048
+
+
+def magnitude_spectrogram(y, n_fft=N_FFT, hop_length=HOP_LENGTH):
+    """
+    Magnitud de la STFT (float32) equivalente a np.abs(librosa.stft(y)) con
+    center=True, calculada por bloques para no materializar la STFT compleja
+    completa.
+    """
+    y = np.asarray(y, dtype=np.float32)
+    y_pad = np.pad(y, n_fft // 2, mode="constant")
+    n_frames = 1 + len(y) // hop_length
+    S = np.empty((1 + n_fft // 2, n_frames), dtype=np.float32)
+
+    for start in range(0, n_frames, FRAME_BLOCK):
+        stop = min(start + FRAME_BLOCK, n_frames)
+        chunk = y_pad[start * hop_length:(stop - 1) * hop_length + n_fft]
+        S[:, start:stop] = np.abs(
+            librosa.stft(chunk, n_fft=n_fft, hop_length=hop_length, center=False))
+    return S
+
+
+def _spectral_block(S_block, freqs, amin=1e-10):
+    """
+    Centroide, ancho de banda (p=2) y planitud de un bloque de frames.
+    """
+    S64 = S_block.astype(np.float64)
+    total = S64.sum(axis=0)
+    valid = total > np.finfo(np.float32).tiny
+    safe_total = np.where(valid, total, 1.0)
+
+    centroid = np.where(valid, (freqs @ S64) / safe_total, 0.0)
+    second_moment = np.where(valid, ((freqs ** 2) @ S64) / safe_total, 0.0)
+    bandwidth = np.sqrt(np.maximum(second_moment - centroid ** 2, 0.0))
+
+    power = np.maximum(amin, S64 ** 2)
+    flatness = np.exp(np.mean(np.log(power), axis=0)) / np.mean(power, axis=0)
+    return centroid, bandwidth, flatness
+
+
+def extract_features(y, sr, pitch_fmax=PITCH_FMAX, pitch_frame_length=N_FFT):
+    """
+    Extrae todas las características de la señal a partir de una única STFT.
+
+    Devuelve un diccionario con las series por frame (pitch, rms,
+    zero_crossing_rate, spectral_centroid, spectral_bandwidth,
+    spectral_contrast, spectral_flatness), la matriz de MFCC y el tempo. El
+    rango y el tamaño de frame del tono son configurables (perfiles de
+    análisis); el hop es siempre HOP_LENGTH.
+    """
+    S = magnitude_spectrogram(y)
+    n_frames = S.shape[1]
+    freqs = librosa.fft_frequencies(sr=sr, n_fft=N_FFT)
+    mel_basis = librosa.filters.mel(sr=sr, n_fft=N_FFT, n_mels=N_MELS)
+
+    centroid = np.empty(n_frames)
+    bandwidth = np.empty(n_frames)
+    flatness = np.empty(n_frames)
+    contrast = None
+    mel = np.empty((N_MELS, n_frames), dtype=np.float32)
+
+    for start in range(0, n_frames, FRAME_BLOCK):
+        stop = min(start + FRAME_BLOCK, n_frames)
+        S_block = S[:, start:stop]
+        centroid[start:stop], bandwidth[start:stop], flatness[start:stop] = \
+            _spectral_block(S_block, freqs)
+
+        block_contrast = librosa.feature.spectral_contrast(S=S_block, sr=sr, n_fft=N_FFT)
+        if contrast is None:
+            contrast = np.empty((block_contrast.shape[0], n_frames), dtype=block_contrast.dtype)
+        contrast[:, start:stop] = block_contrast
+
+        mel[:, start:stop] = mel_basis @ np.square(S_block)
+
+    del S
+
+    # Los MFCC y la envolvente de onsets parten del mismo mel en dB
+    mel_db = librosa.power_to_db(mel)
+    del mel
+    mfccs = librosa.feature.mfcc(S=mel_db, sr=sr, n_mfcc=N_MFCC)
+    # beat_track(y=...) agrega las bandas mel con la mediana, no con la media
+    onset_envelope = librosa.onset.onset_strength(S=mel_db, sr=sr, aggregate=np.median)
+    tempo, _ = librosa.beat.beat_track(
+        onset_envelope=onset_envelope, sr=sr, hop_length=HOP_LENGTH)
+
+    return {
+        "frames": {
+            "pitch": librosa.yin(y, fmin=PITCH_FMIN, fmax=pitch_fmax, sr=sr,
+                                 frame_length=pitch_frame_length, hop_length=HOP_LENGTH),
+            "rms": librosa.feature.rms(y=y, frame_length=N_FFT, hop_length=HOP_LENGTH),
+            "zero_crossing_rate": librosa.feature.zero_crossing_rate(
+                y, frame_length=N_FFT, hop_length=HOP_LENGTH),
+            "spectral_centroid": centroid,
+            "spectral_bandwidth": bandwidth,
+            "spectral_contrast": contrast,
+            "spectral_flatness": flatness,
+        },
+        "mfccs": mfccs,
+        "tempo": float(np.atleast_1d(tempo)[0]),
+    }
@@ -0,0 +1,203 @@
+"""
+Transcripción de fragmentos.
+
+El PCM del fragmento se divide en silencios en trozos de como mucho
+TRANSCRIPTION_MAX_CHUNK_SECONDS, los trozos se transcriben en paralelo y el
+texto se vuelve a unir en orden, conservando el inicio y el fin de cada trozo.
+El motor de reconocimiento es intercambiable (interfaz Transcriber), de modo
+que Google puede sustituirse por un reconocedor local o por un stub en pruebas.
+
+Todas las llamadas son síncronas y se ejecutan en hilos fuera del event loop.
+"""
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import speech_recognition as sr
+
+from app.config import (
+    TRANSCRIPTION_BACKEND,
+    TRANSCRIPTION_LANGUAGE,
+    TRANSCRIPTION_TIMEOUT_SECONDS,
+    TRANSCRIPTION_MAX_CHUNK_SECONDS,
+    TRANSCRIPTION_MIN_SILENCE_MS,
+    TRANSCRIPTION_SILENCE_OFFSET_DB,
+    TRANSCRIPTION_CHUNK_CONCURRENCY,
+)
+from app.ingest import PCM_SAMPLE_WIDTH
+from app.metrics import TRANSCRIPTION_CHUNKS, track
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_TRANSCRIPTION = "No se pudo transcribir el audio."
+# Resolución del detector de silencios
+SILENCE_FRAME_MS = 20
+
+
+class Transcriber:
+    """
+    Interfaz de los motores de transcripción. transcribe recibe un
+    speech_recognition.AudioData y devuelve el texto; lanza
+    sr.UnknownValueError si no reconoce nada y sr.RequestError si el servicio
+    falla (lo que permite reintentar).
+    """
+
+    def transcribe(self, audio_data):
+        raise NotImplementedError
+
+
+class GoogleTranscriber(Transcriber):
+    def __init__(self, language=TRANSCRIPTION_LANGUAGE, timeout=TRANSCRIPTION_TIMEOUT_SECONDS):
+        self.language = language
+        self.timeout = timeout
+
+    def transcribe(self, audio_data):
+        recognizer = sr.Recognizer()
+        recognizer.operation_timeout = self.timeout
+        return recognizer.recognize_google(audio_data, language=self.language)
+
+
+class SphinxTranscriber(Transcriber):
+    """
+    Reconocedor local (sin red) de CMU Sphinx. Requiere pocketsphinx y el
+    modelo del idioma configurado.
+    """
+
+    def __init__(self, language=TRANSCRIPTION_LANGUAGE):
+        self.language = language
+
+    def transcribe(self, audio_data):
+        return sr.Recognizer().recognize_sphinx(audio_data, language=self.language)
+
+
+TRANSCRIBERS = {
+    "google": GoogleTranscriber,
+    "sphinx": SphinxTranscriber,
+}
+
+_transcriber = None
+_chunk_executor = ThreadPoolExecutor(
+    max_workers=TRANSCRIPTION_CHUNK_CONCURRENCY, thread_name_prefix="transcription")
+
+
+def get_transcriber():
+    global _transcriber
+    if _transcriber is None:
+        _transcriber = TRANSCRIBERS[TRANSCRIPTION_BACKEND]()
+    return _transcriber
+
+
+def set_transcriber(transcriber):
+    """Sustituye el motor de transcripción (por ejemplo por un stub en pruebas)."""
+    global _transcriber
+    _transcriber = transcriber
+
+
+def split_on_silence(samples, sample_rate,
+                     max_chunk_seconds=TRANSCRIPTION_MAX_CHUNK_SECONDS,
+                     min_silence_ms=TRANSCRIPTION_MIN_SILENCE_MS,
+                     silence_offset_db=TRANSCRIPTION_SILENCE_OFFSET_DB):
+    """
+    Divide la señal en trozos de como mucho max_chunk_seconds, cortando en el
+    centro de silencios de al menos min_silence_ms. Un frame es silencio si su
+    nivel queda silence_offset_db por debajo del nivel medio del fragmento.
+    Si no hay ningún silencio dentro del límite se corta en el límite. Devuelve
+    una lista de (inicio, fin) en muestras, sin los trozos totalmente en silencio.
+    """
+    n = len(samples)
+    frame = max(1, sample_rate * SILENCE_FRAME_MS // 1000)
+    n_frames = n // frame
+    if n_frames == 0:
+        return [(0, n)] if n else []
+
+    frames = samples[:n_frames * frame].astype(np.float32).reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1)) + 1e-9
+    db = 20 * np.log10(rms)
+    mean_db = 20 * np.log10(np.sqrt(np.mean(rms ** 2)))
+    silent = db < mean_db - silence_offset_db
+
+    # Centros de los tramos de silencio suficientemente largos (en muestras)
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    min_frames = max(1, min_silence_ms // SILENCE_FRAME_MS)
+    long_runs = (stops - starts) >= min_frames
+    cut_points = ((starts[long_runs] + stops[long_runs]) // 2) * frame
+
+    max_chunk = int(max_chunk_seconds * sample_rate)
+    chunks = []
+    start = 0
+    while start < n:
+        limit = start + max_chunk
+        if limit >= n:
+            end = n
+        else:
+            candidates = cut_points[(cut_points > start) & (cut_points <= limit)]
+            end = int(candidates[-1]) if len(candidates) else limit
+        chunks.append((start, end))
+        start = end
+
+    # Descarta los trozos en los que todos los frames son silencio
+    voiced = []
+    for start, end in chunks:
+        first, last = start // frame, min(-(-end // frame), n_frames)
+        if first >= n_frames or not np.all(silent[first:last]):
+            voiced.append((start, end))
+    return voiced
+
+
+def _transcribe_chunk(transcriber, pcm, sample_rate):
+    try:
+        return transcriber.transcribe(sr.AudioData(pcm, sample_rate, PCM_SAMPLE_WIDTH))
+    except sr.UnknownValueError:
+        return ""
+
+
+def transcribe_pcm(pcm, sample_rate, raise_service_errors=False):
+    """
+    Transcribe el PCM s16le mono del fragmento por trozos en paralelo.
+
+    Devuelve {"text": ..., "segments": [{"start", "end", "text"}]} con los
+    tiempos en segundos. Si el servicio falla, el texto es el mensaje de error,
+    o se relanza la excepción con raise_service_errors para que la cola de
+    trabajos pueda reintentar.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    chunks = split_on_silence(samples, sample_rate)
+    transcriber = get_transcriber()
+
+    futures = [
+        _chunk_executor.submit(
+            _transcribe_chunk, transcriber, samples[start:end].tobytes(), sample_rate)
+        for start, end in chunks
+    ]
+    try:
+        with track("transcription"):
+            texts = [future.result() for future in futures]
+    except sr.RequestError as e:
+        for future in futures:
+            future.cancel()
+        if raise_service_errors:
+            raise
+        return {"text": f"Error de servicio; {e}", "segments": []}
+
+    segments = [
+        {"start": start / sample_rate, "end": end / sample_rate, "text": text}
+        for (start, end), text in zip(chunks, texts)
+        if text
+    ]
+    TRANSCRIPTION_CHUNKS.labels("text").inc(len(segments))
+    TRANSCRIPTION_CHUNKS.labels("empty").inc(len(chunks) - len(segments))
+    text = " ".join(segment["text"] for segment in segments)
+    return {"text": text or UNKNOWN_TRANSCRIPTION, "segments": segments}
+
+
+def transcribe_wav(wav_bytes, raise_service_errors=False):
+    """
+    Transcribe un audio WAV completo (ruta de ingesta sin streaming).
+    """
+    with sr.AudioFile(io.BytesIO(wav_bytes)) as source:
+        audio_data = sr.Recognizer().record(source)
+    pcm = audio_data.get_raw_data(convert_width=PCM_SAMPLE_WIDTH)
+    return transcribe_pcm(pcm, audio_data.sample_rate, raise_service_errors)
@@ -0,0 +1,5 @@
+"""
+Benchmarks de extremo a extremo de la API con sustitutos locales de S3
+(moto), MongoDB (mongomock o un mongod local) y OpenAI (servidor HTTP falso).
+Ver benchmarks.run.
+"""
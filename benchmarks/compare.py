@@ -0,0 +1,78 @@
+"""
+Compara dos resultados de benchmarks.run e indica las regresiones.
+
+    python -m benchmarks.compare base.json candidate.json --threshold 0.1
+
+Para cada etapa presente en los dos resultados compara p50/p95/p99 de
+latencia y el pico de RSS (peor si suben) y el throughput (peor si baja). Sale
+con código 1 si algún cambio empeora más que threshold (relativo).
+"""
+import argparse
+import json
+import sys
+
+# (ruta dentro del resumen de la etapa, True si más alto es mejor)
+METRICS = (
+    (("latency_ms", "p50"), False),
+    (("latency_ms", "p95"), False),
+    (("latency_ms", "p99"), False),
+    (("throughput_rps",), True),
+    (("peak_rss_mb",), False),
+    (("peak_children_rss_mb",), False),
+)
+
+
+def _get(summary, path):
+    for key in path:
+        if not isinstance(summary, dict) or key not in summary:
+            return None
+        summary = summary[key]
+    return summary
+
+
+def compare(base, candidate, threshold):
+    rows = []
+    for stage, base_summary in base["stages"].items():
+        candidate_summary = candidate["stages"].get(stage)
+        if candidate_summary is None:
+            continue
+        for path, higher_is_better in METRICS:
+            before, after = _get(base_summary, path), _get(candidate_summary, path)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            rows.append({
+                "stage": stage,
+                "metric": ".".join(path),
+                "base": before,
+                "candidate": after,
+                "change": round(change, 4),
+                "regression": worse > threshold,
+            })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara dos resultados de benchmarks.run.")
+    parser.add_argument("base")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Empeoramiento relativo a partir del cual se considera regresión.")
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    rows = compare(base, candidate, args.threshold)
+    for row in rows:
+        flag = "REGRESIÓN" if row["regression"] else ""
+        print(f"{row['stage']:<20} {row['metric']:<22} {row['base']:>12} -> {row['candidate']:>12} "
+              f"{row['change']:+8.1%} {flag}")
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Servidor HTTP local que imita /v1/chat/completions de OpenAI.
+
+Responde tras una latencia configurable (más un jitter aleatorio) con el
+contenido que espera cada llamada de la API: el JSON del análisis textual, el
+JSON del informe o una puntuación de compatibilidad, según el prompt. Admite
+stream=True (Server-Sent Events, un trozo cada chunk_delay segundos) y envía
+las cabeceras x-ratelimit-* para que el limitador del cliente trabaje como en
+producción. Se ejecuta con uvicorn en un hilo aparte con su propio event loop.
+"""
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+TEXT_ANALYSIS = {
+    "analysis": {"grammar": 7, "vocabulary": 6, "fluency": 7, "coherence": 8, "style": 6},
+    "critical_feedback": "Good structure overall; vary the vocabulary and reduce hesitations.",
+}
+REPORT = {
+    "feedback": "Buena fluidez general. Conviene ampliar el vocabulario y cuidar los tiempos verbales.",
+    "metrics": {
+        "grammar_score": 4, "vocabulary": 3, "pronunciation": 4,
+        "fluency": 4, "coherence": 4, "style": 3,
+    },
+    "recommended_courses": [
+        {"link": "https://example.com/courses/vocabulary",
+         "justification": "Refuerza el vocabulario, el punto más débil de la conversación."},
+    ],
+}
+STREAM_CHUNK_CHARS = 24
+
+
+def reply_for(prompt):
+    if "English language evaluator" in prompt:
+        return json.dumps(TEXT_ANALYSIS)
+    if "feedback report" in prompt:
+        return json.dumps(REPORT, ensure_ascii=False)
+    if "compatibility score" in prompt:
+        return "0.72"
+    return "ok"
+
+
+def create_app(latency=0.2, jitter=0.05, chunk_delay=0.01, seed=0):
+    rng = random.Random(seed)
+    stats = {"requests": 0, "streamed": 0}
+
+    def rate_limit_headers():
+        return {
+            "x-ratelimit-limit-requests": "100000",
+            "x-ratelimit-remaining-requests": "99999",
+            "x-ratelimit-reset-requests": "1ms",
+            "x-ratelimit-limit-tokens": "100000000",
+            "x-ratelimit-remaining-tokens": "99999000",
+            "x-ratelimit-reset-tokens": "1ms",
+        }
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+        content = reply_for(prompt)
+        # Aproximación de OpenAI: unos 4 caracteres por token
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        stats["requests"] += 1
+        await asyncio.sleep(max(0.0, latency + rng.uniform(-jitter, jitter)))
+
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": f"chatcmpl-bench-{stats['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            }, headers=rate_limit_headers())
+
+        stats["streamed"] += 1
+
+        async def events():
+            for start in range(0, len(content), STREAM_CHUNK_CHARS):
+                chunk = {"choices": [{"index": 0, "delta": {"content": content[start:start + STREAM_CHUNK_CHARS]}}]}
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(chunk_delay)
+            # Como la API real: el último trozo con contenido vacío trae finish_reason
+            yield f"data: {json.dumps({'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers=rate_limit_headers())
+
+    app = Starlette(routes=[Route("/v1/chat/completions", chat_completions, methods=["POST"])])
+    app.state.stats = stats
+    return app
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class FakeOpenAIServer:
+    """
+    with FakeOpenAIServer(latency=0.2) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+    """
+
+    def __init__(self, latency=0.2, jitter=0.05, chunk_delay=0.01, seed=0):
+        self.app = create_app(latency, jitter, chunk_delay, seed)
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}/v1"
+        self._server = uvicorn.Server(uvicorn.Config(
+            self.app, host="127.0.0.1", port=self.port, log_level="warning",
+            lifespan="off", backlog=4096))
+        self._thread = threading.Thread(target=self._server.run, name="fake-openai", daemon=True)
+
+    @property
+    def stats(self):
+        return dict(self.app.state.stats)
+
+    def start(self, timeout=10):
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("No se pudo arrancar el servidor falso de OpenAI.")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,331 @@
+"""
+Benchmark de extremo a extremo de la API.
+
+La aplicación se ejecuta en este mismo proceso (ASGI, sin red) contra
+sustitutos locales de sus servicios externos:
+
+- S3: moto (mock_aws), con el bucket creado al arrancar.
+- MongoDB: mongomock_motor, o un mongod real con --mongo-uri.
+- OpenAI: benchmarks.fake_openai, un servidor HTTP local con latencia
+  configurable, al que apunta OPENAI_BASE_URL.
+- Transcripción: un reconocedor local con latencia configurable.
+
+Las etapas se ejecutan en orden, cada una con N peticiones y como mucho C a
+la vez: record (/record-conversation con audio sintético), analyze
+(/analyze-conversation), matchmaking (/matchmaking) y, con
+--batch-candidates, matchmaking_batch (/matchmaking/batch). De cada una se
+mide p50/p95/p99 de latencia, throughput y pico de RSS (del proceso y de su
+pool de análisis), y el resultado se escribe en JSON:
+
+    python -m benchmarks.run --conversations 20 --fragments 4 --concurrency 8 \\
+        --output bench.json
+    python -m benchmarks.compare base.json bench.json
+
+La configuración de la aplicación (ANALYSIS_WORKERS, STREAMING_INGEST...) se
+toma del entorno como siempre; las opciones de esta línea de comandos solo
+fijan las que el benchmark necesita para aislarse.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.audio import fragment_wav
+from benchmarks.fake_openai import FakeOpenAIServer
+
+BENCH_BUCKET = "bench-fragments"
+RESULT_VERSION = 1
+READY_TIMEOUT_SECONDS = 120
+
+INTERESTS = ["music", "travel", "movies", "football", "cooking", "books", "technology",
+             "photography", "hiking", "art", "science", "history", "gaming", "dance"]
+VALUES = ["honesty", "respect", "curiosity", "patience", "humor", "ambition"]
+LEARNING_PREFERENCES = ["visual", "auditory", "reading", "kinesthetic"]
+DIGITAL_BEHAVIOR = ["daily", "weekly", "evenings", "weekends"]
+COURSES = [
+    {"name": "Everyday vocabulary", "url": "https://example.com/courses/vocabulary", "level": "A2",
+     "summary": "Vocabulary for everyday conversations, travel and hobbies.",
+     "classes": [{"url": "https://example.com/classes/1", "name": "Food and cooking", "summary": "Vocabulary"}]},
+    {"name": "Fluent conversation", "url": "https://example.com/courses/fluency", "level": "B1",
+     "summary": "Fluency, pronunciation and coherence in spoken English.",
+     "classes": [{"url": "https://example.com/classes/2", "name": "Linking words", "summary": "Coherence"}]},
+    {"name": "Grammar in use", "url": "https://example.com/courses/grammar", "level": "B2",
+     "summary": "Verb tenses, conditionals and grammatical accuracy.",
+     "classes": [{"url": "https://example.com/classes/3", "name": "Past tenses", "summary": "Grammar"}]},
+]
+
+
+class BenchmarkTranscriber:
+    """Reconocedor local: espera latency segundos y devuelve un texto fijo."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def transcribe(self, audio_data):
+        time.sleep(self.latency)
+        return "I would like to practice my English every day"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stages", default="record,analyze,matchmaking,matchmaking_batch",
+                        help="Etapas a ejecutar, separadas por comas.")
+    parser.add_argument("--conversations", type=int, default=10,
+                        help="Conversaciones a grabar y analizar.")
+    parser.add_argument("--fragments", type=int, default=4,
+                        help="Fragmentos por conversación (alternando los dos hablantes).")
+    parser.add_argument("--fragment-seconds", type=float, default=8.0,
+                        help="Duración de cada fragmento de audio sintético.")
+    parser.add_argument("--matchmaking-requests", type=int, default=50)
+    parser.add_argument("--batch-requests", type=int, default=5)
+    parser.add_argument("--batch-candidates", type=int, default=2000,
+                        help="Candidatos por petición de /matchmaking/batch (0 la omite).")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--openai-latency-ms", type=float, default=200)
+    parser.add_argument("--openai-jitter-ms", type=float, default=50)
+    parser.add_argument("--transcription-latency-ms", type=float, default=100)
+    parser.add_argument("--recompute-audio", action="store_true",
+                        help="Borra las características precalculadas antes de analizar, "
+                             "para medir la descarga de S3 y el análisis completo del audio.")
+    parser.add_argument("--mongo-uri", default=None,
+                        help="Usa un mongod real (con una base de datos nueva) en vez de mongomock.")
+    parser.add_argument("--llm-cache", action="store_true",
+                        help="Deja activa la caché de respuestas de OpenAI (por defecto se desactiva).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Fichero JSON de resultados (por defecto stdout).")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args, openai_base_url):
+    """Variables de entorno que la aplicación lee al importarse."""
+    os.environ["OPENAI_BASE_URL"] = openai_base_url
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["BUCKET_NAME"] = BENCH_BUCKET
+    os.environ["AWS_ACCESS_KEY_ID"] = "bench"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "bench"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    os.environ["LLM_CACHE_ENABLED"] = "true" if args.llm_cache else "false"
+    os.environ["MATCHMAKING_INDEX_PATH"] = ""
+    # Sin límites de la cuenta real: el servidor falso anuncia los suyos
+    os.environ.setdefault("OPENAI_REQUESTS_PER_MINUTE", "1000000")
+    os.environ.setdefault("OPENAI_TOKENS_PER_MINUTE", "1000000000")
+    os.environ.setdefault("OPENAI_MAX_CONCURRENCY", str(max(16, 4 * args.concurrency)))
+    if args.mongo_uri:
+        os.environ["MONGO_URI"] = args.mongo_uri
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def random_person(rng):
+    year = rng.randint(1960, 2008)
+    return {
+        "user": {"date_of_birth": f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"},
+        "interests": rng.sample(INTERESTS, rng.randint(2, 6)),
+        "hobbies": rng.sample(INTERESTS, rng.randint(1, 4)),
+        "user_values": rng.sample(VALUES, 2),
+        "learning_preferences": rng.choice(LEARNING_PREFERENCES),
+        "digital_behavior": rng.choice(DIGITAL_BEHAVIOR),
+        "conversation_topics": rng.sample(INTERESTS, rng.randint(2, 5)),
+    }
+
+
+async def wait_until_ready(client):
+    deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+    while True:
+        response = await client.get("/ready")
+        if response.status_code == 200:
+            return response.json()
+        if "failed" in response.json()["subsystems"].values() or time.monotonic() > deadline:
+            raise RuntimeError(f"La aplicación no está lista: {response.json()}")
+        await asyncio.sleep(0.1)
+
+
+async def seed_database():
+    from app.services.clients import get_database
+    await get_database()["courses"].insert_many([dict(course) for course in COURSES])
+
+
+async def stage_record(client, args, rng, run_stage):
+    # Una conversación por cada par de usuarios; se crean antes de medir
+    conversations = []
+    for index in range(args.conversations):
+        users = (f"bench-user-{index}-a", f"bench-user-{index}-b")
+        response = await client.post("/create-conversation",
+                                     json={"user_uuid_1": users[0], "user_uuid_2": users[1]})
+        response.raise_for_status()
+        conversations.append((response.json()["conversation_id"], users))
+
+    # El audio se genera antes de medir y se reutiliza entre conversaciones
+    wavs = [fragment_wav(args.fragment_seconds, seed=args.seed + i) for i in range(min(args.fragments, 8))]
+
+    calls = []
+    for conversation_id, users in conversations:
+        for index in range(args.fragments):
+            start = index * args.fragment_seconds
+            form = {
+                "conversation_id": conversation_id,
+                "speaker_id": users[index % 2],
+                "start_time": f"{start:.2f}",
+                "end_time": f"{start + args.fragment_seconds:.2f}",
+            }
+            wav = wavs[index % len(wavs)]
+            calls.append(lambda form=form, wav=wav: client.post(
+                "/record-conversation", data=form, files={"file": ("fragment.wav", wav, "audio/wav")}))
+    rng.shuffle(calls)
+    summary, _ = await run_stage(calls, args.concurrency)
+    summary["audio_seconds_per_request"] = args.fragment_seconds
+    return summary, conversations
+
+
+async def stage_analyze(client, args, conversations, run_stage):
+    if args.recompute_audio:
+        from app.services.clients import get_fragments_collection
+        await get_fragments_collection().update_many({}, {"$unset": {"features": ""}})
+
+    calls = [
+        lambda conversation_id=conversation_id, user=users[0]: client.post(
+            "/analyze-conversation", json={"user_id": user, "conversation_id": conversation_id})
+        for conversation_id, users in conversations
+    ]
+    summary, responses = await run_stage(calls, args.concurrency)
+    summary["server_timing_ms"] = server_timing_percentiles(responses)
+    return summary
+
+
+def server_timing_percentiles(responses):
+    """p50 de cada etapa de la cabecera Server-Timing de las respuestas."""
+    import numpy as np
+
+    durations = {}
+    for response in responses:
+        if response is None:
+            continue
+        for entry in filter(None, response.headers.get("server-timing", "").split(",")):
+            name, _, dur = entry.strip().partition(";dur=")
+            if dur:
+                durations.setdefault(name, []).append(float(dur))
+    return {name: round(float(np.percentile(values, 50)), 2) for name, values in durations.items()}
+
+
+async def stage_matchmaking(client, args, rng, run_stage):
+    pairs = [(random_person(rng), random_person(rng)) for _ in range(args.matchmaking_requests)]
+    calls = [
+        lambda p1=p1, p2=p2: client.post("/matchmaking", json={"person1": p1, "person2": p2})
+        for p1, p2 in pairs
+    ]
+    summary, _ = await run_stage(calls, args.concurrency)
+    return summary
+
+
+async def stage_matchmaking_batch(client, args, rng, run_stage):
+    candidates = [random_person(rng) for _ in range(args.batch_candidates)]
+    calls = [
+        lambda person=random_person(rng): client.post(
+            "/matchmaking/batch", json={"person": person, "candidates": candidates})
+        for _ in range(args.batch_requests)
+    ]
+    summary, _ = await run_stage(calls, args.concurrency)
+    summary["candidates_per_request"] = args.batch_candidates
+    return summary
+
+
+async def run_benchmark(args, stages):
+    import httpx
+    from benchmarks.stats import run_stage
+    from app import transcription
+    from app.main import app
+    from app.services import clients
+
+    transcription.set_transcriber(BenchmarkTranscriber(args.transcription_latency_ms / 1000))
+    if not args.mongo_uri:
+        from mongomock_motor import AsyncMongoMockClient
+        clients.set_mongo_client(AsyncMongoMockClient())
+    clients.DATABASE_NAME = f"bench-{int(time.time())}"
+
+    rng = random.Random(args.seed)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            startup = time.perf_counter()
+            readiness = await wait_until_ready(client)
+            results["startup"] = {"ready_seconds": round(time.perf_counter() - startup, 3),
+                                  "subsystems": readiness["subsystems"]}
+            await seed_database()
+
+            conversations = []
+            if "record" in stages:
+                results["record"], conversations = await stage_record(client, args, rng, run_stage)
+            if "analyze" in stages:
+                if not conversations:
+                    raise SystemExit("La etapa analyze necesita la etapa record.")
+                results["analyze"] = await stage_analyze(client, args, conversations, run_stage)
+            if "matchmaking" in stages:
+                results["matchmaking"] = await stage_matchmaking(client, args, rng, run_stage)
+            if "matchmaking_batch" in stages and args.batch_candidates > 0:
+                results["matchmaking_batch"] = await stage_matchmaking_batch(client, args, rng, run_stage)
+
+            if args.mongo_uri:
+                await clients.get_mongo_client().drop_database(clients.DATABASE_NAME)
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    logging.basicConfig(level=logging.WARNING)
+
+    with FakeOpenAIServer(latency=args.openai_latency_ms / 1000,
+                          jitter=args.openai_jitter_ms / 1000, seed=args.seed) as openai_server:
+        configure_environment(args, openai_server.base_url)
+
+        import boto3
+        from moto import mock_aws
+
+        with mock_aws():
+            boto3.client("s3").create_bucket(Bucket=BENCH_BUCKET)
+            started_at = datetime.now(timezone.utc).isoformat()
+            stages_results = asyncio.run(run_benchmark(args, stages))
+        openai_requests = openai_server.stats
+
+    from app import config
+    result = {
+        "version": RESULT_VERSION,
+        "started_at": started_at,
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "args": vars(args),
+        "app_config": {
+            "ANALYSIS_WORKERS": config.ANALYSIS_WORKERS,
+            "STREAMING_INGEST": config.STREAMING_INGEST,
+            "OPENAI_MAX_CONCURRENCY": config.OPENAI_MAX_CONCURRENCY,
+            "LLM_CACHE_ENABLED": config.LLM_CACHE_ENABLED,
+        },
+        "fake_openai": openai_requests,
+        "stages": stages_results,
+    }
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Medición de las etapas del benchmark: latencias, throughput y pico de RSS.
+"""
+import asyncio
+import logging
+import os
+import resource
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 95, 99)
+RSS_SAMPLE_SECONDS = 0.02
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def _children(pid):
+    """Descendientes de pid (el pool de procesos de análisis), vía /proc."""
+    found = []
+    pending = [pid]
+    while pending:
+        parent = pending.pop()
+        try:
+            tasks = os.listdir(f"/proc/{parent}/task")
+        except OSError:
+            continue
+        for tid in tasks:
+            try:
+                with open(f"/proc/{parent}/task/{tid}/children") as f:
+                    children = [int(child) for child in f.read().split()]
+            except OSError:
+                continue
+            found.extend(children)
+            pending.extend(children)
+    return found
+
+
+class RssSampler:
+    """
+    Muestrea en un hilo el RSS de este proceso y la suma del de sus
+    descendientes y guarda los picos. Fuera de Linux (sin /proc) usa el
+    máximo de getrusage, que es el pico de toda la vida del proceso y no el de
+    la etapa.
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_children_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._proc = os.path.exists("/proc/self/statm")
+
+    def _sample(self):
+        if not self._proc:
+            # ru_maxrss está en KiB en Linux y en bytes en macOS
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak_rss = max(self.peak_rss, maxrss if maxrss > 1 << 32 else maxrss * 1024)
+            return
+        pid = os.getpid()
+        self.peak_rss = max(self.peak_rss, _rss_bytes(pid))
+        self.peak_children_rss = max(
+            self.peak_children_rss, sum(_rss_bytes(child) for child in _children(pid)))
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def summarize(latencies, wall_seconds, statuses, sampler):
+    latencies = np.asarray(latencies, dtype=float)
+    errors = {status: count for status, count in statuses.items() if status >= 400 or status == 0}
+    summary = {
+        "requests": int(latencies.size),
+        "errors": int(sum(errors.values())),
+        "status_codes": {str(status): count for status, count in sorted(statuses.items())},
+        "wall_seconds": round(wall_seconds, 4),
+        "throughput_rps": round(latencies.size / wall_seconds, 3) if wall_seconds else None,
+        "latency_ms": {},
+        "peak_rss_mb": round(sampler.peak_rss / 2 ** 20, 1),
+        "peak_children_rss_mb": round(sampler.peak_children_rss / 2 ** 20, 1),
+    }
+    if latencies.size:
+        values = np.percentile(latencies * 1000, PERCENTILES)
+        summary["latency_ms"] = {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, values)}
+        summary["latency_ms"]["mean"] = round(float(latencies.mean() * 1000), 2)
+        summary["latency_ms"]["max"] = round(float(latencies.max() * 1000), 2)
+    return summary
+
+
+async def run_stage(calls, concurrency):
+    """
+    Ejecuta las corrutinas que devuelven calls (funciones sin argumentos que
+    devuelven una respuesta de httpx) con como mucho concurrency a la vez.
+    Devuelve el resumen de la etapa y las respuestas en el orden de calls
+    (None si la petición lanzó una excepción).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+    responses = [None] * len(calls)
+
+    async def one(index, call):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await call()
+            except Exception:
+                logger.exception("La petición lanzó una excepción.")
+                status = 0
+            else:
+                status = response.status_code
+                responses[index] = response
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(index, call) for index, call in enumerate(calls)))
+        wall_seconds = time.perf_counter() - start
+
+    return summarize(latencies, wall_seconds, statuses, sampler), responses
@@ -0,0 +1,101 @@
+"""
+Control de admisión: clases por ruta, cola acotada (429), espera máxima en
+cola (503) y respuesta del middleware con Retry-After.
+"""
+import asyncio
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.admission import AdmissionMiddleware, Lane, Rejected, lane_for
+
+
+@pytest.mark.parametrize("path, lane", [
+    ("/analyze-conversation", "analysis"),
+    ("/analyze-conversation/stream", "analysis"),
+    ("/record-conversation", "ingest"),
+    ("/matchmaking", "llm"),
+    ("/matchmaking/batch/", "llm"),
+    ("/matchmaking/profiles/p-1/matches", "llm"),
+    ("/matchmaking/profiles/p-1", "light"),
+    ("/create-conversation", "light"),
+])
+def test_lane_for(path, lane):
+    assert lane_for(path) == lane
+
+
+def test_full_queue_rejects_with_429():
+    async def scenario():
+        lane = Lane("test", concurrency=1, queue_depth=1, queue_timeout=1)
+        await lane.acquire()
+        waiter = asyncio.create_task(lane.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as error:
+            await lane.acquire()
+        # El hueco pasa al que esperaba en cola
+        lane.release(0.5)
+        await waiter
+        assert (lane.active, lane.queued) == (1, 0)
+        return error.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert rejected.retry_after >= 1
+
+
+def test_queue_timeout_rejects_with_503():
+    async def scenario():
+        lane = Lane("test", concurrency=1, queue_depth=4, queue_timeout=0.05)
+        await lane.acquire()
+        with pytest.raises(Rejected) as error:
+            await lane.acquire()
+        return lane, error.value
+
+    lane, rejected = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert (lane.active, lane.queued) == (1, 0)
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        lane = Lane("test", concurrency=1, queue_depth=4, queue_timeout=1)
+        await lane.acquire()
+        waiter = asyncio.create_task(lane.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        lane.release()
+        return lane
+
+    lane = asyncio.run(scenario())
+    assert (lane.active, lane.queued) == (0, 0)
+
+
+def test_middleware_answers_503_with_retry_after():
+    release = asyncio.Event()
+
+    async def slow(request):
+        await release.wait()
+        return PlainTextResponse("ok")
+
+    lane = Lane("light", concurrency=1, queue_depth=1, queue_timeout=0.05)
+    app = AdmissionMiddleware(Starlette(routes=[Route("/slow", slow)]), lanes={"light": lane})
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            first = asyncio.create_task(client.get("/slow"))
+            while lane.active == 0:
+                await asyncio.sleep(0.01)
+            rejected = await client.get("/slow")
+            release.set()
+            return await first, rejected
+
+    first, rejected = asyncio.run(scenario())
+    assert first.status_code == 200
+    assert rejected.status_code == 503
+    assert int(rejected.headers["retry-after"]) >= 1
+    assert "detail" in rejected.json()
+    assert (lane.active, lane.queued) == (0, 0)
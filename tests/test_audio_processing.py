@@ -0,0 +1,60 @@
+"""
+Decodificación por bloques del análisis completo: mismos formatos que la
+ingesta y error (en vez de métricas a cero) si no hay audio.
+"""
+import io
+import json
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+import pytest
+
+from app.audio_processing import decode_pcm_blocks, extract_audio_features
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg no está instalado")
+
+SAMPLE_RATE = 16000
+
+
+@pytest.fixture(scope="module")
+def m4a_moov_at_end(tmp_path_factory):
+    # Sin -movflags faststart el átomo moov queda al final, como en los móviles
+    path = tmp_path_factory.mktemp("audio") / "tone.m4a"
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+         "-f", "lavfi", "-i", "sine=frequency=300:duration=10", "-c:a", "aac", str(path)],
+        check=True)
+    return path.read_bytes()
+
+
+def empty_wav():
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+    return buffer.getvalue()
+
+
+def test_decode_blocks_reads_m4a_with_moov_at_end(m4a_moov_at_end):
+    samples = sum(len(block) for block in decode_pcm_blocks(m4a_moov_at_end, SAMPLE_RATE))
+    assert samples / SAMPLE_RATE == pytest.approx(10, abs=0.1)
+
+
+@pytest.mark.parametrize("blob", [b"not audio" * 1000, empty_wav()])
+def test_decode_blocks_raises_without_samples(blob):
+    with pytest.raises(ValueError):
+        list(decode_pcm_blocks(blob, SAMPLE_RATE))
+
+
+def test_extract_audio_features_on_m4a(m4a_moov_at_end):
+    results = json.loads(extract_audio_features([m4a_moov_at_end], "fast"))
+    assert results["rms"] > 0.05
+    assert np.isclose(results["average_pitch"], 300, rtol=0.05)
+
+
+def test_extract_audio_features_fails_instead_of_zero_metrics():
+    with pytest.raises(ValueError):
+        extract_audio_features([empty_wav()], "fast")
@@ -0,0 +1,35 @@
+"""
+Caché del catálogo de cursos: la versión solo cambia con el contenido, así
+que el índice TF-IDF no se reconstruye en cada recarga.
+"""
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from app.catalog import CourseCatalog
+from app.course_ranking import CourseIndex
+
+
+def test_version_changes_only_with_content():
+    async def scenario():
+        collection = AsyncMongoMockClient()["test"]["courses"]
+        await collection.insert_one({"name": "Grammar basics", "summary": "verbs and tenses"})
+        catalog = CourseCatalog(collection, ttl_seconds=0)
+        index = CourseIndex(catalog)
+        builds = []
+        build = index._build
+        index._build = lambda courses: builds.append(len(courses)) or build(courses)
+
+        versions = []
+        for _ in range(3):
+            await index.ensure()
+            versions.append(catalog.version)
+        await collection.insert_one({"name": "Pronunciation", "summary": "sounds and accent"})
+        await index.ensure()
+        versions.append(catalog.version)
+        return versions, builds, await index.top_k("accent sounds", k=1)
+
+    versions, builds, top = asyncio.run(scenario())
+    assert versions == [1, 1, 1, 2]
+    assert builds == [1, 2]
+    assert top[0]["name"] == "Pronunciation"
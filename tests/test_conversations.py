@@ -0,0 +1,44 @@
+"""
+Las rutas de fragmentos esperan a que termine la migración del arranque: una
+conversación con fragmentos aún embebidos no debe parecer vacía.
+"""
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app.models import ConversationAnalysisRequest
+from app.readiness import Readiness
+from app.routes.analysis import load_user_fragments
+from app.services import clients, conversations
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    monkeypatch.setattr(clients, "_mongo_client", AsyncMongoMockClient())
+    clients.get_fragment_repository.cache_clear()
+    monkeypatch.setattr(conversations, "readiness", Readiness())
+    yield clients.get_database()
+    clients.get_fragment_repository.cache_clear()
+
+
+def test_analysis_waits_for_embedded_fragment_migration(mongo, monkeypatch):
+    migrate = conversations.migrate_embedded_fragments
+
+    async def slow_migration(*args):
+        await asyncio.sleep(0.05)
+        return await migrate(*args)
+
+    monkeypatch.setattr(conversations, "migrate_embedded_fragments", slow_migration)
+
+    async def scenario():
+        await mongo["conversation"].insert_one({
+            "conversation_id": "conv-1",
+            "fragments": [{"speaker": "user-1", "start_time": "0.00", "audio_url": "a", "transcription": "hi"}],
+        })
+        conversations.readiness.warm("fragment_storage", conversations.prepare_fragment_storage)
+        request = ConversationAnalysisRequest(user_id="user-1", conversation_id="conv-1")
+        return await load_user_fragments(request)
+
+    fragments = asyncio.run(scenario())
+    assert [f["transcription"] for f in fragments] == ["hi"]
@@ -0,0 +1,170 @@
+"""
+FragmentRepository sobre mongomock_motor: upsert idempotente, filtro por
+hablante, orden de llegada y migración de los fragmentos embebidos.
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+from app.fragments import FragmentRepository, migrate_embedded_fragments
+from app.jobs import INTERRUPTED_TRANSCRIPTION
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def fragment(speaker, start_time, **fields):
+    return {
+        "speaker": speaker,
+        "start_time": start_time,
+        "end_time": f"{float(start_time) + 8:.2f}",
+        "audio_url": f"https://bucket.s3.amazonaws.com/{speaker}-{start_time}.wav",
+        "transcription": f"{speaker} {start_time}",
+        **fields,
+    }
+
+
+async def make_repository(conversation_ids=("conv-1",)):
+    database = AsyncMongoMockClient()["test"]
+    for conversation_id in conversation_ids:
+        await database["conversation"].insert_one({"conversation_id": conversation_id})
+    repository = FragmentRepository(database["conversation"], database["fragments"])
+    await repository.ensure_indexes()
+    return repository, database
+
+
+def test_list_keeps_arrival_order():
+    async def scenario():
+        repository, _ = await make_repository()
+        # Orden lexicográfico de start_time: 0.00, 16.00, 24.00, 8.00
+        for start_time in ("0.00", "8.00", "16.00", "24.00"):
+            await repository.add("conv-1", fragment("user-1", start_time))
+        return await repository.list("conv-1", "user-1")
+
+    fragments = run(scenario())
+    assert [f["start_time"] for f in fragments] == ["0.00", "8.00", "16.00", "24.00"]
+    assert "sequence" not in fragments[0]
+
+
+def test_add_is_idempotent_and_keeps_position():
+    async def scenario():
+        repository, database = await make_repository()
+        await repository.add("conv-1", fragment("user-1", "0.00"))
+        await repository.add("conv-1", fragment("user-1", "8.00"))
+        await repository.add("conv-1", fragment("user-1", "0.00", transcription="retry"))
+        count = await database["fragments"].count_documents({})
+        return count, await repository.list("conv-1")
+
+    count, fragments = run(scenario())
+    assert count == 2
+    assert [f["transcription"] for f in fragments] == ["retry", "user-1 8.00"]
+
+
+def test_list_filters_by_speaker():
+    async def scenario():
+        repository, _ = await make_repository()
+        for speaker, start_time in (("user-1", "0.00"), ("user-2", "4.00"), ("user-1", "8.00")):
+            await repository.add("conv-1", fragment(speaker, start_time))
+        return (await repository.list("conv-1", "user-1"),
+                await repository.list("conv-1"),
+                await repository.has_fragments("conv-1"),
+                await repository.has_fragments("conv-2"))
+
+    user_fragments, all_fragments, has_fragments, missing = run(scenario())
+    assert [f["start_time"] for f in user_fragments] == ["0.00", "8.00"]
+    assert [f["speaker"] for f in all_fragments] == ["user-1", "user-2", "user-1"]
+    assert has_fragments and not missing
+
+
+def test_add_to_unknown_conversation_fails():
+    async def scenario():
+        repository, _ = await make_repository()
+        await repository.add("conv-x", fragment("user-1", "0.00"))
+
+    with pytest.raises(HTTPException) as error:
+        run(scenario())
+    assert error.value.status_code == 404
+
+
+def test_transcription_update_by_job():
+    async def scenario():
+        repository, _ = await make_repository()
+        await repository.add("conv-1", fragment(
+            "user-1", "0.00", transcription="", transcription_status="pending", transcription_job_id="job-1"))
+        await repository.update_transcription("job-1", {"text": "hello", "segments": []}, "done")
+        return await repository.find_by_job("job-1")
+
+    job = run(scenario())
+    assert job == {"conversation_id": "conv-1", "transcription": "hello", "transcription_status": "done"}
+
+
+def test_pending_transcriptions_fail_on_startup():
+    async def scenario():
+        repository, _ = await make_repository()
+        await repository.add("conv-1", fragment(
+            "user-1", "0.00", transcription="pending", transcription_status="pending", transcription_job_id="job-1"))
+        await repository.add("conv-1", fragment("user-1", "8.00", transcription_status="done"))
+        failed = await repository.fail_pending_transcriptions()
+        return failed, await repository.find_by_job("job-1"), await repository.list("conv-1")
+
+    failed, job, fragments = run(scenario())
+    assert failed == 1
+    assert job["transcription_status"] == "failed"
+    assert job["transcription"] == INTERRUPTED_TRANSCRIPTION
+    assert [f["transcription_status"] for f in fragments] == ["failed", "done"]
+
+
+def test_migration_keeps_embedded_order_before_new_fragments():
+    async def scenario():
+        repository, database = await make_repository(())
+        await database["conversation"].insert_one({
+            "conversation_id": "conv-1",
+            "fragments": [fragment("user-1", start_time) for start_time in ("0.00", "8.00", "16.00", "24.00")],
+        })
+        migrated = await migrate_embedded_fragments(database["conversation"], database["fragments"])
+        await repository.add("conv-1", fragment("user-1", "32.00"))
+        # Volver a migrar no duplica nada
+        migrated_again = await migrate_embedded_fragments(database["conversation"], database["fragments"])
+        conversation = await database["conversation"].find_one({"conversation_id": "conv-1"})
+        return migrated, migrated_again, conversation, await repository.list("conv-1", "user-1")
+
+    migrated, migrated_again, conversation, fragments = run(scenario())
+    assert (migrated, migrated_again) == (4, 0)
+    assert conversation["fragments"] == []
+    assert [f["start_time"] for f in fragments] == ["0.00", "8.00", "16.00", "24.00", "32.00"]
+
+
+def test_migration_keeps_colliding_fragments_embedded():
+    async def scenario():
+        repository, database = await make_repository(())
+        await database["conversation"].insert_one({
+            "conversation_id": "conv-1",
+            "fragments": [
+                fragment("user-1", "0.00", transcription="first"),
+                fragment("user-1", "0.00", transcription="second"),
+                # Copia exacta del primero: se puede quitar sin perder nada
+                fragment("user-1", "0.00", transcription="first"),
+                fragment("user-1", "8.00"),
+            ],
+        })
+        migrated = await migrate_embedded_fragments(database["conversation"], database["fragments"])
+        migrated_again = await migrate_embedded_fragments(database["conversation"], database["fragments"])
+        conversation = await database["conversation"].find_one({"conversation_id": "conv-1"})
+        return migrated, migrated_again, conversation["fragments"], await repository.list("conv-1")
+
+    migrated, migrated_again, embedded, fragments = run(scenario())
+    assert (migrated, migrated_again) == (2, 0)
+    assert [f["transcription"] for f in fragments] == ["first", "user-1 8.00"]
+    assert [f["transcription"] for f in embedded] == ["second"]
+
+
+def test_list_returns_audio_key_for_analysis():
+    async def scenario():
+        repository, _ = await make_repository()
+        await repository.add("conv-1", fragment("user-1", "0.00", audio_key="abc.wav"))
+        return await repository.list("conv-1")
+
+    assert run(scenario())[0]["audio_key"] == "abc.wav"
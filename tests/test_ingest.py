@@ -0,0 +1,130 @@
+"""
+Ingesta en streaming: decodificación con ffmpeg por stdin (incluidos los M4A
+con el átomo moov al final) y limpieza de la subida si el audio no vale.
+"""
+import asyncio
+import io
+import shutil
+import subprocess
+import wave
+
+import boto3
+import pytest
+from fastapi import HTTPException
+from moto import mock_aws
+
+from app.ingest import PCMDecoder, PCM_SAMPLE_WIDTH, stream_upload
+from app.s3_storage import FragmentStore, MultipartUpload
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg no está instalado")
+
+SAMPLE_RATE = 16000
+BUCKET = "test-bucket"
+# Tamaño mínimo de parte que acepta S3 (y moto)
+PART_SIZE = 5 * 1024 * 1024
+
+
+class FakeUploadFile:
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    async def read(self, size=-1):
+        return self._data.read(size)
+
+
+@pytest.fixture
+def store():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield FragmentStore(bucket=BUCKET, client=client)
+
+
+def bucket_state(store):
+    objects = store.client.list_objects_v2(Bucket=BUCKET).get("Contents", [])
+    uploads = store.client.list_multipart_uploads(Bucket=BUCKET).get("Uploads", [])
+    return [o["Key"] for o in objects], uploads
+
+
+def encode(tmp_path, name, *args):
+    """Tono de 10 s codificado por ffmpeg con los argumentos indicados."""
+    path = tmp_path / name
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+         "-f", "lavfi", "-i", "sine=frequency=300:duration=10", *args, str(path)],
+        check=True)
+    return path.read_bytes()
+
+
+async def decode(data, chunk_size=4096):
+    decoder = PCMDecoder(SAMPLE_RATE)
+    await decoder.start()
+    try:
+        for start in range(0, len(data), chunk_size):
+            await decoder.feed(data[start:start + chunk_size])
+        return await decoder.finish()
+    finally:
+        decoder.kill()
+
+
+@pytest.mark.parametrize("name, args", [
+    ("tone.wav", ()),
+    # Sin -movflags faststart el átomo moov queda al final, como en los móviles
+    ("tone.m4a", ("-c:a", "aac")),
+])
+def test_decoder_decodes_whole_file(tmp_path, name, args):
+    pcm = asyncio.run(decode(encode(tmp_path, name, *args)))
+    seconds = len(pcm) / (PCM_SAMPLE_WIDTH * SAMPLE_RATE)
+    assert seconds == pytest.approx(10, abs=0.1)
+
+
+def test_decoder_rejects_undecodable_input():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(decode(b"not audio" * 1000))
+    assert error.value.status_code == 400
+
+
+def test_decoder_rejects_file_without_samples():
+    # WAV válido pero vacío: ffmpeg termina con código 0 sin producir PCM
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(decode(buffer.getvalue()))
+    assert error.value.status_code == 400
+
+
+def test_stream_upload_stores_decoded_audio(tmp_path, store):
+    data = encode(tmp_path, "tone.wav")
+    audio_url, pcm, sample_rate = asyncio.run(
+        stream_upload(FakeUploadFile(data), store.open_upload("tone.wav")))
+    assert audio_url == store.public_url("tone.wav")
+    assert len(pcm) / (PCM_SAMPLE_WIDTH * sample_rate) == pytest.approx(10, abs=0.1)
+    assert bucket_state(store) == (["tone.wav"], [])
+
+
+@pytest.mark.parametrize("size, part_size", [
+    # Cabe en una parte: complete haría un put_object
+    (64 * 1024, PART_SIZE),
+    # Subida por partes ya empezada cuando falla la decodificación
+    (PART_SIZE + 1024, PART_SIZE),
+])
+def test_stream_upload_leaves_nothing_when_decoding_fails(store, size, part_size):
+    garbage = (b"not audio" * (size // 9 + 1))[:size]
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(stream_upload(FakeUploadFile(garbage), MultipartUpload(store, "x.mp3", part_size)))
+    assert error.value.status_code == 400
+    assert bucket_state(store) == ([], [])
+
+
+def test_abort_removes_completed_upload(store):
+    async def scenario():
+        upload = MultipartUpload(store, "done.wav", PART_SIZE)
+        await upload.write(b"a" * (PART_SIZE + 10))
+        await upload.complete()
+        await upload.abort()
+
+    asyncio.run(scenario())
+    assert bucket_state(store) == ([], [])
@@ -0,0 +1,72 @@
+"""
+Cola de transcripción acotada: con la cola llena submit lanza QueueFull y
+/record-conversation responde 503 con Retry-After sin procesar el audio.
+"""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.jobs import TranscriptionQueue, DONE
+from app.routes import audio
+from app.services.clients import get_fragment_store, get_transcription_queue
+
+
+def transcribe():
+    return {"text": "hola", "segments": []}
+
+
+def test_submit_rejects_when_queue_is_full():
+    results = []
+
+    async def on_result(job, result, status):
+        results.append((job["job_id"], status))
+
+    async def scenario():
+        queue = TranscriptionQueue(on_result, workers=1, max_queued=1)
+        queue.start()
+        # El worker todavía no ha sacado nada: cabe un trabajo en espera
+        queue.submit(transcribe, job_id="job-1", conversation_id="conv-1")
+        assert queue.full()
+        with pytest.raises(asyncio.QueueFull):
+            queue.submit(transcribe, job_id="job-2", conversation_id="conv-1")
+        rejected = queue.get("job-2")
+        await queue._queue.join()
+        await queue.stop()
+        return rejected
+
+    assert asyncio.run(scenario()) is None
+    assert results == [("job-1", DONE)]
+
+
+class FullQueue:
+    def full(self):
+        return True
+
+    def submit(self, *args, **kwargs):
+        raise AssertionError("no se debe encolar nada con la cola llena")
+
+
+class UnusedStore:
+    def open_upload(self, key):
+        raise AssertionError("no se debe subir nada con la cola llena")
+
+
+def test_record_conversation_returns_503_when_queue_is_full():
+    app = FastAPI()
+    app.include_router(audio.router)
+    app.dependency_overrides[get_transcription_queue] = FullQueue
+    app.dependency_overrides[get_fragment_store] = UnusedStore
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/record-conversation", data={
+                "conversation_id": "conv-1", "speaker_id": "user-1", "start_time": "0.00",
+                "end_time": "8.00", "async_transcription": "true",
+            }, files={"file": ("fragment.wav", b"RIFF", "audio/wav")})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) >= 1
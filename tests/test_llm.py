@@ -0,0 +1,210 @@
+"""
+OpenAIClient sobre httpx.MockTransport: reintentos ante 429 y 5xx, respeto de
+Retry-After, límite de ritmo y validación de respuestas en chat_completion.
+"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app import llm
+from app.llm import LLMCache, LLMError, OpenAIClient, RateLimiter, TokenBucket, parse_reset
+
+
+def completion(content, finish_reason="stop"):
+    return httpx.Response(200, json={
+        "choices": [{"message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    })
+
+
+class ScriptedOpenAI:
+    """Responde a cada petición con la siguiente respuesta del guion (la última se repite)."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def __call__(self, request):
+        response = self.responses[min(self.calls, len(self.responses) - 1)]
+        self.calls += 1
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def make_client(server, monkeypatch, max_retries=2):
+    client = OpenAIClient(
+        base_url="https://api.test/v1", max_retries=max_retries, retry_base_seconds=0.001,
+        requests_per_minute=10000, tokens_per_minute=10000000,
+        transport=httpx.MockTransport(server))
+    delays = []
+    retry_delay = client._retry_delay
+
+    def spy(attempt, response=None):
+        delay = retry_delay(attempt, response)
+        delays.append(delay)
+        return delay
+
+    monkeypatch.setattr(client, "_retry_delay", spy)
+    return client, delays
+
+
+@pytest.fixture
+def openai(monkeypatch):
+    """Instala un cliente con guion como cliente compartido y una caché limpia."""
+    def install(*responses, max_retries=2):
+        server = ScriptedOpenAI(*responses)
+        client, delays = make_client(server, monkeypatch, max_retries=max_retries)
+        monkeypatch.setattr(llm, "_openai_client", client)
+        monkeypatch.setattr(llm, "_llm_cache", LLMCache(path=""))
+        return server, delays
+    return install
+
+
+def test_429_is_retried_after_retry_after(monkeypatch):
+    server = ScriptedOpenAI(
+        httpx.Response(429, headers={"retry-after": "0.05"}, json={"error": "rate limited"}),
+        completion("ok"),
+    )
+    client, delays = make_client(server, monkeypatch)
+
+    async def scenario():
+        start = time.perf_counter()
+        response = await client.post("/chat/completions", {"model": "m", "messages": []})
+        elapsed = time.perf_counter() - start
+        await client.aclose()
+        return response, elapsed
+
+    response, elapsed = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert server.calls == 2
+    assert len(delays) == 1 and 0.05 <= delays[0] <= 0.052
+    assert elapsed >= 0.045
+
+
+def test_5xx_is_returned_once_retries_run_out(monkeypatch):
+    server = ScriptedOpenAI(httpx.Response(503, text="overloaded"))
+    client, delays = make_client(server, monkeypatch, max_retries=2)
+
+    async def scenario():
+        response = await client.post("/chat/completions", {"model": "m", "messages": []})
+        await client.aclose()
+        return response
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 503
+    assert server.calls == 3
+    # Sin Retry-After: backoff exponencial con jitter completo
+    assert len(delays) == 2
+    assert all(delay <= 0.001 * 2 ** attempt for attempt, delay in enumerate(delays))
+
+
+def test_client_errors_are_not_retried(monkeypatch):
+    server = ScriptedOpenAI(httpx.Response(400, text="bad request"), completion("ok"))
+    client, delays = make_client(server, monkeypatch)
+
+    async def scenario():
+        response = await client.post("/chat/completions", {"model": "m", "messages": []})
+        await client.aclose()
+        return response
+
+    assert asyncio.run(scenario()).status_code == 400
+    assert server.calls == 1 and delays == []
+
+
+def test_connection_errors_raise_504_after_retries(monkeypatch):
+    server = ScriptedOpenAI(httpx.ConnectError("connection refused"))
+    client, _ = make_client(server, monkeypatch, max_retries=1)
+
+    async def scenario():
+        try:
+            await client.post("/chat/completions", {"model": "m", "messages": []})
+        finally:
+            await client.aclose()
+
+    with pytest.raises(LLMError) as error:
+        asyncio.run(scenario())
+    assert error.value.status_code == 504
+    assert server.calls == 2
+
+
+def test_chat_completion_raises_when_retries_run_out(openai):
+    server, _ = openai(httpx.Response(502, text="bad gateway"), max_retries=1)
+
+    with pytest.raises(LLMError) as error:
+        asyncio.run(llm.chat_completion("hola"))
+    assert error.value.status_code == 502
+    assert server.calls == 2
+
+
+def test_invalid_json_fails_validation_and_is_not_cached(openai):
+    server, _ = openai(completion("esto no es JSON"), completion('{"score": 7}'))
+
+    async def scenario():
+        with pytest.raises(json.JSONDecodeError):
+            await llm.chat_completion("puntúa", validate=json.loads)
+        # La respuesta inválida no se guardó: se vuelve a preguntar
+        first = await llm.chat_completion("puntúa", validate=json.loads)
+        # La válida sí: ya no hay más peticiones
+        second = await llm.chat_completion("puntúa", validate=json.loads)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert server.calls == 2
+    assert first == second
+    assert json.loads(first["choices"][0]["message"]["content"]) == {"score": 7}
+
+
+def test_incomplete_response_is_not_cached(openai):
+    server, _ = openai(completion('{"score": 7', finish_reason="length"), completion('{"score": 7}'))
+
+    async def scenario():
+        await llm.chat_completion("puntúa")
+        return await llm.chat_completion("puntúa")
+
+    response = asyncio.run(scenario())
+    assert server.calls == 2
+    assert response["choices"][0]["finish_reason"] == "stop"
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("20ms", 0.02),
+    ("1s", 1.0),
+    ("6m0s", 360.0),
+    ("1h2m3.5s", 3723.5),
+    ("2", 2.0),
+])
+def test_parse_reset(value, seconds):
+    assert parse_reset(value) == pytest.approx(seconds)
+
+
+@pytest.mark.parametrize("value", [None, "", "soon"])
+def test_parse_reset_ignores_unknown_values(value):
+    assert parse_reset(value) is None
+
+
+def test_token_bucket_refills_per_minute():
+    bucket = TokenBucket(60)
+    bucket.take(60)
+    # 60 por minuto: un token por segundo
+    assert bucket.wait_time(1) == pytest.approx(1.0, abs=0.01)
+    # Una petición mayor que la capacidad espera a tener el cubo lleno, no para siempre
+    assert bucket.wait_time(1000) == pytest.approx(60.0, abs=0.1)
+
+
+def test_rate_limiter_waits_for_the_server_reset():
+    async def scenario():
+        limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=100000)
+        limiter.update(httpx.Headers({
+            "x-ratelimit-limit-requests": "1000",
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "50ms",
+        }))
+        start = time.perf_counter()
+        await limiter.acquire(10)
+        return time.perf_counter() - start
+
+    assert asyncio.run(scenario()) >= 0.045
@@ -0,0 +1,159 @@
+"""
+La preselección local (/matchmaking/batch) y el índice de perfiles deben dar
+las mismas características que analyze_data y el mismo orden entre sí.
+"""
+import asyncio
+import random
+
+import pytest
+from pydantic import ValidationError
+
+from app.config import MATCHMAKING_MAX_TOP_K
+from app.llm import LLMError
+from app.matchmaking import pair_features, feature_row
+from app.matchmaking_index import MatchmakingIndex
+from app.models import MatchmakingBatchRequest, PersonModel
+from app.services import matchmaking as matchmaking_service
+from app.readiness import Readiness
+
+TERMS = [f"term-{i}" for i in range(12)]
+VALUES = [["honesty"], ["honesty", "respect"], ["respect"]]
+STYLES = ["visual", "auditory", "kinesthetic"]
+HABITS = ["mobile", "desktop"]
+
+
+def person(dob, interests=(), hobbies=(), topics=(), values=("respect",), style="visual", habit="mobile"):
+    return PersonModel(
+        user={"date_of_birth": dob},
+        interests=list(interests),
+        hobbies=list(hobbies),
+        user_values=list(values),
+        learning_preferences=style,
+        digital_behavior=habit,
+        conversation_topics=list(topics),
+    )
+
+
+def random_person(rng):
+    def terms():
+        # Con repetidos: analyze_data cuenta elementos distintos
+        return rng.choices(TERMS, k=rng.randint(0, 5))
+
+    return person(
+        f"{rng.randint(1960, 2008)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        terms(), terms(), terms(),
+        rng.choice(VALUES), rng.choice(STYLES), rng.choice(HABITS),
+    )
+
+
+def build_index(profiles):
+    index = MatchmakingIndex()
+    for profile_id, profile in profiles.items():
+        index.upsert(profile_id, profile)
+    return index
+
+
+def test_pair_features_match_analyze_data():
+    rng = random.Random(1)
+    for _ in range(20):
+        target = random_person(rng)
+        candidates = [random_person(rng) for _ in range(30)]
+        features = pair_features(target, candidates)
+        for i, candidate in enumerate(candidates):
+            assert feature_row(features, i) == matchmaking_service.analyze_data(target, candidate)
+
+
+def test_index_query_matches_batch_ranking():
+    rng = random.Random(2)
+    profiles = {f"p{i}": random_person(rng) for i in range(200)}
+    index = build_index(profiles)
+    for _ in range(20):
+        target = random_person(rng)
+        for k in (1, 5, 50, 250):
+            batch = matchmaking_service.rank_candidates(target, list(profiles.values()), k)
+            indexed = index.query(target, k)
+            assert [profile_id for profile_id, _, _ in indexed] == [f"p{i}" for i, _, _ in batch]
+            for (profile_id, score, data), (_, batch_score, batch_data) in zip(indexed, batch):
+                assert abs(score - batch_score) < 1e-12
+                assert data == batch_data == matchmaking_service.analyze_data(target, profiles[profile_id])
+
+
+def test_index_ranks_close_age_without_overlap_above_weak_overlap():
+    target = person("1990-01-01", interests=["music", "films", "travel", "cooking"],
+                    style="visual", habit="mobile")
+    profiles = {
+        # Sin nada en común y la misma edad: puntuación 0
+        "same-age": person("1990-06-01", values=("honesty",), style="auditory", habit="desktop"),
+        # Un interés en común y 30 años de diferencia: puntuación negativa
+        "old": person("1960-01-01", interests=["music"], values=("honesty",), style="auditory", habit="desktop"),
+    }
+    ranked = build_index(profiles).query(target, 1)
+    assert [profile_id for profile_id, _, _ in ranked] == ["same-age"]
+    assert [index for index, _, _ in matchmaking_service.rank_candidates(target, list(profiles.values()), 1)] == [0]
+
+
+def test_index_query_excludes_profile_and_skips_deleted():
+    rng = random.Random(3)
+    profiles = {f"p{i}": random_person(rng) for i in range(20)}
+    index = build_index(profiles)
+    index.delete("p3")
+    del profiles["p3"]
+    ranked = index.query(profiles["p0"], 100, exclude="p0")
+    assert sorted(profile_id for profile_id, _, _ in ranked) == sorted(set(profiles) - {"p0"})
+
+
+def test_index_snapshot_round_trip(tmp_path):
+    rng = random.Random(4)
+    profiles = {f"p{i}": random_person(rng) for i in range(50)}
+    index = build_index(profiles)
+    path = tmp_path / "index.json"
+    index.save(path)
+    loaded = MatchmakingIndex.load(path)
+    target = random_person(rng)
+    assert loaded.query(target, 10) == index.query(target, 10)
+    assert loaded.get("p7") == index.get("p7")
+
+
+def test_readiness_wait_blocks_until_warm_up_finishes():
+    async def scenario():
+        readiness = Readiness()
+        loaded = asyncio.Event()
+        order = []
+
+        async def warm_up():
+            await loaded.wait()
+            order.append("loaded")
+
+        async def request():
+            await readiness.wait("matchmaking_index")
+            order.append("request")
+
+        readiness.warm("matchmaking_index", warm_up)
+        waiter = asyncio.create_task(request())
+        await asyncio.sleep(0)
+        loaded.set()
+        await waiter
+        # Sin preparación en curso no se espera
+        await readiness.wait("other")
+        return order
+
+    assert asyncio.run(scenario()) == ["loaded", "request"]
+
+
+def test_batch_top_k_is_capped():
+    target = person("1990-01-01")
+    with pytest.raises(ValidationError):
+        MatchmakingBatchRequest(person=target, candidates=[target], top_k=MATCHMAKING_MAX_TOP_K + 1)
+
+
+def test_failed_candidate_scores_do_not_fail_the_batch(monkeypatch):
+    async def call_openai_api(person1, person2, data_analysis):
+        if person2.learning_preferences == "auditory":
+            raise LLMError(500, "boom")
+        return 0.5
+
+    monkeypatch.setattr(matchmaking_service, "call_openai_api", call_openai_api)
+    target = person("1990-01-01")
+    candidates = [person("1990-01-01", style="auditory"), person("1991-01-01")]
+    results = asyncio.run(matchmaking_service.evaluate_candidates(target, candidates, 2))
+    assert [(r["candidate_index"], r["compatibility_score"]) for r in results] == [(1, 0.5), (0, None)]
@@ -0,0 +1,81 @@
+"""
+extract_features frente a las llamadas individuales de librosa, con la
+tolerancia documentada en app.spectral_features.
+"""
+import librosa
+import numpy as np
+import pytest
+
+from app import spectral_features
+from app.spectral_features import N_FFT, HOP_LENGTH, N_MFCC, extract_features, magnitude_spectrogram
+
+
+def signal(sr, seconds=4.0, seed=0):
+    """Tonos con armónicos que cambian de nota, pausas y ruido de fondo."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sr * seconds)) / sr
+    f0 = np.where(t % 1.0 < 0.5, 180.0, 240.0)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    y = sum(np.sin(harmonic * phase) / harmonic for harmonic in range(1, 6))
+    y *= (t % 0.8 < 0.6)
+    y += 0.01 * rng.standard_normal(len(t))
+    return (0.3 * y).astype(np.float32)
+
+
+def relative_error(a, b):
+    return abs(float(np.mean(a)) - float(np.mean(b))) / abs(float(np.mean(b)))
+
+
+@pytest.fixture(params=[22050, 44100])
+def audio(request, monkeypatch):
+    # Bloques pequeños para recorrer también las fronteras entre bloques
+    monkeypatch.setattr(spectral_features, "FRAME_BLOCK", 37)
+    sr = request.param
+    y = signal(sr)
+    return y, sr, extract_features(y, sr)
+
+
+def test_magnitude_spectrogram_matches_stft():
+    y = signal(22050)
+    expected = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+    np.testing.assert_allclose(magnitude_spectrogram(y), expected, rtol=1e-5, atol=1e-5)
+
+
+def test_moment_features_within_tolerance(audio):
+    y, sr, features = audio
+    frames = features["frames"]
+    S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+    expected = {
+        "spectral_centroid": librosa.feature.spectral_centroid(S=S, sr=sr),
+        "spectral_bandwidth": librosa.feature.spectral_bandwidth(S=S, sr=sr),
+        "spectral_flatness": librosa.feature.spectral_flatness(S=S),
+    }
+    for name, values in expected.items():
+        assert frames[name].shape == values.ravel().shape
+        assert relative_error(frames[name], values) < 1e-4, name
+
+
+def test_contrast_and_mfcc_match_up_to_float32_rounding(audio):
+    y, sr, features = audio
+    contrast = librosa.feature.spectral_contrast(y=y, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH)
+    np.testing.assert_allclose(features["frames"]["spectral_contrast"], contrast, rtol=1e-4, atol=1e-4)
+
+    mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=N_MFCC, n_fft=N_FFT, hop_length=HOP_LENGTH)
+    np.testing.assert_allclose(features["mfccs"], mfccs, rtol=1e-3, atol=1e-2)
+
+
+def test_time_domain_features_and_tempo_are_identical(audio):
+    y, sr, features = audio
+    frames = features["frames"]
+    np.testing.assert_array_equal(
+        frames["rms"], librosa.feature.rms(y=y, frame_length=N_FFT, hop_length=HOP_LENGTH))
+    np.testing.assert_array_equal(
+        frames["zero_crossing_rate"],
+        librosa.feature.zero_crossing_rate(y, frame_length=N_FFT, hop_length=HOP_LENGTH))
+    np.testing.assert_array_equal(
+        frames["pitch"],
+        librosa.yin(y, fmin=spectral_features.PITCH_FMIN, fmax=spectral_features.PITCH_FMAX,
+                    sr=sr, frame_length=N_FFT, hop_length=HOP_LENGTH))
+
+    tempo, _ = librosa.beat.beat_track(y=y, sr=sr, hop_length=HOP_LENGTH)
+    assert features["tempo"] == pytest.approx(float(np.atleast_1d(tempo)[0]))